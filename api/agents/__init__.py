@@ -21,6 +21,48 @@ This package contains all autonomous agents used in the AutoMind Master Pipeline
 - Reporting Engine
 
 All agents are orchestrated by AutoMindMasterAgent.
+
+Heavy third-party libraries (PyCaret, Prophet, AutoTS, SHAP, seaborn,
+reportlab, nbformat) are imported by the agents on first use. Forked job
+workers can instead inherit them from a warmed-up parent via preload().
 """
 
-from .master_agent import AutoMindMasterAgent
+import importlib
+
+# Optional heavy dependencies, grouped by the pipeline feature that needs them
+PRELOAD_GROUPS = {
+    "tabular": ["pycaret.classification", "pycaret.regression"],
+    "timeseries": ["prophet", "statsmodels.tsa.holtwinters", "autots"],
+    "explain": ["shap"],
+    "plots": ["matplotlib.pyplot", "seaborn"],
+    "report": ["reportlab.platypus", "nbformat"],
+}
+
+
+def preload(groups="all"):
+    """
+    Import the heavy dependencies of the given groups ("all", a comma
+    separated string or a list) and return {module: error or None}.
+    """
+    if isinstance(groups, str):
+        groups = list(PRELOAD_GROUPS) if groups.strip().lower() == "all" else groups.split(",")
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    results = {}
+    for group in groups:
+        for name in PRELOAD_GROUPS.get(group.strip(), []):
+            try:
+                importlib.import_module(name)
+                results[name] = None
+            except Exception as e:
+                results[name] = str(e)
+    return results
+
+
+def __getattr__(name):
+    if name == "AutoMindMasterAgent":
+        from .master_agent import AutoMindMasterAgent
+        return AutoMindMasterAgent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
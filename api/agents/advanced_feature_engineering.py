@@ -2,60 +2,264 @@
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import KFold
-from sklearn.feature_extraction.text import TfidfVectorizer
+from joblib import Parallel, delayed
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
+
+
+def _docs(values):
+    return pd.Series(values, dtype=object).fillna("").astype(str)
+
+
+def _vectorize_text(values, col, mode, max_features, hash_features):
+    """
+    One text column -> (CSR float32 matrix, column names, fitted state).
+    Module level so joblib can ship it to worker processes.
+    """
+    docs = _docs(values)
+    try:
+        if mode == "hashing":
+            hasher = HashingVectorizer(n_features=hash_features, alternate_sign=False, norm=None)
+            hashed = hasher.transform(docs)
+            used = np.flatnonzero(hashed.getnnz(axis=0))
+            idf = TfidfTransformer().fit(hashed[:, used])
+            mat = idf.transform(hashed[:, used])
+            names = [f"{col}_hash_{i}" for i in used]
+            state = {"hasher": hasher, "used": used, "idf": idf}
+        else:
+            tfidf = TfidfVectorizer(max_features=max_features, dtype=np.float32)
+            mat = tfidf.fit_transform(docs)
+            names = [f"{col}_tfidf_{i}" for i in range(mat.shape[1])]
+            state = {"tfidf": tfidf}
+    except ValueError:  # empty vocabulary
+        return None, [], None
+    return mat.astype(np.float32).tocsr(), names, state
+
+
+def _apply_text(values, state):
+    docs = _docs(values)
+    if "tfidf" in state:
+        mat = state["tfidf"].transform(docs)
+    else:
+        mat = state["idf"].transform(state["hasher"].transform(docs)[:, state["used"]])
+    return mat.astype(np.float32).tocsr()
 
 
 class AdvancedFeatureEngineeringAgent:
 
-    def _target_encode(self, df, target):
+    def __init__(self, n_splits: int = 5, smoothing: float = 10.0, random_state: int = 42,
+                 text_mode: str = "tfidf", text_max_features: int = 40, hash_features: int = 2 ** 12,
+                 text_sample_rows: int = 1000, n_jobs: int = 4):
+        self.n_splits = n_splits
+        self.smoothing = smoothing
+        self.random_state = random_state
+        # "tfidf" keeps the `text_max_features` most frequent terms per column;
+        # "hashing" needs no vocabulary and caps memory at `hash_features` columns
+        self.text_mode = text_mode
+        self.text_max_features = text_max_features
+        self.hash_features = hash_features
+        self.text_sample_rows = text_sample_rows
+        self.n_jobs = n_jobs
+        # fitted state replayed by apply(): full-data encoding tables, text
+        # vectorizers and the interaction pairs chosen by enhance()
+        self.encoders_ = {}
+        self.priors_ = {}
+        self.text_ = []
+        self.interactions_ = []
+
+    @staticmethod
+    def _target_matrix(y: pd.Series):
         """
-        SAFE target encoding — NOT 10k+ features.
+        Returns (Y, suffixes): one column for binary/regression targets, one
+        indicator column per class for multiclass targets. NaN marks a missing target.
         """
-        df = df.copy()
-        y = df[target]
+        nunique = y.nunique(dropna=True)
+        if pd.api.types.is_numeric_dtype(y) and not pd.api.types.is_bool_dtype(y) and nunique > 20:
+            return pd.to_numeric(y, errors="coerce").to_numpy(dtype=np.float64)[:, None], [""]
 
-        cat_cols = df.select_dtypes(include=['object', 'category']).columns
+        codes, classes = pd.factorize(y, sort=True)
+        missing = codes < 0
+        if len(classes) <= 2:
+            Y = (codes == len(classes) - 1).astype(np.float64)[:, None]
+            suffixes = [""]
+        else:
+            Y = (codes[:, None] == np.arange(len(classes))[None, :]).astype(np.float64)
+            suffixes = [f"_{c}" for c in classes]
+        Y[missing] = np.nan
+        return Y, suffixes
 
-        for col in cat_cols:
-            if col == target:
-                continue
+    def _target_encode(self, df, target, source=None):
+        """
+        Out-of-fold, smoothed per-category target encoding.
 
-            enc = pd.Series(index=df.index, dtype=float)
-            kf = KFold(n_splits=5, shuffle=True, random_state=42)
-            for train, val in kf.split(df):
-                enc.iloc[val] = y.iloc[train].mean()
+        Rows are split into `n_splits` folds; each row is encoded with the
+        category mean computed on the other folds, shrunk towards the
+        out-of-fold prior by `smoothing` pseudo-counts. Counts and sums for
+        every (fold, column, category) are built with a single bincount over
+        the stacked category codes of all columns.
 
-            df[f"{col}_target_enc"] = enc
+        The encoding of unseen rows uses every training row; it is kept on
+        `encoders_` / `priors_` for apply().
+        """
+        src = source if source is not None else df
+        cat_cols = [c for c in src.select_dtypes(include=['object', 'category']).columns if c != target]
+        self.encoders_, self.priors_ = {}, {}
+        if not cat_cols or target not in df.columns:
+            return {}
 
-        return df
+        Y, suffixes = self._target_matrix(df[target])
+        n, C, F, m = len(df), len(cat_cols), self.n_splits, self.smoothing
 
-    def _text_features(self, df):
-        df = df.copy()
-        text_cols = [c for c in df.columns if df[c].dtype == object and df[c].astype(str).str.len().mean() > 12]
+        folds = np.random.default_rng(self.random_state).permutation(n) % F
 
-        for col in text_cols:
-            try:
-                tfidf = TfidfVectorizer(max_features=40)
-                mat = tfidf.fit_transform(df[col].fillna(""))
-                tfidf_df = pd.DataFrame(mat.toarray(), columns=[f"{col}_tfidf_{i}" for i in range(mat.shape[1])])
-                df = pd.concat([df, tfidf_df], axis=1)
-            except:
-                pass
+        # Stack the category codes of all columns into one code space
+        codes = np.empty((n, C), dtype=np.int64)
+        spans = []
+        offset = 0
+        for ci, col in enumerate(cat_cols):
+            c, uniques = pd.factorize(src[col], use_na_sentinel=False)
+            codes[:, ci] = c + offset
+            spans.append((col, pd.Index(uniques), offset))
+            offset += len(uniques)
+        G = offset
+        for col, uniques, _ in spans:
+            self.encoders_[col] = (uniques, {})
 
-        return df
+        flat = (folds[:, None] * G + codes).ravel()
+        fold_n = np.bincount(folds, minlength=F)
 
-    def enhance(self, df: pd.DataFrame, target: str) -> pd.DataFrame:
-        df = df.copy()
+        out = {}
+        for k, suffix in enumerate(suffixes):
+            yk = Y[:, k]
+            valid = ~np.isnan(yk)
+            yk = np.where(valid, yk, 0.0)
 
-        df = self._target_encode(df, target)
-        df = self._text_features(df)
+            cnt = np.bincount(flat, weights=np.repeat(valid.astype(np.float64), C), minlength=F * G).reshape(F, G)
+            sums = np.bincount(flat, weights=np.repeat(yk, C), minlength=F * G).reshape(F, G)
+            oof_cnt = cnt.sum(axis=0)[None, :] - cnt
+            oof_sum = sums.sum(axis=0)[None, :] - sums
 
-        # SAFE interactions: only between top 10 numeric columns
-        num_cols = df.select_dtypes(include=[np.number]).columns[:10]
+            fold_valid = np.bincount(folds, weights=valid, minlength=F)
+            fold_sum = np.bincount(folds, weights=yk, minlength=F)
+            prior = (yk.sum() - fold_sum) / np.maximum(valid.sum() - fold_valid, 1)
 
-        for i, c1 in enumerate(num_cols):
-            for c2 in num_cols[i + 1:]:
-                df[f"int_{c1}_{c2}"] = df[c1] * df[c2]
+            table = (oof_sum + m * prior[:, None]) / (oof_cnt + m)
+            values = table[folds[:, None], codes]
+
+            for ci, col in enumerate(cat_cols):
+                out[f"{col}_target_enc{suffix}"] = values[:, ci].astype(np.float32)
+
+            full_prior = yk.sum() / max(valid.sum(), 1)
+            full = (sums.sum(axis=0) + m * full_prior) / (cnt.sum(axis=0) + m)
+            self.priors_[suffix] = full_prior
+            for col, uniques, start in spans:
+                self.encoders_[col][1][suffix] = full[start:start + len(uniques)].astype(np.float32)
+
+        return out
+
+    def _apply_encoding(self, src):
+        out = {}
+        for col, (uniques, tables) in self.encoders_.items():
+            idx = uniques.get_indexer(src[col]) if col in src.columns else np.full(len(src), -1)
+            for suffix, table in tables.items():
+                out[f"{col}_target_enc{suffix}"] = np.where(
+                    idx >= 0, table[np.maximum(idx, 0)], self.priors_[suffix]).astype(np.float32)
+        return out
+
+    def _detect_text_columns(self, df, target):
+        """
+        Free-text columns: string-like columns whose sampled values average
+        more than 12 characters. Only `text_sample_rows` values are inspected.
+        """
+        cols = []
+        for c in df.columns:
+            if c == target or not (pd.api.types.is_object_dtype(df[c]) or pd.api.types.is_string_dtype(df[c])
+                                   or isinstance(df[c].dtype, pd.CategoricalDtype)):
+                continue
+            values = df[c].dropna()
+            if len(values) > self.text_sample_rows:
+                values = values.sample(self.text_sample_rows, random_state=self.random_state)
+            if len(values) and values.astype(str).str.len().mean() > 12:
+                cols.append(c)
+        return cols
 
+    def _text_features(self, df, target, source=None):
+        """
+        Returns a sparse float32 block of text features (or None).
+
+        Text columns are vectorized independently, in parallel when there is
+        more than one, and the resulting CSR matrices are stacked without
+        ever being densified.
+        """
+        src = source if source is not None else df
+        text_cols = self._detect_text_columns(src, target)
+        self.text_ = []
+        if not text_cols:
+            return None
+
+        jobs = [delayed(_vectorize_text)(src[c].to_numpy(), c, self.text_mode, self.text_max_features,
+                                         self.hash_features) for c in text_cols]
+        n_jobs = min(len(jobs), self.n_jobs) if len(jobs) > 1 else 1
+        try:
+            results = Parallel(n_jobs=n_jobs)(jobs)
+        except Exception:
+            results = [job[0](*job[1], **job[2]) for job in jobs]
+
+        blocks = []
+        for col, (mat, names, state) in zip(text_cols, results):
+            if mat is not None and mat.shape[1] > 0:
+                blocks.append((mat, names))
+                self.text_.append((col, names, state))
+        if not blocks:
+            return None
+        mat = sparse.hstack([m for m, _ in blocks], format="csc", dtype=np.float32)
+        names = [n for _, ns in blocks for n in ns]
+        return pd.DataFrame.sparse.from_spmatrix(mat, index=df.index, columns=names)
+
+    def enhance(self, df: pd.DataFrame, target: str, source: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        `source` is the row-aligned frame before preprocessing; its raw
+        categorical columns are used for target encoding when given.
+        """
+        enc = self._target_encode(df, target, source)
+        df = pd.concat([df, pd.DataFrame(enc, index=df.index)], axis=1) if enc else df.copy()
+
+        text = self._text_features(df, target, source)
+        if text is not None:
+            df = pd.concat([df, text], axis=1)
+
+        # SAFE interactions: only between top 10 dense numeric columns
+        num_cols = [
+            c for c in df.select_dtypes(include=[np.number]).columns
+            if c != target and not isinstance(df[c].dtype, pd.SparseDtype)
+        ][:10]
+
+        self.interactions_ = [(c1, c2) for i, c1 in enumerate(num_cols) for c2 in num_cols[i + 1:]]
+        return self._interact(df)
+
+    def _interact(self, df):
+        for c1, c2 in self.interactions_:
+            if c1 in df.columns and c2 in df.columns:
+                df[f"int_{c1}_{c2}"] = df[c1] * df[c2]
         return df.loc[:, ~df.columns.duplicated()]
+
+    def apply(self, df: pd.DataFrame, source: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Rebuilds the features of the last enhance() on new rows, target not
+        needed: categories are encoded with the full training table (unseen
+        ones get the prior) and text goes through the fitted vectorizers.
+        """
+        src = source if source is not None else df
+        enc = self._apply_encoding(src)
+        df = pd.concat([df, pd.DataFrame(enc, index=df.index)], axis=1) if enc else df.copy()
+
+        blocks, names = [], []
+        for col, cols, state in self.text_:
+            values = src[col].to_numpy() if col in src.columns else np.full(len(src), None, dtype=object)
+            blocks.append(_apply_text(values, state))
+            names.extend(cols)
+        if blocks:
+            mat = sparse.hstack(blocks, format="csc", dtype=np.float32)
+            df = pd.concat([df, pd.DataFrame.sparse.from_spmatrix(mat, index=df.index, columns=names)], axis=1)
+
+        return self._interact(df)
@@ -0,0 +1,196 @@
+# api/agents/column_stats.py
+"""
+Single-pass column statistics over a stream of row chunks.
+
+ColumnStats.update() is called once per chunk and keeps, per column:
+non-null counts, mean / variance (Chan's parallel merge), min and max for
+numeric columns, a HyperLogLog register set for distinct counts, and a
+bottom-k uniform row sample that answers quantiles, top values,
+correlations and plots. Memory depends only on the number of columns and
+`sample_rows`, never on the row count.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch with 2^p registers (about 1.04 / sqrt(2^p)
+    relative error, ~1.6% at the default p=12).
+    """
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, values):
+        values = np.asarray(values)
+        if len(values) == 0:
+            return self
+        h = pd.util.hash_array(values)
+        idx = (h >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = (h << np.uint64(self.p)).astype(np.float64)
+        # rank = position of the first set bit in the remaining 64 - p bits
+        with np.errstate(divide="ignore"):
+            rank = 64 - np.floor(np.log2(rest))
+        rank = np.minimum(np.nan_to_num(rank, posinf=64), 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+
+class ColumnStats:
+
+    def __init__(self, sample_rows: int = 50_000, hll_p: int = 12, random_state: int = 42):
+        self.sample_rows = sample_rows
+        self.hll_p = hll_p
+        self.rng = np.random.default_rng(random_state)
+
+        self.rows = 0
+        self.columns = None
+        self.numeric = None
+        self.count = None
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+        self.sketches = None
+
+        self._sample = None
+        self._keys = None
+
+    def _init(self, chunk: pd.DataFrame):
+        self.columns = list(chunk.columns)
+        self.numeric = [c for c in self.columns
+                        if pd.api.types.is_numeric_dtype(chunk[c]) and not pd.api.types.is_bool_dtype(chunk[c])]
+        k = len(self.numeric)
+        self.count = {c: 0 for c in self.columns}
+        self.mean, self.m2 = np.zeros(k), np.zeros(k)
+        self.min, self.max = np.full(k, np.inf), np.full(k, -np.inf)
+        self.sketches = {c: HyperLogLog(self.hll_p) for c in self.columns}
+
+    def update(self, chunk: pd.DataFrame):
+        if len(chunk) == 0:
+            return self
+        if self.columns is None:
+            self._init(chunk)
+        self.rows += len(chunk)
+
+        for col, n in chunk.notna().sum().items():
+            self.count[col] += int(n)
+        for col in self.columns:
+            s = chunk[col]
+            values = s.to_numpy()
+            if isinstance(s.dtype, pd.SparseDtype):
+                values = s.sparse.to_dense().to_numpy()
+            self.sketches[col].update(values[pd.notna(values)])
+
+        if self.numeric:
+            self._update_moments(chunk[self.numeric].to_numpy(dtype=np.float64, na_value=np.nan))
+        self._update_sample(chunk)
+        return self
+
+    def _update_moments(self, X: np.ndarray):
+        ok = ~np.isnan(X)
+        n_b = ok.sum(axis=0).astype(np.float64)
+        Xz = np.where(ok, X, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(n_b > 0, Xz.sum(axis=0) / n_b, 0.0)
+        m2_b = (np.where(ok, X - mean_b, 0.0) ** 2).sum(axis=0)
+
+        n_a = np.array([self.count[c] for c in self.numeric], dtype=np.float64) - n_b
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean_b - self.mean
+            self.mean = np.where(n > 0, self.mean + delta * n_b / n, 0.0)
+            self.m2 = np.where(n > 0, self.m2 + m2_b + delta * delta * n_a * n_b / n, 0.0)
+        self.min = np.minimum(self.min, np.where(ok, X, np.inf).min(axis=0))
+        self.max = np.maximum(self.max, np.where(ok, X, -np.inf).max(axis=0))
+
+    def _update_sample(self, chunk: pd.DataFrame):
+        keys = self.rng.random(len(chunk))
+        if self._sample is None:
+            sample, all_keys = chunk, keys
+        else:
+            sample = pd.concat([self._sample, chunk], ignore_index=True)
+            all_keys = np.concatenate([self._keys, keys])
+        if len(all_keys) > self.sample_rows:
+            keep = np.sort(np.argpartition(all_keys, self.sample_rows)[:self.sample_rows])
+            sample, all_keys = sample.iloc[keep], all_keys[keep]
+        self._sample, self._keys = sample.reset_index(drop=True), all_keys
+
+    # ------------------------------------------------------------
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, chunk_rows: int = 100_000, **kw) -> "ColumnStats":
+        stats = cls(**kw)
+        for i in range(0, len(df), chunk_rows):
+            stats.update(df.iloc[i:i + chunk_rows])
+        return stats
+
+    @property
+    def sample(self) -> pd.DataFrame:
+        """Uniform row sample (every row when the stream is below `sample_rows`)."""
+        return self._sample if self._sample is not None else pd.DataFrame()
+
+    @property
+    def exact(self) -> bool:
+        return self.rows <= self.sample_rows
+
+    def distinct(self, col) -> int:
+        if self.exact:
+            return int(self.sample[col].nunique(dropna=True))
+        return min(self.sketches[col].count(), self.count[col])
+
+    def missing(self) -> dict:
+        return {c: self.rows - self.count[c] for c in self.columns or [] if self.rows - self.count[c] > 0}
+
+    def describe(self) -> dict:
+        """
+        {column: stats} shaped like DataFrame.describe(include="all").
+        Quantiles and top values come from the sample; distinct counts
+        from the sketches once the stream outgrows the sample.
+        """
+        out = {}
+        sample = self.sample
+        pos = {c: i for i, c in enumerate(self.numeric or [])}
+        quantiles = {}
+        if self.numeric:
+            q = sample[self.numeric].quantile([0.25, 0.5, 0.75], numeric_only=True)
+            quantiles = q.to_dict()
+
+        for col in self.columns or []:
+            entry = {"count": self.count[col], "unique": self.distinct(col)}
+            if col in pos:
+                i = pos[col]
+                n = self.count[col]
+                entry.update({
+                    "mean": float(self.mean[i]) if n else None,
+                    "std": float(np.sqrt(self.m2[i] / (n - 1))) if n > 1 else None,
+                    "min": float(self.min[i]) if n else None,
+                    "25%": quantiles.get(col, {}).get(0.25),
+                    "50%": quantiles.get(col, {}).get(0.5),
+                    "75%": quantiles.get(col, {}).get(0.75),
+                    "max": float(self.max[i]) if n else None,
+                })
+            else:
+                counts = sample[col].astype(str)[sample[col].notna()].value_counts()
+                if len(counts):
+                    scale = self.count[col] / max(int(counts.sum()), 1)
+                    entry.update({"top": counts.index[0], "freq": int(round(counts.iloc[0] * scale))})
+            out[col] = entry
+        return out
@@ -1,13 +1,35 @@
 # api/agents/data_loader.py
 
+import os
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except Exception:
+    pa = None
 
 
 class DataLoaderAgent:
     """
     Loads raw dataframe, fixes types, removes empty columns.
+
+    read_csv() is the streaming ingestion path for uploads: the schema is
+    inferred from the first `sample_rows` rows, then the file is read in
+    typed chunks (pyarrow when installed) with integer downcasting and
+    categorical conversion of low-cardinality strings.
     """
 
+    def __init__(self, sample_rows: int = 10_000, chunk_rows: int = 250_000,
+                 category_max_unique: int = 1000, category_max_ratio: float = 0.5,
+                 downcast_floats: bool = False):
+        self.sample_rows = sample_rows
+        self.chunk_rows = chunk_rows
+        self.category_max_unique = category_max_unique
+        self.category_max_ratio = category_max_ratio
+        self.downcast_floats = downcast_floats
+
     def load(self, df: pd.DataFrame) -> pd.DataFrame:
 
         if not isinstance(df, pd.DataFrame):
@@ -18,12 +40,160 @@ class DataLoaderAgent:
         # Drop columns entirely empty
         df = df.dropna(axis=1, how='all')
 
-        # Best-effort numeric conversion
+        # Best-effort numeric conversion (probe a sample before touching the full column)
         for col in df.columns:
             if df[col].dtype == object:
                 try:
+                    pd.to_numeric(df[col].head(1000))
                     df[col] = pd.to_numeric(df[col])
                 except:
                     pass
 
         return df
+
+    # ------------------------------------------------------------
+
+    def infer_schema(self, sample: pd.DataFrame) -> dict:
+        """
+        Maps each column to one of: int, float, bool, category, string.
+        """
+        schema = {}
+        n = max(len(sample), 1)
+        for col in sample.columns:
+            s = sample[col]
+            if pd.api.types.is_bool_dtype(s):
+                schema[col] = "bool"
+            elif pd.api.types.is_integer_dtype(s):
+                schema[col] = "int"
+            elif pd.api.types.is_float_dtype(s):
+                schema[col] = "float"
+            else:
+                nunique = s.nunique(dropna=True)
+                if nunique <= self.category_max_unique and nunique / n <= self.category_max_ratio:
+                    schema[col] = "category"
+                else:
+                    schema[col] = "string"
+        return schema
+
+    def _downcast(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        for col in chunk.columns:
+            s = chunk[col]
+            if pd.api.types.is_integer_dtype(s) and not pd.api.types.is_bool_dtype(s):
+                chunk[col] = pd.to_numeric(s, downcast="integer")
+            elif self.downcast_floats and pd.api.types.is_float_dtype(s):
+                chunk[col] = pd.to_numeric(s, downcast="float")
+        return chunk
+
+    def _iter_arrow(self, path: str, schema: dict):
+        types = {
+            "int": pa.int64(),
+            "float": pa.float64(),
+            "bool": pa.bool_(),
+            "category": pa.dictionary(pa.int32(), pa.string()),
+            "string": pa.string(),
+        }
+        reader = pa_csv.open_csv(
+            path,
+            read_options=pa_csv.ReadOptions(block_size=16 * 1024 * 1024),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={c: types[t] for c, t in schema.items()},
+                strings_can_be_null=True,
+            ),
+        )
+        for batch in reader:
+            yield batch.to_pandas()
+
+    def _iter_pandas(self, path: str, schema: dict):
+        dtype = {c: t for c, t in schema.items() if t in ("category", "string")}
+        dtype = {c: ("category" if t == "category" else object) for c, t in dtype.items()}
+        yield from pd.read_csv(path, dtype=dtype, chunksize=self.chunk_rows)
+
+    @staticmethod
+    def _concat(chunks, cat_cols):
+        if len(chunks) == 1:
+            return chunks[0]
+        columns = list(chunks[0].columns)
+        cats = {}
+        for col in cat_cols:
+            cats[col] = union_categoricals([ch[col] for ch in chunks])
+            for ch in chunks:
+                ch.drop(columns=col, inplace=True)
+        df = pd.concat(chunks, ignore_index=True)
+        for col, values in cats.items():
+            df[col] = values
+        return df[columns]
+
+    def sample_chunks(self, chunks, n: int, target: str = None, time_col: str = None,
+                      half_life: float = None) -> pd.DataFrame:
+        """
+        Reservoir-samples `n` rows from a chunk iterator, favouring recent
+        rows of `time_col` when `half_life` (seconds) is given. Categorical
+        columns whose categories differ between chunks are re-unified
+        afterwards.
+        """
+        from .sampling_policy import SamplingPolicyAgent
+
+        cat_cols = set()
+
+        def track(chunks):
+            for ch in chunks:
+                cat_cols.update(c for c in ch.columns if isinstance(ch[c].dtype, pd.CategoricalDtype))
+                yield ch
+
+        df = SamplingPolicyAgent().reservoir(track(chunks), n, target, time_col, half_life)
+        for col in cat_cols:
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+        return df
+
+    def read_csv(self, path: str, sample_rows: int = None, target: str = None, time_col: str = None,
+                 half_life: float = None):
+        """
+        Returns (df, report) where report holds the inferred schema, the
+        engine used and the memory saved versus a default read_csv.
+
+        With `sample_rows`, chunks are fed through a reservoir instead of
+        being concatenated, so only the sample is ever held in memory.
+        """
+        sample = pd.read_csv(path, nrows=self.sample_rows)
+        schema = self.infer_schema(sample)
+        sample_bytes = int(sample.memory_usage(deep=True).sum())
+        sample_len = len(sample)
+        del sample
+
+        cat_cols = [c for c, t in schema.items() if t == "category"]
+        engines = (["pyarrow"] if pa is not None else []) + ["c"]
+        df = None
+        for engine in engines:
+            try:
+                chunks = self._iter_arrow(path, schema) if engine == "pyarrow" else self._iter_pandas(path, schema)
+                if sample_rows:
+                    df = self.sample_chunks((self._downcast(ch) for ch in chunks), sample_rows, target, time_col,
+                                            half_life)
+                else:
+                    df = self._concat([self._downcast(ch) for ch in chunks], cat_cols)
+                break
+            except Exception:
+                # Sample-based schema did not hold for the whole file
+                continue
+        if df is None:
+            engine = "fallback"
+            if sample_rows:
+                df = self.sample_chunks(pd.read_csv(path, chunksize=self.chunk_rows), sample_rows, target, time_col,
+                                        half_life)
+            else:
+                df = pd.read_csv(path)
+
+        typed_bytes = int(df.memory_usage(deep=True).sum())
+        estimated_bytes = int(sample_bytes / max(sample_len, 1) * len(df))
+
+        report = {
+            "engine": engine,
+            "file_bytes": os.path.getsize(path),
+            "schema": {c: str(df[c].dtype) for c in df.columns},
+            "inferred": schema,
+            "memory_bytes": typed_bytes,
+            "bytes_saved": max(estimated_bytes - typed_bytes, 0),
+            "sampled_rows": sample_rows,
+        }
+        return df, report
@@ -1,52 +1,247 @@
 # api/agents/eda_agent.py
 
-import pandas as pd
-import numpy as np
-import seaborn as sns
-import matplotlib
-matplotlib.use("Agg")    # PREVENTS Tkinter errors
-import matplotlib.pyplot as plt
+import os
 import base64
+import logging
+import multiprocessing
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+from .column_stats import ColumnStats
+
+logger = logging.getLogger("automind")
+
+
+# ======================= Figure renderers ========================
+# Module-level so they can run in pool processes. Each receives plain
+# arrays, never the frame, and returns a base64 PNG.
+
+def _fig_to_base64(fig):
+    buf = BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    buf.seek(0)
+    return base64.b64encode(buf.read()).decode()
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")    # PREVENTS Tkinter errors
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _render_heatmap(corr, labels):
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(7, 5))
+    im = ax.imshow(corr, cmap="coolwarm", vmin=-1, vmax=1)
+    ax.set_xticks(range(len(labels)), labels, rotation=90, fontsize=7)
+    ax.set_yticks(range(len(labels)), labels, fontsize=7)
+    fig.colorbar(im, ax=ax)
+    ax.set_title("Correlation")
+    out = _fig_to_base64(fig)
+    plt.close(fig)
+    return out
+
+
+def _render_bars(title, labels, heights, widths=None):
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(6, 4))
+    if widths is None:
+        ax.bar(range(len(heights)), heights, tick_label=labels)
+        ax.tick_params(axis="x", rotation=45)
+    else:
+        ax.bar(labels, heights, width=widths, align="edge")
+    ax.set_title(title)
+    out = _fig_to_base64(fig)
+    plt.close(fig)
+    return out
+
+
+def _render_hist_grid(panels, cols=6):
+    plt = _pyplot()
+    cols = min(cols, len(panels))
+    rows = -(-len(panels) // cols)
+    fig, axes = plt.subplots(rows, cols, figsize=(2.2 * cols, 1.6 * rows), squeeze=False)
+    for ax, (name, counts, edges) in zip(axes.flat, panels):
+        if edges is None:
+            ax.bar(range(len(counts)), counts)
+        else:
+            ax.bar(edges[:-1], counts, width=np.diff(edges), align="edge")
+        ax.set_title(str(name)[:24], fontsize=7)
+        ax.tick_params(labelsize=5)
+    for ax in axes.flat[len(panels):]:
+        ax.axis("off")
+    fig.tight_layout()
+    out = _fig_to_base64(fig)
+    plt.close(fig)
+    return out
+
+
+def _render_hist_strip(names, density):
+    # one row per column: a whole page of histograms drawn as a single image
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(7, max(2.0, 0.06 * len(names))))
+    ax.imshow(density, aspect="auto", cmap="viridis", interpolation="nearest")
+    ax.set_xlabel("bin (column min -> max)")
+    ax.set_yticks(range(len(names)) if len(names) <= 60 else [],
+                  [str(n)[:24] for n in names] if len(names) <= 60 else [], fontsize=6)
+    ax.set_title(f"Distributions ({len(names)} columns)")
+    out = _fig_to_base64(fig)
+    plt.close(fig)
+    return out
+
+
+def _render_missingness(mask, names):
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.imshow(mask, aspect="auto", cmap="Greys", interpolation="nearest", vmin=0, vmax=1)
+    if len(names) <= 60:
+        ax.set_xticks(range(len(names)), [str(n)[:24] for n in names], rotation=90, fontsize=6)
+    else:
+        ax.set_xlabel(f"{len(names)} columns")
+    ax.set_ylabel("rows (sample)")
+    ax.set_title("Missing values")
+    out = _fig_to_base64(fig)
+    plt.close(fig)
+    return out
+
+
+def _render(task):
+    fn, args = task
+    return fn(*args)
 
 
 class EDAAgent:
+    """
+    Exploratory analysis that stays cheap on tall and wide frames.
+
+    Statistics come from one streaming pass (ColumnStats): counts, moments,
+    sketched distinct counts and a uniform sample of `sample_rows` rows,
+    which every quantile, correlation and plot is drawn from. Figures are
+    built from precomputed arrays and rendered in a process pool of
+    `render_jobs` workers once there are at least `pool_min_figures` of
+    them. Per-column histograms switch from a grid to one strip image per
+    `strip_rows` columns past `max_grid_columns`, and the missingness matrix
+    is a single image however wide the frame is. Results are cached by the
+    pipeline's stage cache under the dataset hash.
+    """
+
+    def __init__(self, sample_rows: int = 50_000, chunk_rows: int = 100_000, bins: int = 30,
+                 max_corr_columns: int = 40, max_grid_columns: int = 36, strip_rows: int = 250,
+                 missing_rows: int = 400, render_jobs: int = None, pool_min_figures: int = 6,
+                 random_state: int = 42):
+        self.sample_rows = sample_rows
+        self.chunk_rows = chunk_rows
+        self.bins = bins
+        self.max_corr_columns = max_corr_columns
+        self.max_grid_columns = max_grid_columns
+        self.strip_rows = strip_rows
+        self.missing_rows = missing_rows
+        self.render_jobs = render_jobs or min(4, os.cpu_count() or 1)
+        self.pool_min_figures = pool_min_figures
+        self.random_state = random_state
+
     def _fig_to_base64(self, fig):
-        buf = BytesIO()
-        fig.savefig(buf, format="png", bbox_inches="tight")
-        buf.seek(0)
-        fig.clear()
-        return base64.b64encode(buf.read()).decode()
+        return _fig_to_base64(fig)
 
-    def analyze(self, df: pd.DataFrame, target: str):
-        summary, images = {}, []
+    # ------------------------------------------------------------
 
-        # Summary stats
-        try:
-            summary["describe"] = df.describe(include="all").to_dict()
-        except:
-            summary["describe"] = {}
+    def profile(self, df: pd.DataFrame) -> ColumnStats:
+        return ColumnStats.from_frame(df, self.chunk_rows, sample_rows=self.sample_rows,
+                                      random_state=self.random_state)
+
+    def _histograms(self, stats: ColumnStats, columns):
+        """
+        [(name, counts, edges)] from the sample; numeric bins span the
+        streamed min/max, other columns get their top-10 value counts.
+        """
+        sample = stats.sample
+        pos = {c: i for i, c in enumerate(stats.numeric)}
+        out = []
+        for col in columns:
+            values = sample[col].dropna()
+            if col in pos:
+                lo, hi = stats.min[pos[col]], stats.max[pos[col]]
+                if not np.isfinite(lo) or lo == hi:
+                    continue
+                counts, edges = np.histogram(values.to_numpy(dtype=np.float64), bins=self.bins, range=(lo, hi))
+                out.append((col, counts, edges))
+            else:
+                counts = values.astype(str).value_counts().head(10)
+                out.append((col, counts.to_numpy(), None))
+        return out
 
-        # Missing % summary
-        miss = df.isnull().sum()
-        summary["missing_values"] = miss[miss > 0].to_dict()
+    def _figures(self, stats: ColumnStats, target: str):
+        sample = stats.sample
+        figures = []
 
         # Correlation heatmap
-        num_df = df.select_dtypes(include=[np.number])
-        if num_df.shape[1] >= 2:
-            fig, ax = plt.subplots(figsize=(7, 5))
-            sns.heatmap(num_df.corr(), cmap="coolwarm", ax=ax)
-            images.append(self._fig_to_base64(fig))
-            plt.close(fig)
+        numeric = [c for c in stats.numeric if c != target][:self.max_corr_columns - 1]
+        if target in stats.numeric:
+            numeric.append(target)
+        if len(numeric) >= 2:
+            corr = sample[numeric].astype(np.float64).corr().to_numpy()
+            figures.append((_render_heatmap, (np.nan_to_num(corr), numeric)))
 
         # Distribution of target
-        if target in df.columns:
-            fig, ax = plt.subplots(figsize=(6, 4))
-            try:
-                sns.histplot(df[target], kde=True, ax=ax)
-                images.append(self._fig_to_base64(fig))
-            except:
-                pass
-            plt.close(fig)
+        if target in sample.columns:
+            hist = self._histograms(stats, [target])
+            if hist:
+                _, counts, edges = hist[0]
+                if edges is None:
+                    labels = sample[target].dropna().astype(str).value_counts().head(10).index.tolist()
+                    figures.append((_render_bars, (f"{target} distribution", labels, counts)))
+                else:
+                    figures.append((_render_bars, (f"{target} distribution", edges[:-1], counts, np.diff(edges))))
+
+        # Per-column histograms
+        hists = self._histograms(stats, [c for c in stats.columns if c != target])
+        if len(hists) <= self.max_grid_columns:
+            if hists:
+                figures.append((_render_hist_grid, (hists,)))
+        else:
+            numeric_hists = [(n, c) for n, c, e in hists if e is not None]
+            for i in range(0, len(numeric_hists), self.strip_rows):
+                page = numeric_hists[i:i + self.strip_rows]
+                density = np.array([c / max(c.max(), 1) for _, c in page])
+                figures.append((_render_hist_strip, ([n for n, _ in page], density)))
+
+        # Missingness matrix
+        if stats.missing():
+            step = max(1, len(sample) // self.missing_rows)
+            mask = sample.iloc[::step].isna().to_numpy(dtype=np.float32)
+            figures.append((_render_missingness, (mask, stats.columns)))
+
+        return figures
+
+    def _render_all(self, figures):
+        if len(figures) < self.pool_min_figures or self.render_jobs <= 1:
+            return [_render(f) for f in figures]
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.render_jobs, len(figures)), mp_context=ctx) as pool:
+            return list(pool.map(_render, figures))
+
+    # ------------------------------------------------------------
+
+    def analyze(self, df: pd.DataFrame, target: str, stats: ColumnStats = None):
+        stats = stats or self.profile(df)
+
+        summary = {
+            "rows": stats.rows,
+            "sampled_rows": len(stats.sample),
+            "describe": stats.describe(),
+            "missing_values": stats.missing(),
+        }
+
+        try:
+            images = self._render_all(self._figures(stats, target))
+        except Exception as e:
+            # kept in the (cached) summary so every run that reuses it reports the gap
+            logger.warning("EDA plots failed: %s", e)
+            summary["plots_error"] = str(e)
+            images = []
 
         return summary, images
@@ -1,20 +1,106 @@
 # api/agents/evaluation_agent.py
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
-from sklearn.metrics import (
-    accuracy_score,
-    f1_score,
-    precision_score,
-    recall_score,
-    r2_score,
-    mean_squared_error,
-    mean_absolute_error,
-)
 
 
 class EvaluationAgent:
+    """
+    Scores a trained model on held-out rows.
+
+    Predictions are made in batches of `batch_rows`. All metrics for a task
+    come from one set of sufficient statistics (a confusion matrix for
+    classification, weighted residual sums for regression), so each of the
+    `n_bootstrap` Poisson-bootstrap replicates costs a single weighted
+    bincount or dot product. Replicates run on a thread pool and give the
+    95% confidence intervals.
+    """
+
+    def __init__(self, batch_rows: int = 100_000, n_bootstrap: int = 200, n_jobs: int = None,
+                 random_state: int = 42):
+        self.batch_rows = batch_rows
+        self.n_bootstrap = n_bootstrap
+        self.n_jobs = n_jobs or min(4, os.cpu_count() or 1)
+        self.random_state = random_state
+
+    def _predict(self, model, X: pd.DataFrame) -> np.ndarray:
+        if len(X) <= self.batch_rows:
+            return np.asarray(model.predict(X)).ravel()
+        parts = [np.asarray(model.predict(X.iloc[i:i + self.batch_rows])).ravel()
+                 for i in range(0, len(X), self.batch_rows)]
+        return np.concatenate(parts)
+
+    # ---------------- Classification ---------------- #
+    @staticmethod
+    def _classification_stats(y, pred):
+        labels, inv = np.unique(np.concatenate([np.asarray(y, dtype=object).astype(str),
+                                                np.asarray(pred, dtype=object).astype(str)]), return_inverse=True)
+        n = len(y)
+        k = len(labels)
+        return inv[:n] * k + inv[n:], k
+
+    @staticmethod
+    def _classification_metrics(cm: np.ndarray):
+        tp = np.diag(cm)
+        support = cm.sum(axis=1)
+        predicted = cm.sum(axis=0)
+        total = support.sum() or 1.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(predicted > 0, tp / predicted, 0.0)
+            recall = np.where(support > 0, tp / support, 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        return {
+            "accuracy": float(tp.sum() / total),
+            "f1": float((f1 * support).sum() / total),
+            "precision": float((precision * support).sum() / total),
+            "recall": float((recall * support).sum() / total),
+        }
+
+    # ---------------- Regression ---------------- #
+    @staticmethod
+    def _regression_metrics(y, pred, w=None):
+        w = np.ones(len(y)) if w is None else w
+        r = y - pred
+        W = w.sum() or 1.0
+        sy, syy = w @ y, w @ (y * y)
+        sr2 = w @ (r * r)
+        ss_tot = syy - sy * sy / W
+        return {
+            "r2": float(1.0 - sr2 / ss_tot) if ss_tot > 0 else 0.0,
+            "rmse": float(np.sqrt(sr2 / W)),
+            "mae": float(w @ np.abs(r) / W),
+        }
+
+    # ---------------- Bootstrap ---------------- #
+    def _bootstrap(self, replicate, n: int):
+        """
+        Runs `replicate(weights)` for every bootstrap draw, in parallel
+        chunks with independent generators. Returns {metric: [lo, hi]}.
+        """
+        if self.n_bootstrap <= 0 or n < 2:
+            return {}
+        chunks = np.array_split(np.arange(self.n_bootstrap), self.n_jobs)
+        seeds = np.random.SeedSequence(self.random_state).spawn(len(chunks))
 
-    def evaluate(self, model, df, target, task):
+        def run(args):
+            size, seed = args
+            rng = np.random.default_rng(seed)
+            return [replicate(rng.poisson(1.0, n).astype(np.float64)) for _ in range(size)]
+
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as ex:
+            draws = [d for part in ex.map(run, [(len(c), s) for c, s in zip(chunks, seeds)]) for d in part]
+
+        return {
+            m: [float(np.percentile(v, 2.5)), float(np.percentile(v, 97.5))]
+            for m in draws[0] for v in [np.array([d[m] for d in draws])]
+        }
+
+    # ------------------------------------------------------------
+
+    def evaluate(self, model, df, target, task, evaluated_on: str = "holdout"):
         try:
             X = df.drop(columns=[target])
             y = df[target]
@@ -22,23 +108,29 @@ class EvaluationAgent:
             return {"error": "Target column missing"}
 
         try:
-            pred = model.predict(X)
+            pred = self._predict(model, X)
         except:
             return {"error": "Model failed to predict"}
 
         if task == "classification":
-            return {
-                "accuracy": float(accuracy_score(y, pred)),
-                "f1": float(f1_score(y, pred, average="weighted")),
-                "precision": float(precision_score(y, pred, average="weighted")),
-                "recall": float(recall_score(y, pred, average="weighted")),
-            }
-
-        if task == "regression":
-            return {
-                "r2": float(r2_score(y, pred)),
-                "rmse": float(mean_squared_error(y, pred, squared=False)),
-                "mae": float(mean_absolute_error(y, pred)),
-            }
-
-        return {"status": "no metrics for time series"}
+            codes, k = self._classification_stats(y.to_numpy(), pred)
+            metrics = self._classification_metrics(np.bincount(codes, minlength=k * k).reshape(k, k))
+            ci = self._bootstrap(
+                lambda w: self._classification_metrics(np.bincount(codes, weights=w, minlength=k * k).reshape(k, k)),
+                len(codes))
+
+        elif task == "regression":
+            yv = pd.to_numeric(y, errors="coerce").to_numpy(dtype=np.float64)
+            pv = pred.astype(np.float64)
+            ok = ~(np.isnan(yv) | np.isnan(pv))
+            yv, pv = yv[ok], pv[ok]
+            metrics = self._regression_metrics(yv, pv)
+            ci = self._bootstrap(lambda w: self._regression_metrics(yv, pv, w), len(yv))
+
+        else:
+            return {"status": "no metrics for time series"}
+
+        metrics["ci95"] = ci
+        metrics["n_eval"] = int(len(X))
+        metrics["evaluated_on"] = evaluated_on
+        return metrics
@@ -1,31 +1,283 @@
 # api/agents/explainability_agent.py
 
-import numpy as np
-if not hasattr(np, "bool"):
-    np.bool = bool
-
-import shap
+import os
+import time
+import logging
+import pickle
+import hashlib
 import base64
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
 import pandas as pd
 
+from api.dataset_store import CACHE_DIR
+
+SHAP_ROWS = int(os.getenv("AUTOMIND_SHAP_ROWS", "1000"))
+SHAP_BUDGET = float(os.getenv("AUTOMIND_SHAP_BUDGET_S", "60"))
+
+TREE_MODULES = ("lightgbm", "xgboost", "catboost", "sklearn.ensemble", "sklearn.tree")
+LINEAR_MODULES = ("sklearn.linear_model", "sklearn.svm._classes")
+
+logger = logging.getLogger("automind")
+
+
+def _import_shap():
+    """
+    shap 0.41 still uses the np.int/np.bool aliases NumPy removed, both at
+    import and inside its explainers, so they are restored the first time
+    SHAP is needed rather than whenever this module is imported.
+    """
+    for name, alias in (("bool", bool), ("int", int)):
+        # vars() rather than hasattr(): probing np.bool itself warns
+        if name not in vars(np):
+            setattr(np, name, alias)
+    import shap
+    return shap
+
+
+def _label_codes(X, background):
+    """
+    Permutation maskers only take numbers: categorical and string columns
+    of X and the background become codes into their shared levels. Returns
+    (X, background, decode) where decode maps a masked array back to a
+    frame the model accepts, or None when nothing was encoded.
+    """
+    if not isinstance(X, pd.DataFrame):
+        return X, background, None
+    cols = [c for c in X.columns if isinstance(X[c].dtype, pd.CategoricalDtype) or X[c].dtype == object]
+    if not cols:
+        return X, background, None
+    levels = {c: pd.Index(pd.unique(pd.concat([X[c], background[c]]).dropna().astype(object))) for c in cols}
+    dtypes = X.dtypes
+
+    def encode(frame):
+        return frame.assign(**{c: levels[c].get_indexer(frame[c].astype(object)).astype(float) for c in cols})
+
+    def decode(values):
+        frame = pd.DataFrame(values, columns=X.columns)
+        for c in cols:
+            codes = frame[c].to_numpy(dtype=float).astype(int)
+            frame[c] = np.where(codes >= 0, levels[c].to_numpy()[np.maximum(codes, 0)], None)
+        return frame.astype(dtypes)
+
+    return encode(X), encode(background), decode
+
+
 class ExplainabilityAgent:
+    """
+    SHAP explanations on a sample, chosen per model type.
+
+    A stratified background (`background_rows`) and explain sample
+    (`explain_rows`) are drawn instead of using every row. Tree ensembles get
+    TreeExplainer, linear models LinearExplainer and anything else a
+    permutation explainer over predict, as do tree models TreeExplainer
+    cannot read. The explain sample is split into chunks (`chunk_rows`, or
+    `slow_chunk_rows` for the permutation explainer) that run on a thread
+    pool; once `time_budget` seconds pass, the chunks finished so far are
+    used. Chunks not yet started are cancelled; ones already running cannot
+    be interrupted and finish in the background, their values discarded.
+    Values are cached under CACHE_DIR/shap keyed by a hash of the model and
+    the sample, so a report can be rebuilt without recomputing them.
+    """
+
+    def __init__(self, background_rows: int = 100, explain_rows: int = SHAP_ROWS, chunk_rows: int = 250,
+                 slow_chunk_rows: int = 2, time_budget: float = SHAP_BUDGET, n_jobs: int = None,
+                 max_display: int = 20, cache_dir: str = None, random_state: int = 42):
+        self.background_rows = background_rows
+        self.explain_rows = explain_rows
+        self.chunk_rows = chunk_rows
+        self.slow_chunk_rows = slow_chunk_rows
+        self.time_budget = time_budget
+        self.n_jobs = n_jobs or min(4, os.cpu_count() or 1)
+        self.max_display = max_display
+        self.cache_dir = cache_dir or os.path.join(CACHE_DIR, "shap")
+        self.random_state = random_state
+        # why the last explain() produced no plot, if it failed
+        self.error = None
+
     def _fig_to_base64(self, fig):
         buf = BytesIO()
         fig.savefig(buf, format="png", bbox_inches="tight")
         buf.seek(0)
         return base64.b64encode(buf.read()).decode()
 
-    def explain(self, model, df: pd.DataFrame, target: str):
-        X = df.drop(columns=[target])
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _unwrap(model):
+        """
+        Returns (estimator, to_matrix): the fitted final estimator and a
+        function mapping pipeline frames to that estimator's input.
+        """
+        if hasattr(model, "estimator") and hasattr(model, "matrix"):  # FastModel
+            return model.estimator, model.matrix
+        steps = getattr(model, "steps", None)
+        if steps and len(steps) > 1:
+            head = model[:-1]
+            return steps[-1][1], lambda X: head.transform(X)
+        return model, lambda X: X
+
+    @staticmethod
+    def _kind(estimator) -> str:
+        module = type(estimator).__module__
+        if module.startswith(TREE_MODULES):
+            return "tree"
+        if module.startswith(LINEAR_MODULES) and hasattr(estimator, "coef_"):
+            return "linear"
+        return "permutation"
+
+    def _sample(self, df: pd.DataFrame, target: str, rows: int, seed_offset: int = 0):
+        from .sampling_policy import SamplingPolicyAgent
 
+        if len(df) <= rows:
+            return df
+        return SamplingPolicyAgent(random_state=self.random_state + seed_offset).reservoir([df], rows, target)
+
+    def _explainer(self, kind, estimator, background, decode=None):
+        shap = _import_shap()
+
+        if kind == "tree":
+            return shap.TreeExplainer(estimator)
+        if kind == "linear":
+            return shap.LinearExplainer(estimator, background)
+        predict = getattr(estimator, "predict_proba", None) or estimator.predict
+        if decode is not None:
+            return shap.Explainer(lambda values: predict(decode(values)), background, algorithm="permutation")
+        return shap.Explainer(predict, background, algorithm="permutation")
+
+    @staticmethod
+    def _values(explainer, kind, chunk):
+        if kind == "permutation":
+            out = explainer(chunk, silent=True).values
+        else:
+            out = explainer.shap_values(chunk)
+        # multiclass: list of (n, f) per class or (n, f, c) -> mean |value| over classes
+        if isinstance(out, list):
+            out = np.mean([np.abs(np.asarray(v)) for v in out], axis=0)
+        out = np.asarray(out)
+        if out.ndim == 3:
+            out = np.abs(out).mean(axis=2)
+        return out
+
+    def _key(self, model, sample: pd.DataFrame) -> str:
+        from api.stage_cache import frame_hash
+
+        h = hashlib.sha256()
+        h.update(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+        h.update(frame_hash(sample).encode())
+        return h.hexdigest()[:24]
+
+    def _load(self, key):
+        path = os.path.join(self.cache_dir, f"{key}.npz")
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as z:
+            return z["values"], list(z["features"]), bool(z["complete"])
+
+    def _save(self, key, values, features, complete):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, f"{key}.npz")
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, values=values, features=np.asarray(features, dtype=str), complete=complete)
+        os.replace(tmp, path)
+
+    # ------------------------------------------------------------
+
+    def shap_values(self, model, df: pd.DataFrame, target: str):
+        """
+        Returns (values, feature_names, complete) for the explain sample,
+        where `complete` is False when the time budget cut it short.
+        """
+        sample = self._sample(df, target, self.explain_rows)
+        key = self._key(model, sample)
+        cached = self._load(key)
+        if cached is not None:
+            return cached
+
+        estimator, to_matrix = self._unwrap(model)
+        kind = self._kind(estimator)
+        X = sample.drop(columns=[target], errors="ignore")
+        Xm = to_matrix(X)
+        features = list(Xm.columns) if hasattr(Xm, "columns") else list(X.columns)
+        if len(features) != Xm.shape[1]:
+            features = [f"f{i}" for i in range(Xm.shape[1])]
+
+        def background():
+            bg = self._sample(df, target, self.background_rows, seed_offset=1).drop(columns=[target], errors="ignore")
+            return to_matrix(bg)
+
+        try:
+            if kind == "tree":
+                explainer = self._explainer(kind, estimator, None)
+            elif kind == "linear":
+                explainer = self._explainer(kind, estimator, background())
+            else:
+                Xm, bg, decode = _label_codes(Xm, background())
+                explainer = self._explainer(kind, estimator, bg, decode)
+        except Exception as e:
+            if kind != "tree":
+                raise
+            # e.g. AdaBoost, or XGBoost with categorical splits
+            logger.info("TreeExplainer unavailable (%s); using the permutation explainer", e)
+            kind = "permutation"
+            Xm, bg, decode = _label_codes(Xm, background())
+            explainer = self._explainer(kind, estimator, bg, decode)
+
+        rows = Xm.shape[0]
+        step = self.slow_chunk_rows if kind == "permutation" else self.chunk_rows
+        bounds = [(i, min(i + step, rows)) for i in range(0, rows, step)]
+        chunk = (lambda a, b: Xm.iloc[a:b]) if hasattr(Xm, "iloc") else (lambda a, b: Xm[a:b])
+
+        deadline = time.monotonic() + self.time_budget
+        done, error = {}, None
+        pool = ThreadPoolExecutor(max_workers=self.n_jobs)
         try:
-            explainer = shap.Explainer(model, X)
-            shap_values = explainer(X)
+            futures = {pool.submit(self._values, explainer, kind, chunk(a, b)): i for i, (a, b) in enumerate(bounds)}
+            pending = set(futures)
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                finished, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for f in finished:
+                    if f.exception() is None:
+                        done[futures[f]] = f.result()
+                    else:
+                        error = f.exception()
+        finally:
+            # drops queued chunks; running ones finish unobserved
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if not done:
+            if error is not None:
+                raise error
+            raise TimeoutError("no SHAP chunk finished within the time budget")
+        values = np.concatenate([done[i] for i in sorted(done)], axis=0)
+        complete = len(done) == len(bounds)
+        self._save(key, values, features, complete)
+        return values, features, complete
+
+    def explain(self, model, df: pd.DataFrame, target: str):
+        self.error = None
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+
+            values, features, complete = self.shap_values(model, df, target)
+            importance = np.abs(values).mean(axis=0)
+            order = np.argsort(importance)[::-1][: self.max_display][::-1]
 
-            fig = shap.plots.bar(shap_values, show=False)
-            enc = self._fig_to_base64(fig.figure)
+            fig, ax = plt.subplots(figsize=(7, max(2.5, 0.35 * len(order))))
+            ax.barh([features[i] for i in order], importance[order], color="#4fd2c2")
+            ax.set_xlabel("mean(|SHAP value|)")
+            title = f"SHAP feature importance ({len(values)} rows)"
+            ax.set_title(title if complete else title + " — partial, time budget reached")
+            enc = self._fig_to_base64(fig)
+            plt.close(fig)
             return [enc]
         except Exception as e:
-            print("SHAP failed:", e)
+            self.error = str(e)
+            logger.warning("SHAP failed: %s", e)
             return []
@@ -0,0 +1,268 @@
+# api/agents/fast_model_agent.py
+
+import os
+import time
+import numpy as np
+import pandas as pd
+
+FAST_ENGINE_ROWS = int(os.getenv("AUTOMIND_FAST_ENGINE_ROWS", "100000"))
+
+
+def native_frame(raw: pd.DataFrame, engineered: pd.DataFrame, base_columns) -> pd.DataFrame:
+    """
+    The frame the fast engine trains on: the typed input columns (string
+    and categorical columns untouched, datetimes as epoch seconds) plus the
+    columns feature engineering added to the preprocessed frame, i.e. those
+    of `engineered` that are not in `base_columns`. Both frames must be
+    row-aligned.
+    """
+    raw = raw.reset_index(drop=True)
+    data = {}
+    for col in raw.columns:
+        s = raw[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = (s - pd.Timestamp(0, tz=s.dt.tz)) / pd.Timedelta(seconds=1)
+        data[col] = s
+    base = set(base_columns)
+    added = [c for c in engineered.columns if c not in base and c not in data]
+    return pd.concat([pd.DataFrame(data), engineered[added].reset_index(drop=True)], axis=1)
+
+
+class FastModel:
+    """
+    A natively trained boosting model plus what is needed to feed it
+    pipeline frames: the feature list, training categories of categorical
+    columns and, for classifiers, the original class labels.
+    """
+
+    def __init__(self, estimator, engine, task, features, categories, classes=None, sparse=False):
+        self.estimator = estimator
+        self.engine = engine
+        self.task = task
+        self.features = features
+        self.categories = categories
+        self.classes_ = classes
+        self.sparse = sparse
+
+    def _csr(self):
+        # CatBoost takes the frame itself, sparse columns included
+        return self.sparse and self.engine != "catboost"
+
+    def matrix(self, df: pd.DataFrame):
+        X = df[self.features]
+        if self._csr():
+            from scipy import sparse
+            from .feature_matrix import split_xy
+            cats = list(self.categories)
+            M = split_xy(X.drop(columns=cats), None)[0]
+            if not cats:
+                return M
+            # categoricals ride along as code columns after the rest (see categorical_index)
+            codes = np.column_stack([pd.Categorical(X[c].astype(str), categories=self.categories[c]).codes
+                                     for c in cats]).astype(np.float32)
+            codes[codes < 0] = np.nan
+            return sparse.hstack([M, sparse.csr_matrix(codes)], format="csr")
+        if self.categories:
+            X = X.copy()
+            for col, cats in self.categories.items():
+                values = X[col].astype(str)
+                # CatBoost takes raw strings for its cat_features, the others pandas categoricals
+                X[col] = values if self.engine == "catboost" else pd.Categorical(values, categories=cats)
+        return X
+
+    def categorical_index(self, n_columns: int):
+        """Positions of the categorical code columns in a CSR matrix(), else None."""
+        if not self._csr() or not self.categories:
+            return None
+        return list(range(n_columns - len(self.categories), n_columns))
+
+    def predict(self, df: pd.DataFrame):
+        pred = np.asarray(self.estimator.predict(self.matrix(df))).ravel()
+        if self.task == "classification":
+            return self.classes_[pred.astype(int)]
+        return pred
+
+    def predict_proba(self, df: pd.DataFrame):
+        return self.estimator.predict_proba(self.matrix(df))
+
+    def __repr__(self):
+        return f"FastModel(engine={self.engine!r}, task={self.task!r}, estimator={self.estimator!r})"
+
+
+class FastModelTrainingAgent:
+    """
+    Gradient boosting trained directly with LightGBM / XGBoost / CatBoost.
+
+    Skips PyCaret's setup, preprocessing and model zoo: each installed
+    library trains once on its native histogram structures (categorical
+    dtypes stay categorical, sparse blocks go in as CSR with categoricals
+    appended as declared code columns) with early stopping
+    on a holdout split. The best engine is then refit on all rows for its
+    best iteration count. train() returns (model, leaderboard) like
+    ModelTrainingAgent.
+    """
+
+    ENGINES = ("lightgbm", "xgboost", "catboost")
+
+    def __init__(self, run_id, engines=ENGINES, holdout: float = 0.2, n_estimators: int = 2000,
+                 learning_rate: float = 0.1, early_stopping_rounds: int = 50, n_jobs: int = -1,
+                 refit: bool = True, max_categories: int = 1000, random_state: int = 42):
+        self.run_id = run_id
+        self.engines = engines
+        self.holdout = holdout
+        self.n_estimators = n_estimators
+        self.learning_rate = learning_rate
+        self.early_stopping_rounds = early_stopping_rounds
+        self.n_jobs = n_jobs
+        self.refit = refit
+        # string columns with more levels than this (free text, ids) are left out
+        self.max_categories = max_categories
+        self.random_state = random_state
+
+    # ------------------------------------------------------------
+
+    def _prepare(self, df: pd.DataFrame, target: str):
+        features, categories = [], {}
+        sparse = False
+        for col in df.columns:
+            if col == target:
+                continue
+            s = df[col]
+            if isinstance(s.dtype, pd.SparseDtype):
+                sparse = True
+                features.append(col)
+            elif pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+                features.append(col)
+            elif isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(s) \
+                    or pd.api.types.is_string_dtype(s):
+                levels = s.astype(str).unique()
+                if len(levels) <= self.max_categories:
+                    features.append(col)
+                    categories[col] = list(pd.Series(levels).sort_values())
+        return features, categories, sparse
+
+    def _split(self, n, y, task):
+        rng = np.random.default_rng(self.random_state)
+        if task == "classification":
+            valid = np.zeros(n, dtype=bool)
+            for cls in np.unique(y):
+                idx = np.flatnonzero(y == cls)
+                k = int(round(len(idx) * self.holdout))
+                valid[rng.choice(idx, k, replace=False)] = True
+        else:
+            valid = rng.random(n) < self.holdout
+        return np.flatnonzero(~valid), np.flatnonzero(valid)
+
+    def _estimator(self, engine, task, n_estimators, early_stopping, cat_cols, feature_types=None):
+        # None lets each library use every core it is allowed to
+        threads = None if self.n_jobs in (None, -1, 0) else self.n_jobs
+        clf = task == "classification"
+        if engine == "lightgbm":
+            import lightgbm as lgb
+            cls = lgb.LGBMClassifier if clf else lgb.LGBMRegressor
+            return cls(n_estimators=n_estimators, learning_rate=self.learning_rate, n_jobs=threads,
+                       random_state=self.random_state, verbose=-1)
+        if engine == "xgboost":
+            import xgboost as xgb
+            cls = xgb.XGBClassifier if clf else xgb.XGBRegressor
+            return cls(n_estimators=n_estimators, learning_rate=self.learning_rate, n_jobs=threads,
+                       tree_method="hist", enable_categorical=True, feature_types=feature_types,
+                       random_state=self.random_state,
+                       early_stopping_rounds=self.early_stopping_rounds if early_stopping else None)
+        if engine == "catboost":
+            import catboost as cb
+            cls = cb.CatBoostClassifier if clf else cb.CatBoostRegressor
+            return cls(iterations=n_estimators, learning_rate=self.learning_rate, thread_count=threads or -1,
+                       random_seed=self.random_state, verbose=False, allow_writing_files=False,
+                       cat_features=cat_cols or None,
+                       early_stopping_rounds=self.early_stopping_rounds if early_stopping else None)
+        raise ValueError(f"unknown engine: {engine}")
+
+    def _fit(self, engine, est, X, y, Xv=None, yv=None, cat_index=None):
+        # LightGBM learns which CSR columns are categorical at fit time
+        kwargs = {"categorical_feature": cat_index} if engine == "lightgbm" and cat_index else {}
+        if Xv is None:
+            est.fit(X, y, **kwargs) if engine != "xgboost" else est.fit(X, y, verbose=False)
+            return est, None
+        if engine == "lightgbm":
+            import lightgbm as lgb
+            est.fit(X, y, eval_set=[(Xv, yv)], **kwargs,
+                    callbacks=[lgb.early_stopping(self.early_stopping_rounds, verbose=False)])
+            return est, est.best_iteration_
+        if engine == "xgboost":
+            est.fit(X, y, eval_set=[(Xv, yv)], verbose=False)
+            return est, est.best_iteration + 1
+        est.fit(X, y, eval_set=(Xv, yv))
+        return est, est.get_best_iteration() + 1
+
+    @staticmethod
+    def _score(task, y, pred):
+        if task == "classification":
+            return {"Accuracy": float(np.mean(pred == y))}
+        resid = y - pred
+        ss_tot = float(np.sum((y - y.mean()) ** 2)) or 1.0
+        return {"R2": 1.0 - float(np.sum(resid ** 2)) / ss_tot, "RMSE": float(np.sqrt(np.mean(resid ** 2)))}
+
+    # ------------------------------------------------------------
+
+    def train(self, df: pd.DataFrame, target: str, task: str, tune_rounds: int = 10):
+        df = df[df[target].notna()].reset_index(drop=True)
+        features, categories, sparse = self._prepare(df, target)
+
+        classes = None
+        if task == "classification":
+            codes, classes = pd.factorize(df[target], sort=True)
+            y = codes
+            classes = np.asarray(classes)
+        else:
+            y = pd.to_numeric(df[target], errors="coerce").to_numpy(dtype=np.float64)
+
+        tr, va = self._split(len(df), y, task)
+        sort = "Accuracy" if task == "classification" else "R2"
+        leaderboard, fitted = [], {}
+
+        for engine in self.engines:
+            wrapper = FastModel(None, engine, task, features, categories, classes, sparse)
+            X = wrapper.matrix(df)
+            cat_index = wrapper.categorical_index(X.shape[1])
+            feature_types = None
+            if cat_index:
+                feature_types = ["c" if i in cat_index else "q" for i in range(X.shape[1])]
+            try:
+                t0 = time.perf_counter()
+                est = self._estimator(engine, task, self.n_estimators, True, list(categories), feature_types)
+                est, best_iter = self._fit(engine, est, _rows(X, tr), y[tr], _rows(X, va), y[va], cat_index)
+                wrapper.estimator = est
+                seconds = time.perf_counter() - t0
+            except ImportError:
+                continue
+            except Exception as e:
+                leaderboard.append({"ID": engine, "Model": f"{engine} (native)", "error": str(e)})
+                continue
+
+            pred = np.asarray(est.predict(_rows(X, va))).ravel()
+            leaderboard.append({
+                "ID": engine,
+                "Model": f"{engine} (native)",
+                **self._score(task, y[va], pred.astype(int) if task == "classification" else pred),
+                "best_iteration": int(best_iter) if best_iter else None,
+                "TT (Sec)": round(seconds, 4),
+                "rows": int(len(tr)),
+                "holdout_rows": int(len(va)),
+            })
+            fitted[engine] = (wrapper, X, best_iter, cat_index, feature_types)
+
+        leaderboard.sort(key=lambda r: -float(r.get(sort, float("-inf"))))
+        if not fitted:
+            raise RuntimeError("no boosting library could be trained")
+
+        best = next(r["ID"] for r in leaderboard if r["ID"] in fitted)
+        wrapper, X, best_iter, cat_index, feature_types = fitted[best]
+        if self.refit and best_iter:
+            est = self._estimator(best, task, best_iter, False, list(categories), feature_types)
+            wrapper.estimator, _ = self._fit(best, est, X, y, cat_index=cat_index)
+        return wrapper, leaderboard
+
+
+def _rows(X, idx):
+    return X.iloc[idx] if isinstance(X, pd.DataFrame) else X[idx]
@@ -2,34 +2,129 @@
 
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import PolynomialFeatures
 
 
 class FeatureEngineeringAgent:
+    """
+    Date-part extraction plus degree-2 polynomial features under a budget.
+
+    When the number of candidate terms (squares and pairwise products of the
+    numeric columns) exceeds `max_features`, candidates are screened by their
+    absolute correlation with the target on a row sample and only the best
+    `max_features` are materialized, as float32.
+
+    The columns chosen by transform() are kept on `date_cols_` and `pairs_`
+    so apply() can rebuild them on new data without the target.
+    """
+
+    def __init__(self, max_features: int = 100, sample_rows: int = 20_000, random_state: int = 42):
+        self.max_features = max_features
+        self.sample_rows = sample_rows
+        self.random_state = random_state
+        self.date_cols_ = []
+        self.pairs_ = []
+
+    def _target_vector(self, y: pd.Series) -> np.ndarray:
+        if pd.api.types.is_numeric_dtype(y) and not pd.api.types.is_bool_dtype(y):
+            return pd.to_numeric(y, errors="coerce").to_numpy(dtype=np.float64)
+        return pd.factorize(y)[0].astype(np.float64)
+
+    def _screen_pairs(self, df: pd.DataFrame, num_cols, target: str):
+        """
+        Returns candidate (i, j) index pairs (i <= j) ordered by score, best first.
+        """
+        p = len(num_cols)
+        n_pairs = p * (p + 1) // 2
+        if self.max_features is None or n_pairs <= self.max_features or target not in df.columns:
+            pairs = [(i, j) for i in range(p) for j in range(i, p)]
+            return pairs[: self.max_features] if self.max_features is not None else pairs
+
+        n = len(df)
+        if n > self.sample_rows:
+            rows = np.random.default_rng(self.random_state).choice(n, self.sample_rows, replace=False)
+            sample = df.iloc[np.sort(rows)]
+        else:
+            sample = df
+
+        X = np.nan_to_num(sample[num_cols].to_numpy(dtype=np.float64))
+        y = np.nan_to_num(self._target_vector(sample[target]))
+        y = y - y.mean()
+        y_norm = np.linalg.norm(y) or 1.0
+
+        # corr(x_i * x_j, y) for every pair at once from three p x p products,
+        # without materializing any of the candidate columns
+        X2 = X * X
+        mean_prod = (X.T @ X) / len(X)
+        cov_y = (X * y[:, None]).T @ X
+        ss_prod = X2.T @ X2 - len(X) * mean_prod ** 2
+        norms = np.sqrt(np.clip(ss_prod, 0, None))
+        norms[norms == 0] = np.inf
+        score_mat = np.abs(cov_y) / (norms * y_norm)
+
+        iu, ju = np.triu_indices(p)
+        scores = score_mat[iu, ju]
+        order = np.argsort(-scores, kind="stable")[: self.max_features]
+        return [(int(iu[o]), int(ju[o])) for o in order]
+
+    @staticmethod
+    def _date_parts(df, col, new_cols):
+        new_cols[f"{col}_year"] = df[col].dt.year
+        new_cols[f"{col}_month"] = df[col].dt.month
+        new_cols[f"{col}_day"] = df[col].dt.day
+        new_cols[f"{col}_dow"] = df[col].dt.dayofweek
+
     def transform(self, df: pd.DataFrame, target: str) -> pd.DataFrame:
-        df = df.copy()
+        new_cols = {}
+        self.date_cols_, self.pairs_ = [], []
 
         # ---- Date part extraction ----
         for col in df.columns:
             if pd.api.types.is_datetime64_any_dtype(df[col]):
-                df[f"{col}_year"] = df[col].dt.year
-                df[f"{col}_month"] = df[col].dt.month
-                df[f"{col}_day"] = df[col].dt.day
-                df[f"{col}_dow"] = df[col].dt.dayofweek
+                self._date_parts(df, col, new_cols)
+                self.date_cols_.append(col)
 
-        # ---- Polynomial features ----
-        num_cols = [c for c in df.select_dtypes(include=[np.number]).columns if c != target]
+        # ---- Polynomial features (bounded) ----
+        num_cols = [
+            c for c in df.select_dtypes(include=[np.number]).columns
+            if c != target and not isinstance(df[c].dtype, pd.SparseDtype)
+        ]
 
         if len(num_cols) > 0:
             try:
-                poly = PolynomialFeatures(degree=2, include_bias=False)
-                poly_vals = poly.fit_transform(df[num_cols])
-                poly_df = pd.DataFrame(poly_vals, columns=poly.get_feature_names_out(num_cols))
-                df = pd.concat([df, poly_df], axis=1)
-            except:
+                pairs = self._screen_pairs(df, num_cols, target)
+                values = {c: df[c].to_numpy(dtype=np.float32) for c in {num_cols[i] for p in pairs for i in p}}
+                for i, j in pairs:
+                    a, b = num_cols[i], num_cols[j]
+                    name = f"{a}^2" if i == j else f"{a} {b}"
+                    if name not in df.columns:
+                        new_cols[name] = values[a] * values[b]
+                        self.pairs_.append((a, b))
+            except Exception:
                 pass
 
+        return self._assemble(df, new_cols)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Rebuilds the date parts and products chosen by the last transform().
+        """
+        new_cols = {}
+        for col in self.date_cols_:
+            if col in df.columns:
+                self._date_parts(df, col, new_cols)
+        for a, b in self.pairs_:
+            if a in df.columns and b in df.columns:
+                name = f"{a}^2" if a == b else f"{a} {b}"
+                new_cols[name] = df[a].to_numpy(dtype=np.float32) * df[b].to_numpy(dtype=np.float32)
+        return self._assemble(df, new_cols)
+
+    @staticmethod
+    def _assemble(df, new_cols):
+        if new_cols:
+            df = pd.concat([df, pd.DataFrame(new_cols, index=df.index)], axis=1)
+
         # Remove duplicates
-        df = df.loc[:, ~df.columns.duplicated()]
+        if df.columns.has_duplicates:
+            df = df.loc[:, ~df.columns.duplicated()]
 
         return df
@@ -0,0 +1,39 @@
+# api/agents/feature_matrix.py
+"""
+Model-ready design matrices from pipeline frames.
+
+Preprocessing and text featurization leave wide blocks as pandas sparse
+columns. split_xy() keeps those blocks sparse: dense columns are converted
+once and stacked next to the sparse block as a single CSR matrix, so
+estimators that accept scipy.sparse input never see a densified copy.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def sparse_columns(df: pd.DataFrame):
+    return [c for c in df.columns if isinstance(df[c].dtype, pd.SparseDtype)]
+
+
+def split_xy(df: pd.DataFrame, target: str, dtype=np.float32):
+    """
+    Returns (X, y, feature_names). X is CSR when `df` has sparse columns,
+    otherwise a dense ndarray.
+    """
+    y = df[target] if target in df.columns else None
+    features = df.drop(columns=[target]) if y is not None else df
+
+    sparse_cols = set(sparse_columns(features))
+    if not sparse_cols:
+        return features.to_numpy(dtype=dtype), y, list(features.columns)
+
+    dense_cols = [c for c in features.columns if c not in sparse_cols]
+    sparse_cols = [c for c in features.columns if c in sparse_cols]
+    blocks = []
+    if dense_cols:
+        blocks.append(sparse.csr_matrix(features[dense_cols].to_numpy(dtype=dtype)))
+    blocks.append(features[sparse_cols].astype(pd.SparseDtype(dtype, 0)).sparse.to_coo())
+    X = sparse.hstack(blocks, format="csr", dtype=dtype)
+    return X, y, dense_cols + sparse_cols
@@ -2,19 +2,22 @@
 
 import os
 import uuid
-import json
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, Any
 
+import pandas as pd
+
 from .data_loader import DataLoaderAgent
 from .target_detector import TargetDetectorAgent
 from .problem_type_detector import ProblemTypeDetectorAgent
 from .eda_agent import EDAAgent
+from .column_stats import ColumnStats
 from .preprocessing_agent import PreprocessingAgent
 from .feature_engineering_agent import FeatureEngineeringAgent
 from .advanced_feature_engineering import AdvancedFeatureEngineeringAgent
 from .sampling_policy import SamplingPolicyAgent
 from .model_agent import ModelTrainingAgent
+from .fast_model_agent import FastModelTrainingAgent, FAST_ENGINE_ROWS, native_frame
 from .timeseries_agent import TimeSeriesAgent
 from .evaluation_agent import EvaluationAgent
 from .explainability_agent import ExplainabilityAgent
@@ -24,13 +27,22 @@ from .report_agent import ReportAgent
 from .llm_agent import LLMReasoner
 
 from api.monitoring import emit_event
+from api.dataset_store import dataset_store
+from api.model_registry import ModelBundle, model_registry
+from api.run_store import run_store
+from api.artifact_builder import ArtifactBuilder
+from api.stage_cache import StageCache, MISSING, code_version, frame_hash
+from api.dag import DAGExecutor, Stage, MAX_WORKERS
+from api.profiling import StageProfiler, frame_stats
 
 class AutoMindMasterAgent:
     """
     Orchestrates the complete AutoMind DS-Agent pipeline.
     """
 
-    def __init__(self, run_id=None, template_dir="api/templates"):
+    def __init__(self, run_id=None, template_dir="api/templates", stage_cache=None,
+                 max_workers=MAX_WORKERS, stage_timeouts=None, n_jobs=None,
+                 artifact_codec=None, artifact_level=None):
         self.run_id = run_id or (datetime.utcnow().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:6])
         self.template_dir = template_dir
 
@@ -40,10 +52,48 @@ class AutoMindMasterAgent:
 
         self.llm = LLMReasoner()
         self.report_agent = ReportAgent(template_dir=template_dir)
+        self.stage_cache = stage_cache or StageCache()
+        self.max_workers = max_workers
+        # optional {stage_name: seconds}; a timed-out stage falls back like a failed one
+        self.stage_timeouts = stage_timeouts or {}
+        # cores model training may use; None keeps ModelTrainingAgent's default
+        self.n_jobs = n_jobs
+        # ZIP codec/level for the artifact bundle; None uses AUTOMIND_ARTIFACT_CODEC/_LEVEL
+        self.artifact_codec = artifact_codec
+        self.artifact_level = artifact_level
 
     def _log(self, step: str, status: str, details: Dict[str, Any] = None):
         emit_event(self.run_id, step, status, details or {})
 
+    def _record_profile(self, stage: str, profile: Dict[str, Any]):
+        self._profile.append({"stage": stage, **profile})
+        self._log(stage, "profile", profile)
+
+    def _profile_summary(self) -> Dict[str, Any]:
+        stages = list(self._profile)
+        return {
+            "stages": stages,
+            "stage_wall_s": round(sum(p.get("wall_s") or 0.0 for p in stages), 6),
+            "stage_cpu_s": round(sum(p.get("cpu_s") or 0.0 for p in stages), 6),
+        }
+
+    def _cached(self, stage: str, agent, input_key: str, params: Dict[str, Any], compute):
+        """
+        Returns (value, key). `compute` only runs on a cache miss; its result
+        is stored under a key derived from the input key, params and the
+        agent's code version, which doubles as the input key of the next stage.
+        """
+        key = self.stage_cache.key(stage, input_key, params, agent)
+        value = self.stage_cache.get(stage, key)
+        if value is not MISSING:
+            self._log(stage, "cache_hit", {"key": key})
+            return value, key
+
+        self._log(stage, "cache_miss", {"key": key})
+        value = compute()
+        self.stage_cache.put(stage, key, value)
+        return value, key
+
     # ------------------------------------------------------------
 
     def run_pipeline(
@@ -54,26 +104,179 @@ class AutoMindMasterAgent:
         tune_rounds=10,
         advanced_fe=False,
         sample_frac=None,
-        notebook=True
+        notebook=True,
+        dataset_id=None,
+        sample_rows=None,
+        time_col=None,
+        half_life=None,
+        tune_budget=None,
+        engine=None
     ):
 
         self._log("pipeline", "start", {"run_id": self.run_id})
+        self._profile = []
+        pipeline_prof = StageProfiler().start()
+
         # ========================== 1. Load Data ==========================
         self._log("load_data", "start")
 
         loader = DataLoaderAgent()
+        cached = df is None and dataset_id is not None
+        load_prof = StageProfiler().start()
         try:
-            df = loader.load(df)
+            if cached:
+                if not dataset_store.has(dataset_id):
+                    raise ValueError(f"dataset {dataset_id} not found in cache")
+                if sample_rows:
+                    df = loader.sample_chunks(dataset_store.iter_batches(dataset_id), sample_rows,
+                                              target_override, time_col, half_life)
+                else:
+                    df = dataset_store.load(dataset_id)
+            else:
+                # A path means a spooled upload: stream it in typed chunks
+                # (through a reservoir when only `sample_rows` rows are wanted)
+                if isinstance(df, str):
+                    df, ingest_report = loader.read_csv(df, sample_rows, target_override, time_col, half_life)
+                    self._log("ingest", "complete", ingest_report)
+                elif sample_rows:
+                    df = loader.sample_chunks([df], sample_rows, target_override, time_col, half_life)
+                df = loader.load(df)
         except Exception as e:
             self._log("load_data", "error", {"error": str(e)})
             raise
 
+        # Only full datasets go to the store
+        if dataset_id and not cached and not sample_rows:
+            try:
+                dataset_store.save(dataset_id, df)
+            except Exception as e:
+                self._log("dataset_cache", "error", {"error": str(e)})
+        load_prof.stop()
+        self._record_profile("load_data", {"outcome": "ok", "outputs": {"df": frame_stats(df)}, **load_prof.to_dict()})
+
         self._log("load_data", "complete", {
             "rows": int(df.shape[0]),
-            "cols": int(df.shape[1])
+            "cols": int(df.shape[1]),
+            "dataset_id": dataset_id,
+            "cached": cached,
+            "sample_rows": sample_rows
         })
 
-        # ======================= 2. LLM: EDA Plan ========================
+        # Lineage key of the loaded frame; each cached stage derives its own from it
+        if dataset_id:
+            df_key = f"{dataset_id}:{code_version(DataLoaderAgent)}"
+            if sample_rows:
+                df_key += (f":{code_version(SamplingPolicyAgent)}:{sample_rows}:{target_override}:{time_col}"
+                           f":{half_life}")
+        else:
+            df_key = frame_hash(df) if self.stage_cache.enabled else ""
+
+        ctx = {
+            "df": df,
+            "df_key": df_key,
+            "autodetect_target": autodetect_target,
+            "target_override": target_override,
+            "tune_rounds": tune_rounds,
+            "tune_budget": tune_budget,
+            "engine": engine,
+            "dataset_id": dataset_id,
+            "advanced_fe": advanced_fe,
+            "sample_frac": sample_frac,
+            "time_col": time_col,
+            "half_life": half_life,
+            "notebook": notebook,
+            "report_path": f"reports/report_{self.run_id}.html",
+            "artifact_path": f"artifacts/artifact_{self.run_id}.zip",
+        }
+
+        # Stages add their outputs to the artifact ZIP as they finish
+        self.artifacts = ArtifactBuilder(ctx["artifact_path"], self.artifact_codec, self.artifact_level)
+
+        # Steps 2-21 run as a dependency graph; independent stages overlap
+        try:
+            DAGExecutor(self._stages(), max_workers=self.max_workers, on_stage_end=self._record_profile).run(ctx)
+        except BaseException:
+            self.artifacts.abort()
+            raise
+
+        pipeline_prof.stop()
+        profile = self._profile_summary()
+        profile["wall_s"] = round(pipeline_prof.wall_s, 6)
+        try:
+            # the row was written before the final stage finished; complete its timings
+            run_store.update_timings(self.run_id, profile["wall_s"], self._stage_timings())
+        except Exception as e:
+            self._log("run_history", "warning", {"error": str(e)})
+
+        self._log("pipeline", "complete", {"run_id": self.run_id, "wall_s": profile["wall_s"]})
+        return {
+            "run_id": self.run_id,
+            "dataset_id": dataset_id,
+            "report": ctx["report_path"],
+            "notebook": ctx["nb_path"],
+            "artifact": ctx["artifact_path"],
+            "metrics": ctx["metrics"],
+            "leaderboard": ctx["lb_serial"],
+            "narrative": ctx["narrative"],
+            "preprocessor": ctx["preprocessor_path"],
+            "model_path": ctx.get("model_path"),
+            "profile": profile
+        }
+
+    def _stages(self):
+        timeout = self.stage_timeouts.get
+        return [
+            Stage("llm_eda_plan", self._llm_eda_plan, timeout=timeout("llm_eda_plan"),
+                  fallback=lambda ctx, e: self._log("llm_eda_plan", "error", {"error": str(e)})),
+            Stage("column_profile", self._column_profile, frames=["df"]),
+            Stage("target_detect", self._target_detect, deps=["column_profile"]),
+            Stage("problem_detect", self._problem_detect, deps=["target_detect"]),
+            Stage("eda", self._eda, deps=["target_detect"], locks=["pyplot"], frames=["df"]),
+            Stage("holdout", self._holdout, deps=["problem_detect"],
+                  fallback=self._holdout_failed, timeout=timeout("holdout"), frames=["df"]),
+            Stage("preprocess", self._preprocess, deps=["holdout"],
+                  fallback=self._preprocess_failed, timeout=timeout("preprocess"), frames=["df_train"]),
+            Stage("feature_engineering", self._feature_engineering, deps=["preprocess"],
+                  fallback=self._feature_engineering_failed, timeout=timeout("feature_engineering"), frames=["df_pre"]),
+            Stage("advanced_fe", self._advanced_fe, deps=["feature_engineering"],
+                  fallback=self._step_failed("advanced_fe", adv_agent=None), timeout=timeout("advanced_fe"), frames=["df_fe"]),
+            Stage("holdout_features", self._holdout_features, deps=["sampling"],
+                  fallback=self._step_failed("holdout_features", df_holdout=None),
+                  timeout=timeout("holdout_features"), frames=["df_holdout_raw"]),
+            Stage("sampling", self._sampling, deps=["advanced_fe"],
+                  fallback=self._sampling_failed, timeout=timeout("sampling"), frames=["df_fe"]),
+            Stage("model_training", self._model_training, deps=["sampling", "problem_detect"],
+                  fallback=self._model_training_failed, timeout=timeout("model_training"), frames=["df_fe"]),
+            Stage("register_model", self._register_model, deps=["model_training"],
+                  fallback=self._step_failed("register_model", model_path=None), timeout=timeout("register_model")),
+            Stage("evaluation", self._evaluation, deps=["model_training", "holdout_features"],
+                  fallback=self._evaluation_failed, timeout=timeout("evaluation"), frames=["df_holdout"]),
+            Stage("explainability", self._explainability, deps=["model_training"], locks=["pyplot"],
+                  fallback=self._step_failed("explainability", shap_images=[]), timeout=timeout("explainability"), frames=["df_fe"]),
+            Stage("narrative", self._narrative, deps=["evaluation"],
+                  fallback=self._narrative_failed, timeout=timeout("narrative")),
+            Stage("notebook", self._notebook, deps=["evaluation", "explainability"],
+                  fallback=self._step_failed("notebook", nb_path=None), timeout=timeout("notebook")),
+            Stage("report_build", self._report_build, deps=["eda", "evaluation", "explainability", "narrative"],
+                  fallback=self._step_failed("report_build"), timeout=timeout("report_build")),
+            Stage("artifact", self._artifact, deps=["report_build", "notebook", "register_model"],
+                  fallback=self._artifact_failed, timeout=timeout("artifact")),
+            Stage("run_history", self._run_history, deps=["artifact"],
+                  fallback=lambda ctx, e: None),
+        ]
+
+    def _step_failed(self, step: str, **defaults):
+        """
+        Fallback for stages whose failure is logged and otherwise ignored.
+        """
+        def fallback(ctx, e):
+            self._log(step, "error", {"error": str(e)})
+            return defaults
+        return fallback
+
+    # ======================= 2. LLM: EDA Plan ========================
+    def _llm_eda_plan(self, ctx):
+        df = ctx["df"]
         self._log("llm_eda_plan", "start")
         plan = self.llm.think(
             "EDA",
@@ -81,90 +284,216 @@ class AutoMindMasterAgent:
             "Suggest EDA checks and visuals."
         )
         self._log("llm_eda_plan", "complete", {"plan": plan})
+        return {"plan": plan}
+
+    # ====================== 3. Column Profile =======================
+    def _column_profile(self, ctx):
+        df = ctx["df"]
+        self._log("column_profile", "start")
+        eda = EDAAgent()
+        stats, _ = self._cached(
+            "column_profile", ColumnStats, ctx["df_key"], {"sample_rows": eda.sample_rows},
+            lambda: eda.profile(df)
+        )
+        self._log("column_profile", "complete", {"rows": stats.rows, "sampled_rows": len(stats.sample)})
+        return {"column_stats": stats}
 
-        # ==================== 3. Target Detection ========================
+    # ==================== 4. Target Detection ========================
+    def _target_detect(self, ctx):
+        df = ctx["df"]
         self._log("target_detect", "start")
         detector = TargetDetectorAgent()
-        target = detector.detect(df, target_override, autodetect_target)
+        target, _ = self._cached(
+            "target_detect", detector, ctx["df_key"],
+            {"override": ctx["target_override"], "autodetect": ctx["autodetect_target"]},
+            lambda: detector.detect(df, ctx["target_override"], ctx["autodetect_target"], ctx["column_stats"])
+        )
         self._log("target_detect", "complete", {"target": target})
+        return {"target": target}
 
-        # ================== 4. Problem Type Detection ====================
+    # ================== 5. Problem Type Detection ====================
+    def _problem_detect(self, ctx):
+        df, target = ctx["df"], ctx["target"]
         self._log("problem_detect", "start")
         type_agent = ProblemTypeDetectorAgent()
-        task_type = type_agent.detect(df, target)
+        task_type, _ = self._cached(
+            "problem_detect", type_agent, ctx["df_key"], {"target": target},
+            lambda: type_agent.detect(df, target, ctx["column_stats"])
+        )
         self._log("problem_detect", "complete", {"task": task_type})
+        return {"task_type": task_type}
 
-        # ============================ 5. EDA =============================
+    # ============================ 6. EDA =============================
+    def _eda(self, ctx):
+        df, target = ctx["df"], ctx["target"]
         self._log("eda", "start")
         eda = EDAAgent()
-        eda_summary, eda_images = eda.analyze(df, target)
+        (eda_summary, eda_images), _ = self._cached(
+            "eda", eda, ctx["df_key"], {"target": target},
+            lambda: eda.analyze(df, target, ctx["column_stats"])
+        )
+        if "plots_error" in eda_summary:
+            self._log("eda", "error", {"error": f"EDA plots failed: {eda_summary['plots_error']}"})
         self._log("eda", "complete", {
             "summary": list(eda_summary.keys()),
             "img_count": len(eda_images)
         })
-
-        # ======================== 6. Preprocessing =======================
+        self.artifacts.add_images("eda", eda_images)
+        return {"eda_summary": eda_summary, "eda_images": eda_images}
+
+    # ======================== 7. Holdout Split ======================
+    def _holdout(self, ctx):
+        """
+        Rows set aside for evaluation before anything is fitted on the
+        target, so preprocessing, feature screening and target encoding
+        only ever see training labels.
+        """
+        sampler = SamplingPolicyAgent()
+        df_train, df_holdout = sampler.holdout_split(ctx["df"], ctx["target"], ctx["task_type"])
+        # the split is deterministic, so its key only needs the inputs
+        train_key = self.stage_cache.key("holdout", ctx["df_key"],
+                                         {"target": ctx["target"], "task": ctx["task_type"]}, sampler)
+        self._log("holdout", "complete", {"train_rows": int(len(df_train)),
+                                          "holdout_rows": int(len(df_holdout)) if df_holdout is not None else 0})
+        return {"df_train": df_train, "train_key": train_key, "df_holdout_raw": df_holdout}
+
+    def _holdout_failed(self, ctx, e):
+        self._log("holdout", "error", {"error": str(e)})
+        return {"df_train": ctx["df"], "train_key": ctx["df_key"], "df_holdout_raw": None}
+
+    # ======================== 8. Preprocessing =======================
+    def _preprocess(self, ctx):
+        df, target = ctx["df_train"], ctx["target"]
         self._log("preprocess", "start")
         prep = PreprocessingAgent()
-        try:
-            df_pre = prep.process(df, target)
-            self._log("preprocess", "complete", {
-                "rows": int(df_pre.shape[0]),
-                "cols": int(df_pre.shape[1])
-            })
-        except Exception as e:
-            self._log("preprocess", "error", {"error": str(e)})
-            df_pre = df.copy()
+        # cache the fitted agent with its output so a hit can still save the transformer
+        (df_pre, prep), pre_key = self._cached(
+            "preprocess", prep, ctx["train_key"], {"target": target},
+            lambda: (prep.process(df, target), prep)
+        )
+        preprocessor_path = prep.save(f"artifacts/preprocessor_{self.run_id}.joblib")
+        self.artifacts.add_file(preprocessor_path)
+        self._log("preprocess", "complete", {
+            "rows": int(df_pre.shape[0]),
+            "cols": int(df_pre.shape[1]),
+            "sparse_cols": int(sum(isinstance(t, pd.SparseDtype) for t in df_pre.dtypes)),
+            "transformer": preprocessor_path
+        })
+        return {"df_pre": df_pre, "pre_key": pre_key, "preprocessor_path": preprocessor_path, "preprocessor": prep,
+                "pre_columns": list(df_pre.columns)}
 
-        # ===================== 7. Basic FE ===============================
+    def _preprocess_failed(self, ctx, e):
+        self._log("preprocess", "error", {"error": str(e)})
+        return {"df_pre": ctx["df_train"].copy(), "pre_key": ctx["train_key"], "preprocessor_path": None,
+                "preprocessor": None, "pre_columns": list(ctx["df_train"].columns)}
+
+    # ===================== 9. Basic FE ===============================
+    def _feature_engineering(self, ctx):
+        df_pre, target = ctx["df_pre"], ctx["target"]
         self._log("feature_engineering", "start")
         fe = FeatureEngineeringAgent()
-        try:
-            df_fe = fe.transform(df_pre, target)
-        except Exception:
-            df_fe = df_pre.copy()
+        # cached with the agent so its chosen columns can be replayed at prediction time
+        (df_fe, fe), fe_key = self._cached(
+            "feature_engineering", fe, ctx["pre_key"], {"target": target, "max_features": fe.max_features},
+            lambda: (fe.transform(df_pre, target), fe)
+        )
         self._log("feature_engineering", "complete", {"cols": int(df_fe.shape[1])})
+        return {"df_fe": df_fe, "fe_key": fe_key, "fe_agent": fe}
 
-        # ==================== 8. Advanced FE (Optional) =================
-        if advanced_fe:
-            self._log("advanced_fe", "start")
-            adv = AdvancedFeatureEngineeringAgent()
-            try:
-                df_fe = adv.enhance(df_fe, target)
-                self._log("advanced_fe", "complete", {"cols": int(df_fe.shape[1])})
-            except Exception as e:
-                self._log("advanced_fe", "error", {"error": str(e)})
-
-        # ========================= 9. Sampling ===========================
-        if sample_frac:
-            self._log("sampling", "start")
-            sampler = SamplingPolicyAgent()
-            try:
-                df_fe = sampler.sample(df_fe, target)
-                self._log("sampling", "complete", {"rows": int(df_fe.shape[0])})
-            except Exception as e:
-                self._log("sampling", "error", {"error": str(e)})
-
-        # ========================= 10. Modeling ==========================
+    def _feature_engineering_failed(self, ctx, e):
+        df_fe = ctx["df_pre"].copy()
+        self._log("feature_engineering", "complete", {"cols": int(df_fe.shape[1])})
+        return {"df_fe": df_fe, "fe_key": ctx["pre_key"], "fe_agent": None}
+
+    # ==================== 10. Advanced FE (Optional) =================
+    def _advanced_fe(self, ctx):
+        if not ctx["advanced_fe"]:
+            return {"adv_agent": None}
+        df_fe, target = ctx["df_fe"], ctx["target"]
+        self._log("advanced_fe", "start")
+        adv = AdvancedFeatureEngineeringAgent()
+        (df_fe, adv), fe_key = self._cached(
+            "advanced_fe", adv, ctx["fe_key"], {"target": target, "text_mode": adv.text_mode},
+            lambda: (adv.enhance(df_fe, target, source=ctx["df_train"]), adv)
+        )
+        self._log("advanced_fe", "complete", {"cols": int(df_fe.shape[1])})
+        return {"df_fe": df_fe, "fe_key": fe_key, "adv_agent": adv}
+
+    # =================== 11. Holdout Features ======================
+    def _holdout_features(self, ctx):
+        """
+        Replays the transforms fitted on the training rows on the holdout.
+        """
+        raw = ctx["df_holdout_raw"]
+        if raw is None:
+            return {"df_holdout": None}
+        df_holdout = ctx["preprocessor"].transform(raw) if ctx["preprocessor"] is not None else raw.copy()
+        if ctx["fe_agent"] is not None:
+            df_holdout = ctx["fe_agent"].apply(df_holdout)
+        if ctx["adv_agent"] is not None:
+            df_holdout = ctx["adv_agent"].apply(df_holdout, source=raw)
+        if ctx["native_base"] is not None:
+            df_holdout = native_frame(raw, df_holdout, ctx["native_base"])
+        self._log("holdout_features", "complete", {"rows": int(len(df_holdout)), "cols": int(df_holdout.shape[1])})
+        return {"df_holdout": df_holdout}
+
+    # ========================= 12. Sampling ==========================
+    def _sampling(self, ctx):
+        """
+        Picks the engine and samples the frame it trains on. From here on
+        `df_fe` is that frame: the engineered features for PyCaret, the
+        typed input columns plus engineered ones for the fast engine, which
+        handles categoricals natively instead of through one-hot columns.
+        """
+        self._log("sampling", "start")
+        # "fast" trains LightGBM/XGBoost/CatBoost natively; auto picks it for large tables
+        engine = ctx["engine"] or ("fast" if len(ctx["df"]) >= FAST_ENGINE_ROWS else "pycaret")
+        df_fe = ctx["df_fe"]
+        native_base = ctx["pre_columns"] if engine == "fast" and ctx["task_type"] != "timeseries" else None
+        if native_base is not None:
+            df_fe = native_frame(ctx["df_train"], df_fe, native_base)
+        sampler = SamplingPolicyAgent()
+        df_fe, info = sampler.policy(df_fe, ctx["target"], ctx["task_type"],
+                                     frac=ctx["sample_frac"], time_col=ctx["time_col"],
+                                     half_life=ctx["half_life"])
+        self._log("sampling", "complete", {**info, "engine": engine})
+        return {"df_fe": df_fe, "engine": engine, "native_base": native_base}
+
+    def _sampling_failed(self, ctx, e):
+        self._log("sampling", "error", {"error": str(e)})
+        return {"engine": ctx["engine"] or "pycaret", "native_base": None}
+
+    # ========================= 13. Modeling ==========================
+    def _model_training(self, ctx):
+        df_fe, target, task_type = ctx["df_fe"], ctx["target"], ctx["task_type"]
         self._log("model_training", "start")
         leaderboard = []
         model = None
+        engine = ctx["engine"]
 
         try:
             if task_type == "timeseries":
                 ts = TimeSeriesAgent()
                 model, leaderboard = ts.fit(df_fe, target)
+            elif engine == "fast":
+                trainer = FastModelTrainingAgent(self.run_id, n_jobs=self.n_jobs or -1)
+                model, leaderboard = trainer.train(df_fe, target, task_type, ctx["tune_rounds"])
             else:
-                trainer = ModelTrainingAgent(self.run_id)
-                model, leaderboard = trainer.train(df_fe, target, task_type, tune_rounds)
+                # warm-start key: the upload hash when known, else the frame hash
+                trainer = ModelTrainingAgent(self.run_id, dataset_key=ctx["dataset_id"] or ctx["df_key"])
+                if self.n_jobs:
+                    trainer.n_jobs = self.n_jobs
+                if ctx["tune_budget"] is not None:
+                    trainer.tune_budget = ctx["tune_budget"]
+                model, leaderboard = trainer.train(df_fe, target, task_type, ctx["tune_rounds"])
         except Exception as e:
             self._log("model_training", "error", {"error": str(e)})
-        self._log("model_training", "complete", {"leaderboard_len": len(leaderboard) if leaderboard else 0})
+        self._log("model_training", "complete", {"leaderboard_len": len(leaderboard) if leaderboard else 0,
+                                                 "engine": engine})
 
         # Normalize leaderboard into serializable structure
         try:
             # If pandas DataFrame -> convert to records
-            import pandas as pd
             if isinstance(leaderboard, pd.DataFrame):
                 lb_serial = leaderboard.to_dict(orient="records")
             else:
@@ -172,122 +501,170 @@ class AutoMindMasterAgent:
         except Exception:
             lb_serial = leaderboard
 
-        # ======================== 11. Evaluation =========================
+        return {"model": model, "lb_serial": lb_serial, "engine": engine}
+
+    def _model_training_failed(self, ctx, e):
+        self._log("model_training", "error", {"error": str(e)})
+        self._log("model_training", "complete", {"leaderboard_len": 0})
+        return {"model": None, "lb_serial": []}
+
+    # ======================= 14. Model Registry ======================
+    def _register_model(self, ctx):
+        """
+        Stores the fitted preprocessing, feature replay and model so
+        /predict/{run_id} can score raw rows.
+        """
+        if ctx["model"] is None or ctx["task_type"] == "timeseries":
+            return {"model_path": None}
+        self._log("register_model", "start")
+        target = ctx["target"]
+        bundle = ModelBundle(
+            run_id=self.run_id,
+            model=ctx["model"],
+            target=target,
+            task=ctx["task_type"],
+            features=[c for c in ctx["df_fe"].columns if c != target],
+            input_dtypes={c: str(t) for c, t in ctx["df"].dtypes.items() if c != target},
+            preprocessor=ctx["preprocessor"],
+            feature_engineering=ctx["fe_agent"],
+            advanced_features=ctx["adv_agent"],
+            engine=ctx.get("engine"),
+            native_base=ctx.get("native_base"),
+            classes=sorted(ctx["df_fe"][target].dropna().unique().tolist(), key=str)
+            if ctx["task_type"] == "classification" else None,
+        )
+        model_path = model_registry.save(bundle)
+        self.artifacts.add_file(model_path, f"model_{self.run_id}.joblib")
+        self.artifacts.add_json("schema.json", bundle.schema())
+        self._log("register_model", "complete", {"path": model_path})
+        return {"model_path": model_path}
+
+    # ======================== 15. Evaluation =========================
+    def _evaluation(self, ctx):
         self._log("evaluation", "start")
         evaluator = EvaluationAgent()
-        try:
-            metrics = evaluator.evaluate(model, df_fe, target, task_type)
-        except Exception as e:
-            metrics = {"error": f"Evaluation failed: {str(e)}"}
-            self._log("evaluation", "error", {"error": str(e)})
+        if ctx["df_holdout"] is not None:
+            metrics = evaluator.evaluate(ctx["model"], ctx["df_holdout"], ctx["target"], ctx["task_type"])
+        else:
+            metrics = evaluator.evaluate(ctx["model"], ctx["df_fe"], ctx["target"], ctx["task_type"],
+                                         evaluated_on="train")
         self._log("evaluation", "complete", {"metrics": metrics})
+        return {"metrics": metrics}
 
-        # ========================= 12. Explainability ====================
-        self._log("explainability", "start")
-        explainer = ExplainabilityAgent()
-        try:
-            shap_images = explainer.explain(model, df_fe, target)
-            self._log("explainability", "complete", {"shap": len(shap_images)})
-        except Exception as e:
-            shap_images = []
-            self._log("explainability", "error", {"error": str(e)})
+    def _evaluation_failed(self, ctx, e):
+        metrics = {"error": f"Evaluation failed: {str(e)}"}
+        self._log("evaluation", "error", {"error": str(e)})
+        self._log("evaluation", "complete", {"metrics": metrics})
+        return {"metrics": metrics}
 
-        # ====================== 13. Narrative (LLM) ======================
+    # ========================= 16. Explainability ====================
+    def _explainability(self, ctx):
+        self._log("explainability", "start")
+        explainer = ExplainabilityAgent(n_jobs=self.n_jobs)
+        shap_images = explainer.explain(ctx["model"], ctx["df_fe"], ctx["target"])
+        if explainer.error:
+            self._log("explainability", "error", {"error": explainer.error})
+        self.artifacts.add_images("shap", shap_images)
+        self._log("explainability", "complete", {"shap": len(shap_images)})
+        return {"shap_images": shap_images}
+
+    # ====================== 17. Narrative (LLM) ======================
+    def _narrative(self, ctx):
         self._log("narrative", "start")
         narrative_agent = NarrativeAgent()
-        try:
-            narrative = narrative_agent.generate(metrics, task_type)
-        except Exception:
-            narrative = "Narrative generation failed or unavailable."
+        narrative = narrative_agent.generate(ctx["metrics"], ctx["task_type"])
         self._log("narrative", "complete", {"preview": str(narrative)[:200]})
-
-        # ==================== 14. Notebook Generation ====================
-        nb_path = None
-        if notebook:
-            self._log("notebook", "start")
-            nb_gen = NotebookGenerator()
-            try:
-                nb_path = nb_gen.generate_notebook(
-                    f"reports/notebook_{self.run_id}.ipynb",
-                    {
-                        "run_id": self.run_id,
-                        "rows": df.shape[0],
-                        "columns": list(df.columns),
-                        "target": target,
-                        "task_type": task_type,
-                        "metrics": metrics
-                    },
-                    shap_images
-                )
-                self._log("notebook", "complete", {"path": nb_path})
-            except Exception as e:
-                nb_path = None
-                self._log("notebook", "error", {"error": str(e)})
-
-        # ======================== 15. Report =============================
-        self._log("report_build", "start")
-        report_path = f"reports/report_{self.run_id}.html"
-        try:
-            # Ensure leaderboard is safe for template (list of dict)
-            self.report_agent.generate_html(report_path, {
+        return {"narrative": narrative}
+
+    def _narrative_failed(self, ctx, e):
+        narrative = "Narrative generation failed or unavailable."
+        self._log("narrative", "complete", {"preview": narrative})
+        return {"narrative": narrative}
+
+    # ==================== 18. Notebook Generation ====================
+    def _notebook(self, ctx):
+        if not ctx["notebook"]:
+            return {"nb_path": None}
+        df = ctx["df"]
+        self._log("notebook", "start")
+        nb_gen = NotebookGenerator()
+        nb_path = nb_gen.generate_notebook(
+            f"reports/notebook_{self.run_id}.ipynb",
+            {
                 "run_id": self.run_id,
-                "meta": {
-                    "rows": df.shape[0],
-                    "columns": list(df.columns),
-                    "target": target,
-                    "task_type": task_type
-                },
-                "metrics": metrics,
-                "leaderboard": lb_serial,
-                "best_model": str(model),
-                "narrative": narrative,
-                "evaluation_images": eda_images,
-                "shap_images": shap_images
-            })
-            self._log("report_build", "complete", {"path": report_path})
-        except Exception as e:
-            self._log("report_build", "error", {"error": str(e)})
-
-        # ==================== 16. ZIP Artifact Bundle ====================
-        self._log("artifact", "start")
-        artifact_path = f"artifacts/artifact_{self.run_id}.zip"
-        try:
-            import zipfile
-            with zipfile.ZipFile(artifact_path, "w") as z:
-                if os.path.exists(report_path):
-                    z.write(report_path, os.path.basename(report_path))
-                if nb_path and os.path.exists(nb_path):
-                    z.write(nb_path, os.path.basename(nb_path))
-            self._log("artifact", "complete", {"path": artifact_path})
-        except Exception as e:
-            self._log("artifact", "error", {"error": str(e)})
-
-        # ==================== 17. Append run history for quick UI =================
-        history_entry = {
+                "rows": df.shape[0],
+                "columns": list(df.columns),
+                "target": ctx["target"],
+                "task_type": ctx["task_type"],
+                "metrics": ctx["metrics"]
+            },
+            ctx["shap_images"]
+        )
+        self.artifacts.add_file(nb_path)
+        self._log("notebook", "complete", {"path": nb_path})
+        return {"nb_path": nb_path}
+
+    # ======================== 19. Report =============================
+    def _report_build(self, ctx):
+        df = ctx["df"]
+        report_path = ctx["report_path"]
+        self._log("report_build", "start")
+        # Ensure leaderboard is safe for template (list of dict)
+        self.report_agent.generate_html(report_path, {
             "run_id": self.run_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "rows": int(df.shape[0]),
-            "cols": int(df.shape[1]),
-            "task_type": task_type,
-        }
-        try:
-            hist_path = "run_history.json"
-            if os.path.exists(hist_path):
-                old = json.load(open(hist_path, "r", encoding="utf-8")) or []
-            else:
-                old = []
-            old.append(history_entry)
-            json.dump(old, open(hist_path, "w", encoding="utf-8"), indent=2)
-        except Exception:
-            pass
-
-        self._log("pipeline", "complete", {"run_id": self.run_id})
-        return {
+            "meta": {
+                "rows": df.shape[0],
+                "columns": list(df.columns),
+                "target": ctx["target"],
+                "task_type": ctx["task_type"]
+            },
+            "metrics": ctx["metrics"],
+            "leaderboard": ctx["lb_serial"],
+            "best_model": str(ctx["model"]),
+            "narrative": ctx["narrative"],
+            "evaluation_images": ctx["eda_images"],
+            "shap_images": ctx["shap_images"],
+            "profile": list(self._profile)
+        })
+        self.artifacts.add_file(report_path)
+        self._log("report_build", "complete", {"path": report_path})
+
+    # ==================== 20. ZIP Artifact Bundle ====================
+    def _artifact(self, ctx):
+        """
+        Members were added as their stages finished; this only writes the
+        manifest and moves the ZIP into place.
+        """
+        self._log("artifact", "start")
+        artifact_path = self.artifacts.finalize({
             "run_id": self.run_id,
-            "report": report_path,
-            "notebook": nb_path,
-            "artifact": artifact_path,
-            "metrics": metrics,
-            "leaderboard": lb_serial,
-            "narrative": narrative
-        }
+            "target": ctx["target"],
+            "task_type": ctx["task_type"],
+            "metrics": ctx["metrics"],
+        })
+        self._log("artifact", "complete", {"path": artifact_path, "members": len(self.artifacts.members)})
+
+    def _artifact_failed(self, ctx, e):
+        self.artifacts.abort()
+        self._log("artifact", "error", {"error": str(e)})
+
+    # ==================== 21. Record run in the run store ====================
+    def _stage_timings(self) -> Dict[str, float]:
+        return {p["stage"]: p.get("wall_s") for p in self._profile}
+
+    def _run_history(self, ctx):
+        df = ctx["df"]
+        now = datetime.utcnow()
+        run_store.add(
+            run_id=self.run_id,
+            timestamp=now.isoformat(),
+            ts=now.replace(tzinfo=timezone.utc).timestamp(),
+            rows=int(df.shape[0]),
+            cols=int(df.shape[1]),
+            task_type=ctx["task_type"],
+            dataset_id=ctx["dataset_id"] or ctx["df_key"] or None,
+            target=ctx["target"],
+            engine=ctx.get("engine"),
+            metrics=ctx.get("metrics"),
+            stages=self._stage_timings(),
+        )
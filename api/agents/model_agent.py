@@ -1,31 +1,51 @@
 # api/agents/model_agent.py
 # Updated for PyCaret 3.3.2 (silent=True removed)
 
+import os
+import math
 import pandas as pd
-from pycaret.classification import (
-    setup as clf_setup,
-    compare_models as clf_compare,
-    tune_model as clf_tune,
-    finalize_model as clf_finalize,
-    pull as clf_pull,
-)
-from pycaret.regression import (
-    setup as reg_setup,
-    compare_models as reg_compare,
-    tune_model as reg_tune,
-    finalize_model as reg_finalize,
-    pull as reg_pull,
-)
+
+SELECTION = os.getenv("AUTOMIND_MODEL_SELECTION", "halving")
+N_JOBS = int(os.getenv("AUTOMIND_TRAIN_N_JOBS", "-1"))
+TUNE_BUDGET = float(os.getenv("AUTOMIND_TUNE_BUDGET_S", "300")) or None
 
 
 class ModelTrainingAgent:
     """
     AutoML Model Training using PyCaret 3.x
     Supports classification & regression.
+
+    Each train() call works on its own ClassificationExperiment /
+    RegressionExperiment object rather than PyCaret's module-level session,
+    so concurrent trainings in one process cannot overwrite each other's
+    setup or results. `n_jobs` bounds the cores one training may use.
+
+    With selection="halving" (default) candidates are raced instead of all
+    being cross-validated on the full data: every estimator starts on a
+    small stratified subsample with few folds, the best 1/eta advance, and
+    each rung multiplies rows by eta until the last rung uses every row.
+    selection="compare" keeps the plain compare_models() behaviour.
+
+    Tuning runs under a wall-clock budget (`tune_budget` seconds) with
+    `n_jobs` parallel fits. When optuna is installed it is a TPE search with
+    ASHA pruning that stops at the deadline; otherwise a random search whose
+    iteration count is sized from the measured fit time. The best config of
+    earlier runs on the same `dataset_key` is the starting incumbent.
     """
 
-    def __init__(self, run_id):
+    def __init__(self, run_id, selection: str = SELECTION, eta: int = 3, min_rows: int = 2_000,
+                 min_folds: int = 2, max_folds: int = 5, n_jobs: int = N_JOBS,
+                 tune_budget: float = TUNE_BUDGET, max_trials: int = 500, dataset_key: str = None):
         self.run_id = run_id
+        self.selection = selection
+        self.eta = eta
+        self.min_rows = min_rows
+        self.min_folds = min_folds
+        self.max_folds = max_folds
+        self.n_jobs = n_jobs
+        self.tune_budget = tune_budget
+        self.max_trials = max_trials
+        self.dataset_key = dataset_key
 
     def train(self, df: pd.DataFrame, target: str, task: str, tune_rounds: int = 10):
 
@@ -34,46 +54,148 @@ class ModelTrainingAgent:
         else:
             return self._regression(df, target, tune_rounds)
 
-    # ---------------- Classification ---------------- #
-    def _classification(self, df, target, tune_rounds):
-
-        clf_setup(
-            data=df,
-            target=target,
-            session_id=42,
-            preprocess=True,
-            verbose=False
-        )
-
-        best_model = clf_compare()
-        leaderboard = clf_pull().to_dict(orient="records")
+    def _setup(self, exp, data, target, **kwargs):
+        exp.setup(data=data, target=target, session_id=42, preprocess=True, verbose=False,
+                  n_jobs=self.n_jobs, **kwargs)
+
+    # ---------------- Racing ---------------- #
+    def _schedule(self, n_rows: int, n_models: int):
+        """
+        [(rows, folds, n_keep), ...] for each rung. Folds grow from
+        min_folds to max_folds; the last rung always uses all rows and
+        max_folds, so the winner is scored like a plain compare_models().
+        """
+        rungs = max(1, math.ceil(math.log(max(n_models, 1), self.eta)))
+        # don't start below min_rows; collapse rungs that would
+        while rungs > 1 and n_rows / self.eta ** (rungs - 1) < self.min_rows:
+            rungs -= 1
+        plan = []
+        for r in range(rungs):
+            rows = n_rows if r == rungs - 1 else int(n_rows / self.eta ** (rungs - 1 - r))
+            folds = self.max_folds if r == rungs - 1 else \
+                self.min_folds + (self.max_folds - self.min_folds) * r // (rungs - 1)
+            keep = 1 if r == rungs - 1 else max(1, math.ceil(n_models / self.eta ** (r + 1)))
+            plan.append((rows, folds, keep))
+        return plan
+
+    def _race(self, exp, df, target, sort):
+        """
+        Successive halving over PyCaret's default (turbo) estimators.
+        Returns (best_model, leaderboard) where each leaderboard row records
+        the rung, rows and folds the model was last evaluated with.
+        """
+        from .sampling_policy import SamplingPolicyAgent
+
+        sampler = SamplingPolicyAgent()
+        probe = df if len(df) <= self.min_rows else sampler.reservoir([df], self.min_rows, target)
+        self._setup(exp, probe, target)
+        catalogue = exp.models()
+        candidates = list(catalogue.index[catalogue["Turbo"]]) if "Turbo" in catalogue else list(catalogue.index)
+
+        plan = self._schedule(len(df), len(candidates))
+        last = {}
+        best = None
+        for rung, (rows, folds, keep) in enumerate(plan):
+            data = df if rows >= len(df) else sampler.reservoir([df], rows, target)
+            self._setup(exp, data, target, fold=folds)
+            best = exp.compare_models(include=candidates, fold=folds, sort=sort, n_select=1, verbose=False)
+            board = exp.pull()
+            for model_id, row in board.iterrows():
+                last[model_id] = {"ID": model_id, **row.to_dict(), "rung": rung, "rows": int(len(data)), "folds": folds}
+            candidates = list(board.index[:keep]) or candidates[:keep]
+            if len(candidates) == 1 and rung < len(plan) - 1:
+                # a single survivor skips straight to the full-data rung
+                rows, folds, _ = plan[-1]
+                self._setup(exp, df, target, fold=folds)
+                best = exp.compare_models(include=candidates, fold=folds, sort=sort, n_select=1, verbose=False)
+                for model_id, row in exp.pull().iterrows():
+                    last[model_id] = {"ID": model_id, **row.to_dict(), "rung": len(plan) - 1,
+                                      "rows": int(len(df)), "folds": folds}
+                break
+
+        leaderboard = sorted(last.values(), key=lambda r: (-r["rung"], -float(r.get(sort, 0) or 0)))
+        return best, leaderboard
+
+    # ---------------- Tuning ---------------- #
+    def _tune(self, exp, model, model_id, task, optimize, tune_rounds, fit_seconds=None, incumbent_score=None):
+        """
+        Budgeted search around `model`. choose_better keeps the incumbent
+        unless a trial beats it, so the result never scores below it.
+        """
+        from api.tuning_history import tuning_history
+
+        prev = tuning_history.best(self.dataset_key, task, model_id) if model_id else None
+        if prev:
+            try:
+                model = exp.create_model(model_id, verbose=False, **prev["params"])
+            except Exception:
+                pass
+
+        kwargs = {"n_iter": tune_rounds, "optimize": optimize, "choose_better": True, "verbose": False}
+        tuned = None
+        if self.tune_budget:
+            try:
+                import optuna  # noqa: F401
+            except ImportError:
+                # no optuna: size a random search to the budget instead
+                if fit_seconds:
+                    cores = self.n_jobs if self.n_jobs > 0 else (os.cpu_count() or 1)
+                    per_trial = fit_seconds * self.max_folds / max(min(cores, self.max_folds), 1)
+                    kwargs["n_iter"] = int(min(self.max_trials, max(1, self.tune_budget / max(per_trial, 1e-3))))
+            else:
+                tuned = exp.tune_model(model, **{**kwargs, "n_iter": self.max_trials}, search_library="optuna",
+                                       search_algorithm="tpe", early_stopping="asha", timeout=self.tune_budget)
+        if tuned is None:
+            tuned = exp.tune_model(model, **kwargs)
+
+        if model_id:
+            try:
+                # choose_better may hand back the incumbent; credit whichever scored higher
+                score = max(float(exp.pull().loc["Mean", optimize]), float(incumbent_score or float("-inf")))
+                tuning_history.update(self.dataset_key, task, model_id, tuned.get_params(), score, self.run_id)
+            except Exception:
+                pass
+        return tuned
+
+    @staticmethod
+    def _best_entry(leaderboard, optimize):
+        """
+        (model_id, fit_seconds, score) of the leaderboard winner.
+        """
+        if not leaderboard:
+            return None, None, None
+        top = leaderboard[0]
+        fit_seconds, score = top.get("TT (Sec)"), top.get(optimize)
+        return (top.get("ID"), float(fit_seconds) if fit_seconds is not None else None,
+                float(score) if score is not None else None)
+
+    def _fit(self, exp, df, target, task, optimize, tune_rounds):
+        if self.selection == "halving":
+            best_model, leaderboard = self._race(exp, df, target, optimize)
+        else:
+            self._setup(exp, df, target)
+            best_model = exp.compare_models(verbose=False)
+            board = exp.pull()
+            leaderboard = [{"ID": i, **row.to_dict()} for i, row in board.iterrows()]
 
+        model_id, fit_seconds, score = self._best_entry(leaderboard, optimize)
         try:
-            tuned = clf_tune(best_model, n_iter=tune_rounds)
-            final_model = clf_finalize(tuned)
+            tuned = self._tune(exp, best_model, model_id, task, optimize, tune_rounds, fit_seconds, score)
+            final_model = exp.finalize_model(tuned)
         except Exception:
-            final_model = clf_finalize(best_model)
+            final_model = exp.finalize_model(best_model)
 
         return final_model, leaderboard
 
-    # ---------------- Regression ---------------- #
-    def _regression(self, df, target, tune_rounds):
-
-        reg_setup(
-            data=df,
-            target=target,
-            session_id=42,
-            preprocess=True,
-            verbose=False
-        )
+    # ---------------- Classification ---------------- #
+    def _classification(self, df, target, tune_rounds):
+        # PyCaret is imported on first use; it dominates worker start-up time
+        from pycaret.classification import ClassificationExperiment
 
-        best_model = reg_compare()
-        leaderboard = reg_pull().to_dict(orient="records")
+        return self._fit(ClassificationExperiment(), df, target, "classification", "Accuracy", tune_rounds)
 
-        try:
-            tuned = reg_tune(best_model, n_iter=tune_rounds)
-            final_model = reg_finalize(tuned)
-        except Exception:
-            final_model = reg_finalize(best_model)
+    # ---------------- Regression ---------------- #
+    def _regression(self, df, target, tune_rounds):
+        from pycaret.regression import RegressionExperiment
 
-        return final_model, leaderboard
+        return self._fit(RegressionExperiment(), df, target, "regression", "R2", tune_rounds)
@@ -12,17 +12,37 @@ class NarrativeAgent:
 
         if task == "classification":
             return (
-                f"The classification model achieved an accuracy of {metrics.get('accuracy',0)*100:.2f}%. "
+                f"The classification model achieved an accuracy of {metrics.get('accuracy',0)*100:.2f}%"
+                f"{self._ci(metrics, 'accuracy', 100, '%')}. "
                 f"F1 score was {metrics.get('f1',0):.3f}, "
                 f"precision {metrics.get('precision',0):.3f}, "
                 f"recall {metrics.get('recall',0):.3f}."
+                f"{self._scope(metrics)}"
             )
 
         if task == "regression":
             return (
-                f"The regression model achieved an R² of {metrics.get('r2',0):.3f}. "
+                f"The regression model achieved an R² of {metrics.get('r2',0):.3f}"
+                f"{self._ci(metrics, 'r2')}. "
                 f"RMSE was {metrics.get('rmse',0):.3f}, and "
                 f"MAE was {metrics.get('mae',0):.3f}."
+                f"{self._scope(metrics)}"
             )
 
         return "Narrative unavailable for this task."
+
+    @staticmethod
+    def _ci(metrics: dict, key: str, scale: float = 1.0, unit: str = "") -> str:
+        ci = (metrics.get("ci95") or {}).get(key)
+        if not ci:
+            return ""
+        fmt = ".2f" if unit == "%" else ".3f"
+        return f" (95% CI {ci[0]*scale:{fmt}}{unit}–{ci[1]*scale:{fmt}}{unit})"
+
+    @staticmethod
+    def _scope(metrics: dict) -> str:
+        if metrics.get("evaluated_on") == "holdout":
+            return f" Metrics were computed on {metrics.get('n_eval', 0)} held-out rows."
+        if metrics.get("evaluated_on") == "train":
+            return " The dataset was too small for a holdout, so metrics are on the training rows."
+        return ""
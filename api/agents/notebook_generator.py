@@ -1,12 +1,13 @@
 # api/agents/notebook_generator.py
 
-import nbformat as nbf
 import os
 
 
 class NotebookGenerator:
 
     def generate_notebook(self, path: str, summary: dict, explainability_images=None):
+        import nbformat as nbf
+
         nb = nbf.v4.new_notebook()
         cells = []
 
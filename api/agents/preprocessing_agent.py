@@ -1,104 +1,158 @@
 # api/agents/preprocessing_agent.py
 # Safe preprocessing with datetime protection for AutoMind v1.0
 
+import os
+import joblib
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, FunctionTransformer
 from sklearn.impute import SimpleImputer
 
+
+def _datetime_to_seconds(X):
+    """
+    Datetime columns -> UNIX seconds as float (NaT becomes NaN for the imputer).
+    """
+    X = pd.DataFrame(X)
+    out = np.empty(X.shape, dtype=np.float64)
+    for i, col in enumerate(X.columns):
+        s = pd.to_datetime(X[col], errors="coerce")
+        secs = s.to_numpy(dtype="datetime64[ns]").astype("int64") // 10**9
+        out[:, i] = np.where(s.isna().to_numpy(), np.nan, secs)
+    return out
+
+
+def _to_object(X):
+    # categoricals/strings -> plain object array so the imputer treats them uniformly
+    return pd.DataFrame(X).astype(object).to_numpy()
+
+
 class PreprocessingAgent:
     """
     Safe preprocessing for AutoMind v1.0
     - Converts datetime columns to UNIX integer timestamps (seconds)
     - Imputes numeric and categorical separately
-    - One-hot encodes categorical variables (drop_first=True)
+    - One-hot encodes categorical variables (drop first level), keeping the
+      one-hot block sparse and folding rare levels into an "other" column
     - Scales numeric columns with StandardScaler
+
+    The fitted ColumnTransformer is kept on `self.transformer` so new data can
+    be transformed without refitting (see transform() / save()).
     """
 
-    def process(self, df: pd.DataFrame, target: str) -> pd.DataFrame:
-        df = df.copy()
+    def __init__(self, max_categories: int = 50, sparse: bool = True):
+        self.max_categories = max_categories
+        self.sparse = sparse
+        self.transformer = None
+        self.target = None
 
-        # ---------------- DATETIME HANDLING ----------------
-        datetime_cols = []
+    def _build(self, df: pd.DataFrame, target: str) -> ColumnTransformer:
+        datetime_cols, numeric_cols, cat_cols = [], [], []
         for col in df.columns:
-            # Detect datetime dtypes (including pandas nullable datetimelike)
-            if pd.api.types.is_datetime64_any_dtype(df[col]) or pd.api.types.is_datetime64_ns_dtype(df[col]):
+            if col == target:
+                continue
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
                 datetime_cols.append(col)
-                # convert to integer seconds (safe for sklearn)
-                # coerce errors so NaT becomes NaN (and imputer can handle)
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-                df[col] = df[col].view("int64") // 10**9  # nan stays as NaN
-
-        # ---------------- Separate numeric and categorical ----------------
-        # After datetime conversion, numeric columns include converted datetime ints
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        cat_cols = df.select_dtypes(exclude=[np.number]).columns.tolist()
-
-        # Ensure target not included in features lists
-        if target in numeric_cols:
-            numeric_cols = [c for c in numeric_cols if c != target]
-        if target in cat_cols:
-            cat_cols = [c for c in cat_cols if c != target]
-
-        # ---------------- NUMERIC IMPUTATION ----------------
-        if numeric_cols:
-            num_imputer = SimpleImputer(strategy="median")
-            # fit_transform returns ndarray
-            try:
-                df[numeric_cols] = num_imputer.fit_transform(df[numeric_cols])
-            except Exception:
-                # fallback: impute column-by-column
-                for col in numeric_cols:
-                    try:
-                        imp = SimpleImputer(strategy="median")
-                        df[[col]] = imp.fit_transform(df[[col]])
-                    except Exception:
-                        pass
-
-        # ---------------- CATEGORICAL IMPUTATION ----------------
-        if cat_cols:
-            cat_imputer = SimpleImputer(strategy="most_frequent")
-            try:
-                df[cat_cols] = cat_imputer.fit_transform(df[cat_cols])
-            except Exception:
-                # fallback column-by-column
-                for col in cat_cols:
-                    try:
-                        imp = SimpleImputer(strategy="most_frequent")
-                        df[[col]] = imp.fit_transform(df[[col]])
-                    except Exception:
-                        pass
-
-        # ---------------- ONE-HOT ENCODING ----------------
-        if cat_cols:
-            try:
-                df_encoded = pd.get_dummies(df, columns=cat_cols, drop_first=True)
-            except Exception:
-                # fallback: simple label conversion of cat columns
-                df_encoded = df.copy()
-                for col in cat_cols:
-                    try:
-                        df_encoded[col] = df_encoded[col].astype(str)
-                    except Exception:
-                        pass
-                df_encoded = pd.get_dummies(df_encoded, columns=cat_cols, drop_first=True)
-        else:
-            df_encoded = df.copy()
-
-        # ---------------- SCALING NUMERIC ----------------
-        final_numeric = [c for c in df_encoded.columns if df_encoded[c].dtype in [np.float64, np.int64]]
-        if target in final_numeric:
-            final_numeric = [c for c in final_numeric if c != target]
-
-        if final_numeric:
-            scaler = StandardScaler()
-            try:
-                df_encoded[final_numeric] = scaler.fit_transform(df_encoded[final_numeric])
-            except Exception:
-                # if scaling fails for any reason, leave as-is (avoid crash)
-                pass
+            elif pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+                numeric_cols.append(col)
+            else:
+                cat_cols.append(col)
+
+        encoder = OneHotEncoder(
+            drop="first",
+            max_categories=self.max_categories,
+            handle_unknown="infrequent_if_exist",
+            sparse_output=True,
+            dtype=np.uint8,
+        )
+
+        return ColumnTransformer(
+            [
+                ("datetime", Pipeline([
+                    ("seconds", FunctionTransformer(_datetime_to_seconds, feature_names_out="one-to-one")),
+                    ("impute", SimpleImputer(strategy="median", keep_empty_features=True)),
+                    ("scale", StandardScaler()),
+                ]), datetime_cols),
+                ("numeric", Pipeline([
+                    ("impute", SimpleImputer(strategy="median", keep_empty_features=True)),
+                    ("scale", StandardScaler()),
+                ]), numeric_cols),
+                ("categorical", Pipeline([
+                    ("object", FunctionTransformer(_to_object, feature_names_out="one-to-one")),
+                    ("impute", SimpleImputer(strategy="most_frequent")),
+                    ("onehot", encoder),
+                ]), cat_cols),
+            ],
+            remainder="drop",
+            verbose_feature_names_out=False,
+        )
+
+    def _to_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Runs each fitted block separately so numeric output stays dense and
+        the one-hot output stays sparse, then reassembles a DataFrame in the
+        original column order with the dummies appended.
+        """
+        ct = self.transformer
+        dense = {}
+        dummies = None
+
+        for name, _, cols in ct.transformers_:
+            if name == "remainder" or len(cols) == 0:
+                continue
+            block = ct.named_transformers_[name].transform(df[cols])
+            if name == "categorical":
+                names = ct.named_transformers_[name].get_feature_names_out(cols)
+                names = [n.replace("_infrequent_sklearn", "_other") for n in names]
+                if self.sparse:
+                    dummies = pd.DataFrame.sparse.from_spmatrix(block.tocsc(), index=df.index, columns=names)
+                    dummies = dummies.astype(pd.SparseDtype(bool, False))
+                else:
+                    dummies = pd.DataFrame(block.toarray().astype(bool), index=df.index, columns=names)
+            else:
+                for i, col in enumerate(cols):
+                    dense[col] = block[:, i]
+
+        data = {}
+        for col in df.columns:
+            if col in dense:
+                data[col] = dense[col]
+            elif col == self.target:
+                data[col] = df[col].to_numpy()
+        out = pd.DataFrame(data, index=df.index)
+
+        if dummies is not None and dummies.shape[1] > 0:
+            out = pd.concat([out, dummies], axis=1)
 
         # Reset index to ensure downstream consistency
-        df_encoded = df_encoded.reset_index(drop=True)
+        return out.reset_index(drop=True)
+
+    def process(self, df: pd.DataFrame, target: str) -> pd.DataFrame:
+        self.target = target
+        self.transformer = self._build(df, target)
+        self.transformer.fit(df.drop(columns=[target]) if target in df.columns else df)
+        return self._to_frame(df)
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Applies the already fitted transformer to new data (target optional).
+        """
+        if self.transformer is None:
+            raise RuntimeError("PreprocessingAgent.transform called before process()")
+        return self._to_frame(df)
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        joblib.dump({"transformer": self.transformer, "target": self.target,
+                     "max_categories": self.max_categories, "sparse": self.sparse}, path)
+        return path
 
-        return df_encoded
+    @classmethod
+    def load(cls, path: str) -> "PreprocessingAgent":
+        state = joblib.load(path)
+        agent = cls(max_categories=state["max_categories"], sparse=state["sparse"])
+        agent.transformer = state["transformer"]
+        agent.target = state["target"]
+        return agent
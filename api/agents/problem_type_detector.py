@@ -2,6 +2,8 @@
 
 import pandas as pd
 
+from .column_stats import ColumnStats
+
 
 class ProblemTypeDetectorAgent:
     """
@@ -9,9 +11,12 @@ class ProblemTypeDetectorAgent:
     - Time series → datetime index or timestamp col
     - Classification → target has <=20 unique values
     - Regression → default
+
+    The distinct count comes from the shared ColumnStats profile when one
+    is passed, so the target is not hashed again.
     """
 
-    def detect(self, df: pd.DataFrame, target: str) -> str:
+    def detect(self, df: pd.DataFrame, target: str, stats: ColumnStats = None) -> str:
 
         # Time-series check 1: datetime index
         if isinstance(df.index, pd.DatetimeIndex):
@@ -23,7 +28,8 @@ class ProblemTypeDetectorAgent:
                 return "timeseries"
 
         # Classification
-        if df[target].nunique() <= 20:
+        distinct = stats.distinct(target) if stats is not None else df[target].nunique()
+        if distinct <= 20:
             return "classification"
 
         return "regression"
@@ -3,9 +3,6 @@
 import os
 import base64
 from jinja2 import Environment, FileSystemLoader
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
 from io import BytesIO
 
 
@@ -22,6 +19,10 @@ class ReportAgent:
         return output_path
 
     def generate_pdf(self, output_path, context: dict):
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.pagesizes import A4
+
         styles = getSampleStyleSheet()
         story = []
 
@@ -1,30 +1,265 @@
 # api/agents/sampling_policy.py
 
+import time
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
 
 
 class SamplingPolicyAgent:
+    """
+    Row sampling for large datasets.
 
-    def sample(self, df: pd.DataFrame, target: str, frac=1.0) -> pd.DataFrame:
+    - sample(): honours a user fraction, otherwise applies the large-data policy
+    - reservoir(): fixed-size sample over an iterable of chunks, so a file can
+      be sampled without ever being loaded whole; stratified per class for
+      class-like targets and optionally recency-weighted on a time column
+    - progressive(): trains a cheap proxy model on geometrically growing
+      subsets and stops once the holdout learning curve flattens
+    - holdout_split(): stratified train / evaluation split
+    """
+
+    def __init__(self, large_rows: int = 200_000, max_classes: int = 20, start_rows: int = 5_000,
+                 growth: float = 2.0, tol: float = 0.002, holdout_rows: int = 20_000,
+                 time_budget: float = 120.0, random_state: int = 42):
+        self.large_rows = large_rows
+        self.max_classes = max_classes
+        self.start_rows = start_rows
+        self.growth = growth
+        self.tol = tol
+        self.holdout_rows = holdout_rows
+        self.time_budget = time_budget
+        self.random_state = random_state
+
+    def _class_like(self, y: pd.Series) -> bool:
+        if pd.api.types.is_float_dtype(y):
+            return False
+        return y.nunique(dropna=True) <= self.max_classes
+
+    # ------------------------------------------------------------
+
+    def sample(self, df: pd.DataFrame, target: str, frac=1.0, time_col: str = None,
+               half_life: float = None) -> pd.DataFrame:
         n = len(df)
 
-        if frac < 1.0:
-            return df.sample(frac=frac, random_state=42).reset_index(drop=True)
+        if frac is not None and frac < 1.0:
+            return self.reservoir([df], max(int(round(n * frac)), 1), target, time_col, half_life)
 
         if isinstance(df.index, pd.DatetimeIndex):
             return df
 
-        if n <= 200_000:
+        if n <= self.large_rows:
             return df
 
-        # classification
-        if df[target].nunique() <= 20:
-            frac = 0.2 if n <= 500_000 else 0.1
-            df_small, _ = train_test_split(df, stratify=df[target], train_size=frac, random_state=42)
-            return df_small.reset_index(drop=True)
-
-        # regression
         frac = 0.2 if n <= 500_000 else 0.1
-        df_small = df.sample(frac=frac, random_state=42)
-        return df_small.reset_index(drop=True)
+        return self.reservoir([df], int(n * frac), target, time_col, half_life)
+
+    def policy(self, df: pd.DataFrame, target: str, task: str, frac=None, time_col: str = None,
+               half_life: float = None):
+        """
+        Training sample for the modelling stages. Returns (df, info).
+
+        An explicit fraction always wins. Otherwise tables above `large_rows`
+        are cut to the size at which the learning curve flattens.
+        """
+        n = len(df)
+        if frac is not None and frac < 1.0:
+            out = self.sample(df, target, frac, time_col, half_life)
+            return out, {"strategy": "fraction", "frac": frac, "rows": len(out)}
+
+        if task == "timeseries" or n <= self.large_rows:
+            return df, {"strategy": "none", "rows": n}
+
+        try:
+            rows, curve = self.progressive(df, target, task)
+        except Exception as e:
+            out = self.sample(df, target, 1.0, time_col, half_life)
+            return out, {"strategy": "fixed", "rows": len(out), "error": str(e)}
+
+        out = self.reservoir([df], rows, target, time_col, half_life) if rows < n else df
+        return out, {"strategy": "progressive", "rows": len(out), "curve": curve}
+
+    # ------------------------------------------------------------
+
+    def reservoir(self, chunks, n: int, target: str = None, time_col: str = None,
+                  half_life: float = None) -> pd.DataFrame:
+        """
+        Bottom-k reservoir over `chunks` (any iterable of DataFrames).
+
+        Every row gets a random key and each stratum keeps its `n` smallest
+        keys, so at most n rows per stratum plus one chunk are in memory.
+        The final sample is allocated across strata in proportion to the rows
+        seen. With `time_col`, keys are biased towards recent rows when
+        `half_life` (seconds) is given and the sample is returned in time
+        order; otherwise rows keep their input order.
+        """
+        rng = np.random.default_rng(self.random_state)
+        kept, kept_keys, kept_pos = None, None, None
+        seen = {}
+        stratified = None
+        offset = 0
+
+        for chunk in chunks:
+            m = len(chunk)
+            if m == 0:
+                continue
+            chunk = chunk.reset_index(drop=True)
+
+            if stratified is None:
+                stratified = target is not None and target in chunk.columns and self._class_like(chunk[target])
+
+            keys = rng.random(m)
+            if time_col is not None and half_life and time_col in chunk.columns:
+                # Efraimidis-Spirakis keys in log space: log(E) - log(w), w = 2^(t / half_life)
+                t = pd.to_datetime(chunk[time_col], errors="coerce").astype("int64").to_numpy() / 1e9
+                keys = np.log(-np.log1p(-keys)) - np.log(2) * np.nan_to_num(t) / half_life
+
+            strata = chunk[target].astype(str).to_numpy() if stratified else np.zeros(m, dtype=object)
+            for s, c in zip(*np.unique(strata, return_counts=True)):
+                seen[s] = seen.get(s, 0) + int(c)
+
+            pos = np.arange(offset, offset + m)
+            offset += m
+            if kept is None:
+                kept, kept_keys, kept_pos = chunk, keys, pos
+            else:
+                kept = pd.concat([kept, chunk], ignore_index=True)
+                kept_keys = np.concatenate([kept_keys, keys])
+                kept_pos = np.concatenate([kept_pos, pos])
+
+            sel = self._bottom_k(kept, kept_keys, target if stratified else None, {s: n for s in seen})
+            kept, kept_keys, kept_pos = kept.iloc[sel].reset_index(drop=True), kept_keys[sel], kept_pos[sel]
+
+        if kept is None:
+            return pd.DataFrame()
+
+        alloc = self._allocate(seen, n)
+        sel = self._bottom_k(kept, kept_keys, target if stratified else None, alloc)
+        out = kept.iloc[sel[np.argsort(kept_pos[sel], kind="stable")]]
+        if time_col is not None and time_col in out.columns:
+            out = out.sort_values(time_col, kind="stable")
+        return out.reset_index(drop=True)
+
+    @staticmethod
+    def _bottom_k(df, keys, target, quota):
+        strata = df[target].astype(str).to_numpy() if target is not None else np.zeros(len(df), dtype=object)
+        codes, uniques = pd.factorize(strata)
+        order = np.lexsort((keys, codes))
+        sorted_codes = codes[order]
+        starts = np.searchsorted(sorted_codes, np.arange(len(uniques)))
+        rank = np.arange(len(order)) - starts[sorted_codes]
+        limit = np.array([quota.get(u, 0) for u in uniques])
+        return np.sort(order[rank < limit[sorted_codes]])
+
+    @staticmethod
+    def _allocate(seen, n):
+        """
+        Largest-remainder proportional allocation with one row per stratum minimum.
+        """
+        total = sum(seen.values())
+        if total <= n:
+            return dict(seen)
+        raw = {s: n * c / total for s, c in seen.items()}
+        alloc = {s: min(seen[s], max(1, int(v))) for s, v in raw.items()}
+        short = n - sum(alloc.values())
+        for s in sorted(raw, key=lambda s: raw[s] - int(raw[s]), reverse=True):
+            if short <= 0:
+                break
+            if alloc[s] < seen[s]:
+                alloc[s] += 1
+                short -= 1
+        return alloc
+
+    def holdout_split(self, df: pd.DataFrame, target: str, task: str, frac: float = 0.2,
+                      max_rows: int = 200_000, min_rows: int = 50):
+        """
+        Returns (train, holdout). Stratified by class for classification,
+        a uniform split otherwise; holdout is None for frames below
+        `min_rows` rows and for time series, which keep every row.
+        """
+        n = len(df)
+        if task == "timeseries" or n < min_rows:
+            return df, None
+        k = min(max(int(round(n * frac)), 1), max_rows)
+        rng = np.random.default_rng(self.random_state)
+
+        mask = np.zeros(n, dtype=bool)
+        if task == "classification":
+            # per-class quota proportional to class size, never a whole class
+            codes = pd.factorize(df[target])[0]
+            for c in range(codes.max() + 1):
+                idx = np.flatnonzero(codes == c)
+                q = min(int(round(len(idx) * k / n)), len(idx) - 1)
+                if q > 0:
+                    mask[rng.choice(idx, q, replace=False)] = True
+        else:
+            mask[rng.choice(n, k, replace=False)] = True
+
+        return df[~mask].reset_index(drop=True), df[mask].reset_index(drop=True)
+
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _label_codes(df: pd.DataFrame, target: str):
+        """
+        Returns (df, categorical): string and categorical feature columns
+        replaced by integer codes (NaN where missing), and the names of
+        those with few enough levels for the proxy to treat as categories.
+        """
+        cols = [c for c in df.columns if c != target and (isinstance(df[c].dtype, pd.CategoricalDtype)
+                                                          or pd.api.types.is_object_dtype(df[c])
+                                                          or pd.api.types.is_string_dtype(df[c]))]
+        if not cols:
+            return df, set()
+        coded, categorical = {}, set()
+        for c in cols:
+            codes, uniques = pd.factorize(df[c])
+            coded[c] = np.where(codes >= 0, codes, np.nan).astype(np.float32)
+            if len(uniques) <= 250:  # HistGradientBoosting caps categories below max_bins
+                categorical.add(c)
+        return df.assign(**coded), categorical
+
+    def _proxy_score(self, train: pd.DataFrame, holdout: pd.DataFrame, target: str, task: str,
+                     categorical=()) -> float:
+        from .feature_matrix import split_xy
+        from scipy import sparse
+
+        X, y, names = split_xy(train, target)
+        Xh, yh, _ = split_xy(holdout, target)
+        if sparse.issparse(X):
+            from sklearn.linear_model import SGDClassifier, SGDRegressor
+            model = SGDClassifier(random_state=self.random_state) if task == "classification" \
+                else SGDRegressor(random_state=self.random_state)
+        else:
+            from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+            mask = [c in categorical for c in names] if categorical else None
+            cls = HistGradientBoostingClassifier if task == "classification" else HistGradientBoostingRegressor
+            model = cls(max_iter=50, categorical_features=mask, random_state=self.random_state)
+        model.fit(X, y)
+        return float(model.score(Xh, yh))
+
+    def progressive(self, df: pd.DataFrame, target: str, task: str):
+        """
+        Returns (rows, curve): the smallest training size whose successor
+        improved the proxy holdout score by less than `tol`, and the
+        learning curve as [{"rows", "score", "seconds"}].
+        """
+        n = len(df)
+        # codes are assigned once so the pool and the holdout agree on them
+        df, categorical = self._label_codes(df[df[target].notna()], target)
+        n_hold = min(self.holdout_rows, len(df) // 5)
+        perm = np.random.default_rng(self.random_state).permutation(len(df))
+        holdout, pool = df.iloc[perm[:n_hold]], df.iloc[perm[n_hold:]]
+
+        deadline = time.monotonic() + self.time_budget
+        curve, size, best = [], min(self.start_rows, len(pool)), None
+        while True:
+            t0 = time.monotonic()
+            score = self._proxy_score(pool.iloc[:size], holdout, target, task, categorical)
+            curve.append({"rows": size, "score": round(score, 6), "seconds": round(time.monotonic() - t0, 3)})
+
+            if best is not None and score - best["score"] < self.tol:
+                return best["rows"], curve
+            best = curve[-1]
+            if size >= len(pool) or time.monotonic() > deadline:
+                return (n if size >= len(pool) else size), curve
+            size = min(int(size * self.growth), len(pool))
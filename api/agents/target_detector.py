@@ -1,16 +1,66 @@
 # api/agents/target_detector.py
 
+import re
 import pandas as pd
 
+from .column_stats import ColumnStats
+
 
 class TargetDetectorAgent:
     """
     Auto-detects target column using heuristics.
+
+    Candidates are scored from a shared ColumnStats profile (sketched
+    distinct counts, missing counts, sample dtypes) instead of a full
+    nunique() over every column: ID-like, constant, free-text and date
+    columns are ruled out, and low-cardinality labels, target-like names
+    and the last column (the usual CSV convention) score higher.
     """
 
     COMMON_NAMES = ["target", "label", "class", "output", "y"]
+    NAME_HINTS = ("target", "label", "class", "outcome", "result", "churn", "default",
+                  "survived", "fraud", "price", "sales", "score", "rating")
+    ID_PATTERN = re.compile(r"(^|_)(id|uuid|key|index)$|^unnamed", re.IGNORECASE)
+
+    def score(self, stats: ColumnStats, col, position: int) -> float:
+        rows = max(stats.rows, 1)
+        sample = stats.sample[col]
+        distinct = stats.distinct(col)
+        missing = 1.0 - stats.count[col] / rows
+        ratio = distinct / max(stats.count[col], 1)
+        name = str(col).lower()
+
+        if distinct <= 1 or pd.api.types.is_datetime64_any_dtype(sample):
+            return float("-inf")
+
+        s = 0.0
+        numeric = col in stats.numeric
+        if self.ID_PATTERN.search(name) or (ratio > 0.95 and stats.count[col] > 20
+                                            and (not numeric or pd.api.types.is_integer_dtype(sample))):
+            s -= 5.0  # identifiers: every value (nearly) unique
+        if not numeric and ratio > 0.5:
+            s -= 4.0  # free text or high-cardinality categories
+
+        if distinct == 2:
+            s += 2.0
+        elif distinct <= 20:
+            s += 1.5
+        elif numeric:
+            s += 0.5
+
+        if any(h in name for h in self.NAME_HINTS):
+            s += 2.0
+        if position == len(stats.columns) - 1:
+            s += 2.0
+        s -= 3.0 * missing
+        return s
+
+    def rank(self, stats: ColumnStats):
+        """[(column, score)] sorted best first; ties keep column order."""
+        scores = [(c, self.score(stats, c, i)) for i, c in enumerate(stats.columns)]
+        return sorted(scores, key=lambda t: -t[1])
 
-    def detect(self, df: pd.DataFrame, override=None, autodetect=True):
+    def detect(self, df: pd.DataFrame, override=None, autodetect=True, stats: ColumnStats = None):
 
         # Manual user override
         if override and override in df.columns:
@@ -26,6 +76,6 @@ class TargetDetectorAgent:
             if name in lower_map:
                 return lower_map[name]
 
-        # 2. Column with lowest unique values
-        nunique = df.nunique().sort_values()
-        return nunique.index[0]
+        # 2. Best scoring candidate
+        stats = stats or ColumnStats.from_frame(df)
+        return self.rank(stats)[0][0]
@@ -1,9 +1,6 @@
 # api/agents/timeseries_agent.py
 
 import pandas as pd
-from prophet import Prophet
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
-from autots import AutoTS
 
 
 class TimeSeriesAgent:
@@ -35,6 +32,7 @@ class TimeSeriesAgent:
 
         # ---------------- Prophet ----------------
         try:
+            from prophet import Prophet
             m = Prophet()
             m.fit(data)
             return m, [{"model": "prophet", "status": "success"}]
@@ -43,6 +41,7 @@ class TimeSeriesAgent:
 
         # ---------------- ETS ----------------
         try:
+            from statsmodels.tsa.holtwinters import ExponentialSmoothing
             ets = ExponentialSmoothing(df[target], trend='add').fit()
             return ets, [{"model": "ets", "status": "success"}]
         except:
@@ -50,6 +49,7 @@ class TimeSeriesAgent:
 
         # ---------------- AutoTS ----------------
         try:
+            from autots import AutoTS
             model = AutoTS(
                 forecast_length=12,
                 frequency='infer',
@@ -0,0 +1,220 @@
+# api/artifact_builder.py
+"""
+Run artifact packaging.
+
+ArtifactBuilder writes a run's ZIP member by member while the pipeline is
+still going. Each stage adds its outputs (plots, transformer, model, schema,
+notebook, report) when it finishes, and finalize() only appends a manifest
+and moves the file into place. Until then the bundle lives at
+<path>.partial, so a half-written ZIP is never served. stream_zip() builds a
+ZIP on the fly into a response body instead of a file.
+
+Codec and level come from AUTOMIND_ARTIFACT_CODEC (deflate, stored, bzip2,
+lzma) and AUTOMIND_ARTIFACT_LEVEL. Already-compressed members such as PNGs
+are always stored.
+"""
+
+import io
+import os
+import json
+import time
+import base64
+import zipfile
+from threading import Lock
+from typing import Iterable, Iterator, Tuple, Union, Optional, Callable, BinaryIO, List, Dict, Any
+
+ARTIFACT_CODEC = os.getenv("AUTOMIND_ARTIFACT_CODEC", "deflate")
+ARTIFACT_LEVEL = int(os.getenv("AUTOMIND_ARTIFACT_LEVEL", "6"))
+
+CODECS = {
+    "deflate": zipfile.ZIP_DEFLATED,
+    "stored": zipfile.ZIP_STORED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+PRECOMPRESSED = (".png", ".jpg", ".jpeg", ".gz", ".zip", ".parquet", ".pq", ".xz", ".bz2")
+CHUNK = 1 << 20
+
+
+def resolve_codec(codec: Optional[str] = None, level: Optional[int] = None) -> Tuple[int, Optional[int]]:
+    """Returns (zipfile compression constant, compresslevel)."""
+    codec = (codec or ARTIFACT_CODEC).lower()
+    if codec not in CODECS:
+        raise ValueError(f"codec must be one of {sorted(CODECS)}")
+    level = ARTIFACT_LEVEL if level is None else level
+    if codec == "deflate" and not 0 <= level <= 9:
+        raise ValueError("deflate level must be 0-9")
+    if codec == "bzip2" and not 1 <= level <= 9:
+        raise ValueError("bzip2 level must be 1-9")
+    # stored and lzma ignore the level
+    return CODECS[codec], level if codec in ("deflate", "bzip2") else None
+
+
+def _zinfo(arcname: str, compression: int, level: Optional[int], size: int = 0) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(arcname, time.localtime()[:6])
+    if arcname.lower().endswith(PRECOMPRESSED):
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = compression
+        info._compresslevel = level  # zipfile only takes a per-member level this way
+    info.file_size = size
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def _copy(src, dest):
+    while True:
+        block = src.read(CHUNK)
+        if not block:
+            return
+        dest.write(block)
+
+
+class ArtifactBuilder:
+
+    def __init__(self, path: str, codec: Optional[str] = None, level: Optional[int] = None):
+        self.path = path
+        self.partial = path + ".partial"
+        self.compression, self.level = resolve_codec(codec, level)
+        self.members: List[Dict[str, Any]] = []
+        self._lock = Lock()
+        self._zip = None
+        self._done = False
+
+    def _open(self):
+        if self._zip is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._zip = zipfile.ZipFile(self.partial, "w")
+        return self._zip
+
+    def _record(self, arcname: str, size: int):
+        self.members.append({"name": arcname, "size": size})
+
+    def add_file(self, path: Optional[str], arcname: Optional[str] = None) -> bool:
+        if not path or not os.path.exists(path):
+            return False
+        arcname = arcname or os.path.basename(path)
+        size = os.path.getsize(path)
+        with self._lock:
+            # a stage that outlived its timeout must not reopen a finished bundle
+            if self._done:
+                return False
+            with open(path, "rb") as src, self._open().open(
+                    _zinfo(arcname, self.compression, self.level, size), "w") as dest:
+                _copy(src, dest)
+            self._record(arcname, size)
+        return True
+
+    def add_bytes(self, arcname: str, data: bytes):
+        with self._lock:
+            if self._done:
+                return
+            self._open().writestr(_zinfo(arcname, self.compression, self.level, len(data)), data)
+            self._record(arcname, len(data))
+
+    def add_json(self, arcname: str, obj):
+        self.add_bytes(arcname, json.dumps(obj, indent=2, default=str).encode("utf-8"))
+
+    def add_images(self, prefix: str, images: Iterable[str]):
+        """Base64 PNGs as produced by the EDA and explainability agents."""
+        for i, b64 in enumerate(images or []):
+            self.add_bytes(f"plots/{prefix}_{i}.png", base64.b64decode(b64))
+
+    def finalize(self, manifest: Dict[str, Any] = None) -> str:
+        with self._lock:
+            data = json.dumps({**(manifest or {}), "members": self.members}, indent=2, default=str).encode("utf-8")
+            self._open().writestr(_zinfo("manifest.json", self.compression, self.level, len(data)), data)
+            self._done = True
+            self._zip.close()
+            self._zip = None
+            os.replace(self.partial, self.path)
+        return self.path
+
+    def abort(self):
+        with self._lock:
+            self._done = True
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+            if os.path.exists(self.partial):
+                os.remove(self.partial)
+
+
+# ======================== On-the-fly ZIP streams ==================
+class _Sink(io.RawIOBase):
+    """Unseekable buffer; zipfile then writes data descriptors instead of seeking back."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# a file path, the member's bytes, or a callable returning (binary file object, size)
+Source = Union[str, bytes, Callable[[], Tuple[BinaryIO, int]]]
+
+
+def stream_zip(members: Iterable[Tuple[str, Source]], codec: Optional[str] = None,
+               level: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yields a ZIP of `members` ((arcname, source) pairs) as it is
+    compressed, holding about one CHUNK of output in memory at a time.
+    """
+    compression, level = resolve_codec(codec, level)
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w") as z:
+        for arcname, source in members:
+            if isinstance(source, bytes):
+                z.writestr(_zinfo(arcname, compression, level, len(source)), source)
+            else:
+                src, size = (open(source, "rb"), os.path.getsize(source)) if isinstance(source, str) else source()
+                with src, z.open(_zinfo(arcname, compression, level, size), "w") as dest:
+                    while True:
+                        block = src.read(CHUNK)
+                        if not block:
+                            break
+                        dest.write(block)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def zip_members(path: str) -> Iterator[Tuple[str, Source]]:
+    """Members of a finished ZIP, read lazily, for re-streaming it with another codec."""
+    with zipfile.ZipFile(path) as z:
+        for info in z.infolist():
+            if not info.is_dir():
+                yield info.filename, lambda info=info: (z.open(info), info.file_size)
+
+
+def run_members(run_id: str) -> List[Tuple[str, Source]]:
+    """
+    What a run has on disk so far, named as in its finished artifact; used
+    to stream a bundle for a run whose ZIP is missing or still being built.
+    """
+    from api.model_registry import model_registry
+
+    members: List[Tuple[str, Source]] = []
+    for path in (f"reports/report_{run_id}.html", f"reports/notebook_{run_id}.ipynb",
+                 f"artifacts/preprocessor_{run_id}.joblib"):
+        if os.path.exists(path):
+            members.append((os.path.basename(path), path))
+    if model_registry.has(run_id):
+        members.append((f"model_{run_id}.joblib", model_registry.path(run_id)))
+        bundle = model_registry.load(run_id)
+        members.append(("schema.json", json.dumps(bundle.schema(), indent=2, default=str).encode("utf-8")))
+    return members
@@ -0,0 +1,170 @@
+# api/dag.py
+"""
+Small dependency-graph executor for pipeline stages.
+
+Each Stage reads what it needs from a shared context dict and returns a dict
+of outputs that is merged back into it. Stages whose dependencies have all
+finished are submitted to a thread pool, so independent work (EDA plots vs.
+preprocessing, SHAP vs. evaluation, notebook vs. report) overlaps.
+
+A stage that raises or exceeds its timeout is handed to its `fallback`,
+whose return value stands in for the stage's outputs; stages without a
+fallback abort the whole run. Threads cannot be killed, so a timed-out stage
+keeps running in the background but its result is discarded.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
+from typing import Callable, Dict, Any, Iterable, Optional
+
+from api.profiling import StageProfiler, frame_stats
+
+MAX_WORKERS = int(os.getenv("AUTOMIND_STAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Named locks for stages that touch process-global state (e.g. pyplot)
+_named_locks: Dict[str, Lock] = {}
+_named_locks_guard = Lock()
+
+
+def named_lock(name: str) -> Lock:
+    with _named_locks_guard:
+        return _named_locks.setdefault(name, Lock())
+
+
+class StageTimeout(Exception):
+    pass
+
+
+class Stage:
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+        deps: Iterable[str] = (),
+        fallback: Optional[Callable[[Dict[str, Any], Exception], Optional[Dict[str, Any]]]] = None,
+        timeout: Optional[float] = None,
+        locks: Iterable[str] = (),
+        frames: Iterable[str] = (),
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.fallback = fallback
+        self.timeout = timeout
+        self.locks = tuple(sorted(locks))
+        # context keys of input frames whose size goes into the stage profile
+        self.frames = tuple(frames)
+
+
+class DAGExecutor:
+
+    def __init__(self, stages: Iterable[Stage], max_workers: int = MAX_WORKERS,
+                 on_stage_end: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.stages = {s.name: s for s in stages}
+        self.max_workers = max(1, max_workers)
+        self.on_stage_end = on_stage_end
+        self.profiles: Dict[str, Dict[str, Any]] = {}
+        self._check()
+
+    def _check(self):
+        for s in self.stages.values():
+            missing = [d for d in s.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"stage {s.name!r} depends on unknown stages {missing}")
+
+        # Kahn's algorithm: every stage must be reachable without a cycle
+        indeg = {n: len(s.deps) for n, s in self.stages.items()}
+        ready = [n for n, d in indeg.items() if d == 0]
+        seen = 0
+        while ready:
+            n = ready.pop()
+            seen += 1
+            for m, s in self.stages.items():
+                if n in s.deps:
+                    indeg[m] -= 1
+                    if indeg[m] == 0:
+                        ready.append(m)
+        if seen != len(self.stages):
+            raise ValueError("pipeline stages contain a dependency cycle")
+
+    def _call(self, stage: Stage, ctx: Dict[str, Any]):
+        locks = [named_lock(n) for n in stage.locks]
+        for lk in locks:
+            lk.acquire()
+        try:
+            profile = {"inputs": {k: frame_stats(ctx.get(k)) for k in stage.frames}}
+            self.profiles[stage.name] = profile
+            prof = StageProfiler()
+            try:
+                with prof:
+                    return stage.fn(ctx)
+            finally:
+                profile.update(prof.to_dict())
+        finally:
+            for lk in reversed(locks):
+                lk.release()
+
+    def _finish_profile(self, stage: Stage, outcome: str, out):
+        profile = self.profiles.setdefault(stage.name, {})
+        profile["outcome"] = outcome
+        if outcome == "timeout":
+            profile.setdefault("wall_s", stage.timeout)
+        if out:
+            outputs = {k: frame_stats(v) for k, v in out.items()}
+            profile["outputs"] = {k: v for k, v in outputs.items() if v is not None}
+        if self.on_stage_end is not None:
+            self.on_stage_end(stage.name, profile)
+
+    def _recover(self, stage: Stage, ctx: Dict[str, Any], exc: Exception):
+        if stage.fallback is None:
+            raise exc
+        return stage.fallback(ctx, exc)
+
+    def run(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        done, started = set(), set()
+        running = {}  # future -> (stage, deadline)
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="automind-stage")
+        try:
+            while True:
+                for name, stage in self.stages.items():
+                    if name in started or not all(d in done for d in stage.deps):
+                        continue
+                    started.add(name)
+                    deadline = time.monotonic() + stage.timeout if stage.timeout else None
+                    running[pool.submit(self._call, stage, ctx)] = (stage, deadline)
+
+                if not running:
+                    break
+
+                deadlines = [d for _, d in running.values() if d is not None]
+                wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                finished, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                now = time.monotonic()
+                for fut in list(running):
+                    stage, deadline = running[fut]
+                    if fut in finished:
+                        del running[fut]
+                        try:
+                            out, outcome = fut.result(), "ok"
+                        except Exception as e:
+                            out, outcome = self._recover(stage, ctx, e), "error"
+                    elif deadline is not None and now >= deadline:
+                        del running[fut]
+                        out = self._recover(stage, ctx, StageTimeout(f"stage {stage.name!r} timed out after {stage.timeout}s"))
+                        outcome = "timeout"
+                    else:
+                        continue
+                    self._finish_profile(stage, outcome, out)
+                    if out:
+                        ctx.update(out)
+                    done.add(stage.name)
+        finally:
+            # don't block on abandoned (timed-out) stages
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return ctx
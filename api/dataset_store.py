@@ -0,0 +1,107 @@
+# api/dataset_store.py
+"""
+Content-addressed dataset cache.
+
+Uploads are identified by a hash of their raw bytes. The typed frame produced
+by DataLoaderAgent is stored once as Parquet under CACHE_DIR/datasets, so a
+repeat run on the same data can skip upload, CSV parsing and type coercion.
+Files are evicted least-recently-used first once the directory grows past
+AUTOMIND_DATASET_CACHE_MB.
+"""
+
+import os
+import uuid
+from typing import Optional, List, Dict, Any
+
+import pandas as pd
+
+CACHE_DIR = os.getenv("AUTOMIND_CACHE_DIR", "cache")
+MAX_BYTES = int(float(os.getenv("AUTOMIND_DATASET_CACHE_MB", "2048")) * 1024 * 1024)
+
+
+class DatasetStore:
+
+    def __init__(self, root: str = None, max_bytes: int = MAX_BYTES):
+        self.root = root or os.path.join(CACHE_DIR, "datasets")
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, dataset_id: str) -> str:
+        # dataset ids are hex digests; reject anything that could escape the cache dir
+        if not dataset_id or not all(c in "0123456789abcdef" for c in dataset_id):
+            raise ValueError(f"invalid dataset id: {dataset_id!r}")
+        return os.path.join(self.root, f"{dataset_id}.parquet")
+
+    def has(self, dataset_id: str) -> bool:
+        try:
+            return os.path.exists(self.path(dataset_id))
+        except ValueError:
+            return False
+
+    def load(self, dataset_id: str) -> Optional[pd.DataFrame]:
+        if not self.has(dataset_id):
+            return None
+        path = self.path(dataset_id)
+        df = pd.read_parquet(path)
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return df
+
+    def iter_batches(self, dataset_id: str, batch_rows: int = 250_000):
+        """
+        Yields the cached frame in row batches without loading it whole.
+        """
+        import pyarrow.parquet as pq
+
+        path = self.path(dataset_id)
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=batch_rows):
+            yield batch.to_pandas()
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def save(self, dataset_id: str, df: pd.DataFrame) -> str:
+        path = self.path(dataset_id)
+        tmp = f"{path}.{uuid.uuid4().hex[:6]}.tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict(keep=dataset_id)
+        return path
+
+    def list(self) -> List[Dict[str, Any]]:
+        out = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".parquet"):
+                continue
+            st = os.stat(os.path.join(self.root, name))
+            out.append({
+                "dataset_id": name[:-len(".parquet")],
+                "bytes": st.st_size,
+                "last_used": st.st_mtime,
+            })
+        return sorted(out, key=lambda d: d["last_used"], reverse=True)
+
+    def evict(self, keep: str = None):
+        entries = self.list()
+        total = sum(e["bytes"] for e in entries)
+        for e in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if e["dataset_id"] == keep:
+                continue
+            try:
+                os.remove(self.path(e["dataset_id"]))
+                total -= e["bytes"]
+            except OSError:
+                pass
+
+
+dataset_store = DatasetStore()
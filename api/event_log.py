@@ -0,0 +1,211 @@
+# api/event_log.py
+"""
+Buffered, rotating event log.
+
+EventLogWriter.write() only enqueues; a background thread drains the queue
+and appends batches to LOG_DIR/execution.jsonl through one open handle,
+flushing every AUTOMIND_LOG_FLUSH_S seconds or AUTOMIND_LOG_FLUSH_KB of
+pending output. The active file is rotated when it passes
+AUTOMIND_LOG_MAX_MB or the day changes: it is renamed with a timestamp,
+gzip-compressed, and the oldest segments beyond AUTOMIND_LOG_KEEP are
+deleted. index.json maps each segment to the run_ids it contains, so
+read_run() opens only the segments of one run instead of the whole log.
+"""
+
+import os
+import gzip
+import json
+import time
+import queue
+import shutil
+import atexit
+from datetime import date
+from threading import Thread, Lock, Event
+from typing import Dict, Any, List, Set
+
+LOG_DIR = "logs"
+ACTIVE = "execution.jsonl"
+MAX_BYTES = int(float(os.getenv("AUTOMIND_LOG_MAX_MB", "64")) * 1024 * 1024)
+FLUSH_S = float(os.getenv("AUTOMIND_LOG_FLUSH_S", "1.0"))
+FLUSH_BYTES = int(float(os.getenv("AUTOMIND_LOG_FLUSH_KB", "256")) * 1024)
+KEEP = int(os.getenv("AUTOMIND_LOG_KEEP", "30"))
+
+_STOP = object()
+
+
+class EventLogWriter:
+
+    def __init__(self, root: str = LOG_DIR, max_bytes: int = MAX_BYTES, flush_s: float = FLUSH_S,
+                 flush_bytes: int = FLUSH_BYTES, keep: int = KEEP):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.flush_s = flush_s
+        self.flush_bytes = flush_bytes
+        self.keep = keep
+        self.path = os.path.join(root, ACTIVE)
+        self.index_path = os.path.join(root, "index.json")
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = Lock()
+        self._flushed = Event()
+        self._index_lock = Lock()
+        self._index: Dict[str, Set[str]] = {}  # segment -> run_ids
+
+    # ------------------------------------------------------------
+
+    def write(self, entry: Dict[str, Any]):
+        if self._thread is None or self._pid != os.getpid():
+            self._start()
+        self._queue.put(entry)
+
+    def flush(self, timeout: float = 5.0):
+        """Blocks until everything written so far is on disk."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._flushed.clear()
+        self._queue.put(None)
+        self._flushed.wait(timeout)
+
+    def close(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+
+    def read_run(self, run_id: str) -> List[Dict[str, Any]]:
+        """Events of one run, oldest first, from the segments that hold it."""
+        self.flush()
+        with self._index_lock:
+            segments = sorted(s for s, runs in self._index.items() if run_id in runs and s != ACTIVE)
+            if run_id in self._index.get(ACTIVE, ()):
+                segments.append(ACTIVE)
+        out = []
+        for seg in segments:
+            path = os.path.join(self.root, seg)
+            opener = gzip.open if seg.endswith(".gz") else open
+            try:
+                with opener(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        # cheap substring test before parsing
+                        if run_id in line:
+                            ev = json.loads(line)
+                            if ev.get("run_id") == run_id:
+                                out.append(ev)
+            except OSError:
+                continue
+        return out
+
+    # ------------------------------------------------------------
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            os.makedirs(self.root, exist_ok=True)
+            self._load_index()
+            self._pid = os.getpid()
+            self._thread = Thread(target=self._run, name="automind-event-log", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _load_index(self):
+        index = {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = {k: set(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            pass
+        # the active segment is not in the saved index; rebuild it (bounded by max_bytes)
+        runs = set()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        runs.add(json.loads(line).get("run_id"))
+                    except ValueError:
+                        pass
+        except OSError:
+            pass
+        index[ACTIVE] = runs
+        with self._index_lock:
+            self._index = index
+
+    def _save_index(self):
+        with self._index_lock:
+            data = {k: sorted(v, key=str) for k, v in self._index.items() if k != ACTIVE}
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.index_path)
+
+    def _run(self):
+        f = open(self.path, "a", encoding="utf-8")
+        day = date.today()
+        size = f.tell()
+        pending, pending_bytes, runs = [], 0, set()
+        deadline = time.monotonic() + self.flush_s
+
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = ...
+
+            if isinstance(item, dict):
+                line = json.dumps(item, default=str) + "\n"
+                pending.append(line)
+                pending_bytes += len(line)
+                runs.add(item.get("run_id"))
+                if pending_bytes < self.flush_bytes:
+                    continue
+
+            # flush: timer expired, buffer full, explicit flush() or stop
+            if pending:
+                f.write("".join(pending))
+                f.flush()
+                size += pending_bytes
+                with self._index_lock:
+                    self._index.setdefault(ACTIVE, set()).update(runs)
+                pending, pending_bytes, runs = [], 0, set()
+            deadline = time.monotonic() + self.flush_s
+
+            if size >= self.max_bytes or (size and date.today() != day):
+                f.close()
+                self._rotate()
+                f = open(self.path, "a", encoding="utf-8")
+                day, size = date.today(), 0
+
+            if item is None:
+                self._flushed.set()
+            elif item is _STOP:
+                f.close()
+                self._flushed.set()
+                return
+
+    def _rotate(self):
+        stamp, seq = time.strftime("%Y%m%d-%H%M%S"), 0
+        while os.path.exists(os.path.join(self.root, f"execution-{stamp}-{seq:03d}.jsonl.gz")):
+            seq += 1
+        name = f"execution-{stamp}-{seq:03d}.jsonl.gz"
+        rotated = os.path.join(self.root, name[:-len(".gz")])
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(os.path.join(self.root, name), "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+
+        with self._index_lock:
+            self._index[name] = self._index.pop(ACTIVE, set())
+            self._index[ACTIVE] = set()
+            old = sorted(s for s in self._index if s != ACTIVE)[:-self.keep] if self.keep > 0 else []
+            for seg in old:
+                self._index.pop(seg, None)
+        for seg in old:
+            try:
+                os.remove(os.path.join(self.root, seg))
+            except OSError:
+                pass
+        self._save_index()
+
+
+event_log = EventLogWriter()
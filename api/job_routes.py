@@ -0,0 +1,117 @@
+# api/job_routes.py
+import os
+import uuid
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from api.jobs import job_manager, spool_upload, JobQueueFull
+from api.dataset_store import dataset_store
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def pipeline_params(autodetect: str, target: str, tune: str, advanced_fe: str, sample_frac: str,
+                    notebook: bool = True, sample_rows: str = "", time_col: str = "", tune_budget: str = "",
+                    engine: str = "", half_life: str = ""):
+    """
+    Convert the string form fields shared by /run_agent and /jobs into run_pipeline kwargs.
+    """
+    return {
+        "autodetect_target": (autodetect.lower() == "true"),
+        "target_override": target if target.strip() else None,
+        "tune_rounds": int(tune),
+        "advanced_fe": (advanced_fe.lower() == "true"),
+        "sample_frac": float(sample_frac),
+        "notebook": notebook,
+        "sample_rows": int(sample_rows) if sample_rows.strip() else None,
+        "time_col": time_col.strip() or None,
+        # seconds; with time_col, samples favour recent rows
+        "half_life": float(half_life) if half_life.strip() else None,
+        "tune_budget": float(tune_budget) if tune_budget.strip() else None,
+        "engine": engine.strip().lower() or None,
+    }
+
+
+async def resolve_input(job_id: str, file: Optional[UploadFile], dataset_id: str):
+    """
+    Returns (data_path, dataset_id) for a run. Uploads whose content is
+    already in the dataset cache are discarded after hashing, so the worker
+    reads the cached Parquet copy instead of parsing the CSV again.
+    """
+    if file is None:
+        if not dataset_store.has(dataset_id):
+            raise LookupError(f"unknown dataset_id: {dataset_id!r}")
+        return None, dataset_id
+
+    path, digest = await run_in_threadpool(spool_upload, file.file, job_id)
+    if dataset_store.has(digest):
+        os.remove(path)
+        return None, digest
+    return path, digest
+
+
+@router.post("")
+async def submit_job(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: str = Form(""),
+    autodetect: str = Form("True"),
+    target: str = Form(""),
+    tune: str = Form("10"),
+    advanced_fe: str = Form("False"),
+    sample_frac: str = Form("1.0"),
+    sample_rows: str = Form(""),
+    time_col: str = Form(""),
+    half_life: str = Form(""),
+    tune_budget: str = Form(""),
+    engine: str = Form("")
+):
+    job_id = str(uuid.uuid4())[:8]
+    try:
+        params = pipeline_params(autodetect, target, tune, advanced_fe, sample_frac,
+                                 sample_rows=sample_rows, time_col=time_col, half_life=half_life,
+                                 tune_budget=tune_budget, engine=engine)
+    except ValueError as e:
+        return JSONResponse({"error": "invalid form field", "detail": str(e)}, status_code=400)
+
+    if file is None and not dataset_id.strip():
+        return JSONResponse({"error": "file or dataset_id required"}, status_code=400)
+
+    stats = job_manager.stats()
+    if stats["queued"] >= job_manager.max_queue and stats["running"] >= job_manager.max_workers:
+        return JSONResponse({"error": "job queue is full", "detail": stats}, status_code=429)
+
+    try:
+        path, params["dataset_id"] = await resolve_input(job_id, file, dataset_id)
+    except LookupError as e:
+        return JSONResponse({"error": "dataset not found", "detail": str(e)}, status_code=404)
+
+    try:
+        job_manager.submit(job_id, path, params)
+    except JobQueueFull as e:
+        if path:
+            os.remove(path)
+        return JSONResponse({"error": "job queue is full", "detail": str(e)}, status_code=429)
+
+    return JSONResponse(job_manager.describe(job_id), status_code=202)
+
+
+@router.get("")
+def jobs_stats():
+    return JSONResponse(job_manager.stats())
+
+
+@router.get("/{job_id}")
+def job_status(job_id: str):
+    info = job_manager.describe(job_id)
+    if info is None:
+        return JSONResponse({"error": "not found"}, status_code=404)
+    return JSONResponse(info)
+
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return JSONResponse({"error": "not found"}, status_code=404)
+    return JSONResponse(job_manager.describe(job_id))
@@ -0,0 +1,394 @@
+# api/jobs.py
+"""
+Background job subsystem for AutoMind pipelines.
+
+Each submitted job runs AutoMindMasterAgent.run_pipeline in its own worker
+process so a long PyCaret run never blocks the API event loop. At most
+AUTOMIND_MAX_WORKERS jobs run at once; further submissions wait in a FIFO
+queue of at most AUTOMIND_MAX_QUEUE entries and are rejected beyond that.
+
+The AUTOMIND_CPU_CORES cores (default: all the API may use) are split into
+one disjoint slot per worker. A job's process is pinned to its slot and its
+BLAS/OpenMP pools and PyCaret n_jobs are capped to the slot size, so
+concurrent trainings never oversubscribe the machine.
+
+Every worker reports its events and result over its own pipe, so
+terminating one job on cancel cannot corrupt a channel other jobs use. A
+worker that exits without posting a result, cleanly or not, is reaped as
+failed.
+"""
+
+import os
+import time
+import hashlib
+import multiprocessing
+from multiprocessing.connection import wait as wait_ready
+from collections import deque
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Dict, Any, Optional
+
+from api.monitoring import emit_event, publish_event, set_event_sink
+
+UPLOAD_DIR = "uploads"
+
+MAX_WORKERS = int(os.getenv("AUTOMIND_MAX_WORKERS", "2"))
+MAX_QUEUE = int(os.getenv("AUTOMIND_MAX_QUEUE", "16"))
+START_METHOD = os.getenv("AUTOMIND_JOB_START_METHOD") or None
+
+
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        return list(range(os.cpu_count() or 1))
+
+
+CPU_CORES = int(os.getenv("AUTOMIND_CPU_CORES", "0")) or len(available_cpus())
+
+_THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+               "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def limit_cores(cpus):
+    """
+    Pin the calling process to `cpus` and cap native thread pools to match.
+    Environment variables cover libraries loaded later and child processes.
+    """
+    n = str(len(cpus))
+    for var in _THREAD_ENV:
+        os.environ[var] = n
+    try:
+        os.sched_setaffinity(0, cpus)
+    except (AttributeError, OSError):
+        pass
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(len(cpus))
+    except ImportError:
+        pass
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the pending queue is at capacity."""
+
+
+class Job:
+
+    def __init__(self, job_id: str, data_path: Optional[str], params: Dict[str, Any]):
+        self.job_id = job_id
+        self.data_path = data_path
+        self.params = params
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.process = None
+        self.conn = None
+        self.cancelling = False
+        self.slot = None
+        self.cpus = []
+        self.future = Future()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def to_dict(self, queue_position: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "queue_position": queue_position,
+            "cores": len(self.cpus) or None,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def spool_upload(fileobj, job_id: str):
+    """
+    Copy an uploaded file object to disk so a worker process can read it.
+    Returns (path, dataset_id) where dataset_id is a hash of the raw bytes.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, f"{job_id}.csv")
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        while True:
+            block = fileobj.read(1024 * 1024)
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+    return path, digest.hexdigest()[:16]
+
+
+class _PipeSink:
+    """
+    Worker end of a job's pipe. Pipeline stages run on several threads, so
+    sends are serialized.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._lock = Lock()
+
+    def put(self, entry: Dict[str, Any]):
+        self.send(("event", entry))
+
+    def send(self, message):
+        with self._lock:
+            self._conn.send(message)
+
+
+def _job_worker(job_id: str, data_path: Optional[str], params: Dict[str, Any], conn, cpus=None):
+    """
+    Entry point of a job worker process.
+    """
+    sink = _PipeSink(conn)
+    set_event_sink(sink)
+    if cpus:
+        limit_cores(cpus)
+    try:
+        from api.agents.master_agent import AutoMindMasterAgent
+        from api.dag import MAX_WORKERS as STAGE_WORKERS
+
+        if cpus:
+            agent = AutoMindMasterAgent(run_id=job_id, n_jobs=len(cpus),
+                                        max_workers=max(1, min(STAGE_WORKERS, len(cpus))))
+        else:
+            agent = AutoMindMasterAgent(run_id=job_id)
+        res = agent.run_pipeline(df=data_path, **params)
+        sink.send(("result", "completed", res))
+    except Exception as e:
+        sink.send(("result", "failed", str(e)))
+    finally:
+        set_event_sink(None)
+
+
+class JobManager:
+    """
+    Bounded worker pool with admission control and cancellation.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE, start_method: str = START_METHOD,
+                 cpu_cores: int = CPU_CORES, worker=_job_worker):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+
+        # one disjoint core slot per worker (slots share cores only if there are fewer cores than workers)
+        cpus = available_cpus()[:max(1, cpu_cores)]
+        per_slot = max(1, len(cpus) // self.max_workers)
+        self._slots = [
+            cpus[(i * per_slot) % len(cpus):(i * per_slot) % len(cpus) + per_slot] for i in range(self.max_workers)
+        ]
+        self._free_slots = deque(range(self.max_workers))
+
+        self._ctx = multiprocessing.get_context(start_method)
+        # (job_id, data_path, params, conn, cpus) -> None; reports over `conn`
+        self._worker = worker
+
+        self._jobs: Dict[str, Job] = {}
+        self._pending = deque()
+        self._running: Dict[str, Job] = {}
+        self._lock = Lock()
+
+        self._supervisor = None
+        self._stopping = False
+
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+    # ------------------------------------------------------------
+
+    def submit(self, job_id: str, data_path: Optional[str], params: Dict[str, Any]) -> Job:
+        with self._lock:
+            if len(self._pending) >= self.max_queue and len(self._running) >= self.max_workers:
+                raise JobQueueFull(f"job queue is full ({self.max_queue} pending)")
+
+            job = Job(job_id, data_path, params)
+            self._jobs[job_id] = job
+            self._pending.append(job)
+
+        emit_event(job_id, "job", "queued", {"queue_depth": len(self._pending)})
+        self._ensure_supervisor()
+        self._schedule()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def describe(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            position = None
+            if job.status == "queued":
+                position = next((i for i, j in enumerate(self._pending) if j is job), None)
+            return job.to_dict(position)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        proc = None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done or job.cancelling:
+                return job
+
+            if job.status == "queued":
+                try:
+                    self._pending.remove(job)
+                except ValueError:
+                    pass
+                self._finish(job, "cancelled", error="cancelled by client")
+            else:
+                # the supervisor leaves the job alone until it is stopped below
+                job.cancelling = True
+                proc = job.process
+
+        if proc is not None:
+            # outside the lock: submit/poll/schedule must not wait on a dying worker
+            proc.terminate()
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.kill()
+                proc.join(timeout=5)
+            with self._lock:
+                if not job.done:
+                    self._running.pop(job_id, None)
+                    self._finish(job, "cancelled", error="cancelled by client")
+
+        emit_event(job_id, "pipeline", "cancelled")
+        self._schedule()
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": len(self._running),
+                "queued": len(self._pending),
+                "cores_per_job": len(self._slots[0]),
+            }
+
+    def shutdown(self):
+        self._stopping = True
+        with self._lock:
+            procs = [job.process for job in self._running.values() if job.process is not None]
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=5)
+
+    # ------------------------------------------------------------
+
+    def _finish(self, job: Job, status: str, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        job.process = None
+        if job.conn is not None:
+            job.conn.close()
+            job.conn = None
+        if job.slot is not None:
+            self._free_slots.append(job.slot)
+            job.slot = None
+        if not job.future.done():
+            job.future.set_result(job)
+        if job.data_path:
+            try:
+                os.remove(job.data_path)
+            except OSError:
+                pass
+
+    def _schedule(self):
+        with self._lock:
+            while self._pending and len(self._running) < self.max_workers:
+                job = self._pending.popleft()
+                job.slot = self._free_slots.popleft()
+                job.cpus = self._slots[job.slot]
+                reader, writer = self._ctx.Pipe(duplex=False)
+                proc = self._ctx.Process(
+                    target=self._worker,
+                    args=(job.job_id, job.data_path, job.params, writer, job.cpus),
+                    # Not daemonic: PyCaret/joblib need to start their own children.
+                    daemon=False,
+                )
+                proc.start()
+                writer.close()  # the worker holds the only write end, so its exit closes the pipe
+                job.process = proc
+                job.conn = reader
+                job.status = "running"
+                job.started_at = time.time()
+                self._running[job.job_id] = job
+
+    def _ensure_supervisor(self):
+        with self._lock:
+            if self._supervisor is None or not self._supervisor.is_alive():
+                self._supervisor = Thread(target=self._supervise, name="automind-jobs", daemon=True)
+                self._supervisor.start()
+
+    def _supervise(self):
+        while not self._stopping:
+            with self._lock:
+                jobs = [j for j in self._running.values() if not j.cancelling and j.conn is not None]
+            if not jobs:
+                time.sleep(0.25)
+                self._schedule()
+                continue
+
+            by_handle = {}
+            for job in jobs:
+                by_handle[job.conn] = job
+                by_handle[job.process.sentinel] = job
+            try:
+                ready = wait_ready(list(by_handle), timeout=0.25)
+            except OSError:  # a handle was closed by cancel() meanwhile
+                continue
+
+            for job in {id(by_handle[h]): by_handle[h] for h in ready}.values():
+                self._drain(job)
+                # Reap workers that exited without reporting: clean exit, OOM kill, segfault, ...
+                proc = job.process
+                with self._lock:
+                    if not job.done and not job.cancelling and proc is not None and not proc.is_alive():
+                        self._running.pop(job.job_id, None)
+                        self._finish(job, "failed",
+                                     error=f"worker exited with code {proc.exitcode} without a result")
+
+            self._schedule()
+
+    def _drain(self, job: Job):
+        """
+        Publishes pending events of `job` and records its result if posted.
+        """
+        conn = job.conn
+        while True:
+            try:
+                if conn is None or not conn.poll():
+                    return
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            if message[0] == "event":
+                publish_event(message[1])
+                continue
+            _, status, payload = message
+            with self._lock:
+                if not job.done and not job.cancelling:
+                    self._running.pop(job.job_id, None)
+                    if status == "completed":
+                        self._finish(job, status, result=payload)
+                    else:
+                        self._finish(job, status, error=payload)
+            return
+
+
+job_manager = JobManager()
@@ -1,12 +1,13 @@
 # api/main.py
 
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Header, Query
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, PlainTextResponse
 import pandas as pd
+import asyncio
 import os
 import uuid
-import json
 
 # Ensure needed directories exist
 os.makedirs("artifacts", exist_ok=True)
@@ -15,7 +16,8 @@ os.makedirs("mlruns", exist_ok=True)
 
 # Monitoring
 from api.monitor_routes import router as monitor_router
-from api.monitoring import sse_event_generator, read_latest
+from api.monitoring import sse_event_stream, read_latest, read_run
+from api.profiling import render_prometheus
 
 # Logging
 try:
@@ -26,8 +28,16 @@ except Exception:
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger("automind")
 
-# Master Agent
-from api.agents.master_agent import AutoMindMasterAgent
+# Background jobs
+from fastapi.concurrency import run_in_threadpool
+from api.job_routes import router as jobs_router, pipeline_params, resolve_input
+from api.jobs import job_manager, JobQueueFull
+from api.dataset_store import dataset_store
+from api.run_store import run_store
+from api.artifact_builder import stream_zip, zip_members, run_members, resolve_codec
+
+# Model registry / scoring
+from api.predict_routes import router as predict_router
 
 app = FastAPI(
     title="AutoMind DS-Agent",
@@ -36,6 +46,22 @@ app = FastAPI(
 
 # Add monitor endpoints
 app.include_router(monitor_router)
+app.include_router(jobs_router)
+app.include_router(predict_router)
+
+# Optional warm-up: import heavy libraries once so forked job workers inherit them
+PRELOAD = os.getenv("AUTOMIND_PRELOAD", "")
+
+@app.on_event("startup")
+def preload_agents():
+    if PRELOAD:
+        from api.agents import preload
+        failed = {k: v for k, v in preload(PRELOAD).items() if v}
+        logger.info(f"Preloaded agent dependencies ({PRELOAD}); failed: {failed or 'none'}")
+
+@app.on_event("shutdown")
+def shutdown_jobs():
+    job_manager.shutdown()
 
 # CORS
 app.add_middleware(
@@ -56,52 +82,103 @@ def home():
 def health():
     return {"status": "ok"}
 
+# Prometheus metrics (stage timings are aggregated from profile events)
+@app.get("/metrics")
+def metrics():
+    stats = job_manager.stats()
+    body = render_prometheus({
+        "automind_jobs_running": stats["running"],
+        "automind_jobs_queued": stats["queued"],
+        "automind_jobs_max_workers": stats["max_workers"],
+    })
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 # Main pipeline
 @app.post("/run_agent")
 async def run_agent(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    dataset_id: str = Form(""),
     autodetect: str = Form("True"),
     target: str = Form(""),
     tune: str = Form("10"),
     advanced_fe: str = Form("False"),
-    sample_frac: str = Form("1.0")
+    sample_frac: str = Form("1.0"),
+    sample_rows: str = Form(""),
+    time_col: str = Form(""),
+    half_life: str = Form(""),
+    tune_budget: str = Form(""),
+    engine: str = Form("")
 ):
 
     run_id = str(uuid.uuid4())[:8]
     logger.info(f"[{run_id}] Pipeline started")
 
-    # load CSV into pandas safely (support file-like)
-    try:
-        df = pd.read_csv(file.file)
-    except Exception as e:
-        logger.error(f"[{run_id}] Failed to read CSV: {e}")
-        return JSONResponse({"error": "failed to read uploaded CSV", "detail": str(e)}, status_code=400)
-
-    agent = AutoMindMasterAgent(run_id=run_id)
+    if file is None and not dataset_id.strip():
+        return JSONResponse({"error": "file or dataset_id required"}, status_code=400)
 
+    # spool the upload to disk (or reuse a cached dataset) and validate it off the event loop
     try:
-        results = agent.run_pipeline(
-            df=df,
-            autodetect_target=(autodetect.lower() == "true"),
-            target_override=target if target.strip() else None,
-            tune_rounds=int(tune),
-            advanced_fe=(advanced_fe.lower() == "true"),
-            sample_frac=float(sample_frac),
-            notebook=True
-        )
-    except Exception as e:
-        logger.error(f"[{run_id}] Pipeline failed: {e}")
-        return JSONResponse({"error": "Internal Server Error", "detail": str(e)}, status_code=500)
-
-    return JSONResponse(results)
-
-# Download artifact ZIP
+        path, dataset_id = await resolve_input(run_id, file, dataset_id)
+    except LookupError as e:
+        return JSONResponse({"error": "dataset not found", "detail": str(e)}, status_code=404)
+
+    if path:
+        try:
+            await run_in_threadpool(pd.read_csv, path, nrows=5)
+        except Exception as e:
+            logger.error(f"[{run_id}] Failed to read CSV: {e}")
+            os.remove(path)
+            return JSONResponse({"error": "failed to read uploaded CSV", "detail": str(e)}, status_code=400)
+
+    # run through the shared worker pool and wait without blocking other requests
+    try:
+        params = pipeline_params(autodetect, target, tune, advanced_fe, sample_frac,
+                                 sample_rows=sample_rows, time_col=time_col, half_life=half_life,
+                                 tune_budget=tune_budget, engine=engine)
+        params["dataset_id"] = dataset_id
+        job = job_manager.submit(run_id, path, params)
+    except JobQueueFull as e:
+        if path:
+            os.remove(path)
+        return JSONResponse({"error": "job queue is full", "detail": str(e)}, status_code=429)
+    except ValueError as e:
+        if path:
+            os.remove(path)
+        return JSONResponse({"error": "invalid form field", "detail": str(e)}, status_code=400)
+
+    await asyncio.wrap_future(job.future)
+
+    if job.status != "completed":
+        logger.error(f"[{run_id}] Pipeline failed: {job.error}")
+        return JSONResponse({"error": "Internal Server Error", "detail": job.error}, status_code=500)
+
+    return JSONResponse(job.result)
+
+# Cached datasets (pass dataset_id to /run_agent or /jobs instead of a file)
+@app.get("/datasets")
+def list_datasets():
+    return JSONResponse({"datasets": dataset_store.list()})
+
+# Download artifact ZIP; streamed and built on the fly when it is not finished yet,
+# or when another codec/level is asked for
 @app.get("/artifact/{run_id}")
-def download_artifact(run_id: str):
+def download_artifact(run_id: str, stream: bool = False, codec: Optional[str] = None,
+                      level: Optional[int] = None):
     path = f"artifacts/artifact_{run_id}.zip"
-    if not os.path.exists(path):
+    if os.path.exists(path) and not stream and codec is None and level is None:
+        return FileResponse(path, media_type="application/zip")
+    try:
+        resolve_codec(codec, level)
+        members = zip_members(path) if os.path.exists(path) else run_members(run_id)
+    except ValueError as e:
+        return JSONResponse({"error": "invalid query", "detail": str(e)}, status_code=400)
+    if isinstance(members, list) and not members:
         return JSONResponse({"error": "not found"}, status_code=404)
-    return FileResponse(path, media_type="application/zip")
+    return StreamingResponse(
+        stream_zip(members, codec, level),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="artifact_{run_id}.zip"'},
+    )
 
 # View report
 @app.get("/reports/{run_id}")
@@ -113,22 +190,44 @@ def view_report(run_id: str):
 
 # Runs list (UI calls this to populate run history)
 @app.get("/runs")
-def get_runs():
-    hist_path = "run_history.json"
-    if not os.path.exists(hist_path):
-        return JSONResponse({"runs": []})
+def get_runs(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    task_type: Optional[str] = None,
+    dataset_id: Optional[str] = None,
+    target: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    sort: str = "timestamp",
+    order: str = "desc"
+):
     try:
-        with open(hist_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return JSONResponse({"runs": data})
-    except Exception:
-        return JSONResponse({"runs": []})
+        runs, total = run_store.list(limit, offset, task_type, dataset_id, target, since, until, sort, order)
+    except ValueError as e:
+        return JSONResponse({"error": "invalid query", "detail": str(e)}, status_code=400)
+    return JSONResponse({"runs": runs, "total": total, "limit": limit, "offset": offset})
+
+@app.get("/runs/{run_id}")
+def get_run(run_id: str):
+    run = run_store.get(run_id)
+    if run is None:
+        return JSONResponse({"error": "not found"}, status_code=404)
+    return JSONResponse(run)
 
-# SSE stream (fallback)
+# SSE stream (fallback); resumes from the Last-Event-ID header browsers send on reconnect
 @app.get("/logs/stream")
-def logs_stream(last_event_id: int = 0):
-    return StreamingResponse(sse_event_generator(last_event_id), media_type="text/event-stream")
+async def logs_stream(last_event_id: int = 0, run_id: Optional[str] = None,
+                      last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")):
+    if last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+    return StreamingResponse(sse_event_stream(last_event_id, run_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/logs/latest")
-def logs_latest(n: int = 100):
-    return {"events": read_latest(n)}
+def logs_latest(n: int = 100, run_id: Optional[str] = None):
+    return {"events": read_latest(n, run_id)}
+
+# Full event history of one run from the rotated log segments
+@app.get("/logs/runs/{run_id}")
+def logs_run(run_id: str):
+    return {"run_id": run_id, "events": read_run(run_id)}
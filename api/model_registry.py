@@ -0,0 +1,229 @@
+# api/model_registry.py
+"""
+Trained model registry.
+
+Each successful run stores a ModelBundle under AUTOMIND_MODEL_DIR/<run_id>.joblib:
+the fitted preprocessor, the replayable basic feature engineering, the
+finalized model and the input schema, i.e. everything needed to score raw
+rows the way the pipeline saw them. Loaded bundles stay in an in-memory LRU
+of AUTOMIND_MODEL_CACHE entries so repeated online requests skip
+deserialization. predict_batches() streams frames through a bundle, in
+worker processes when asked to.
+"""
+
+import os
+import uuid
+import time
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+MODEL_DIR = os.getenv("AUTOMIND_MODEL_DIR", "models")
+CACHE_SIZE = int(os.getenv("AUTOMIND_MODEL_CACHE", "4"))
+# each batch worker is a fresh interpreter holding its own copy of the bundle
+MAX_PREDICT_PROCESSES = int(os.getenv("AUTOMIND_PREDICT_MAX_PROCESSES", "0")) or os.cpu_count() or 1
+
+
+class ModelBundle:
+
+    def __init__(self, run_id: str, model, target: str, task: str, features: List[str],
+                 input_dtypes: Dict[str, str], preprocessor=None, feature_engineering=None,
+                 engine: str = None, classes: Optional[list] = None, native_base: Optional[List[str]] = None,
+                 advanced_features=None):
+        self.run_id = run_id
+        self.model = model
+        self.target = target
+        self.task = task
+        self.features = features
+        self.input_dtypes = input_dtypes
+        self.preprocessor = preprocessor
+        self.feature_engineering = feature_engineering
+        # fitted AdvancedFeatureEngineeringAgent: target encodings and text vectorizers
+        self.advanced_features = advanced_features
+        self.engine = engine
+        self.classes = classes
+        # fast-engine models take the typed inputs plus the engineered columns
+        # outside these preprocessed ones (see fast_model_agent.native_frame)
+        self.native_base = native_base
+        self.created_at = time.time()
+
+    def _coerce(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Casts raw input columns to the dtypes seen in training; unknown
+        columns are ignored and missing ones become NaN.
+        """
+        data = {}
+        for col, dtype in self.input_dtypes.items():
+            s = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+            if dtype.startswith("datetime"):
+                s = pd.to_datetime(s, errors="coerce")
+            elif dtype == "bool":
+                s = s.astype(bool) if s.notna().all() else s
+            elif dtype.startswith(("int", "uint", "float")):
+                s = pd.to_numeric(s, errors="coerce")
+            else:
+                s = s.astype(object).where(s.notna(), None)
+            data[col] = s
+        return pd.DataFrame(data, index=df.index)
+
+    def prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        raw = self._coerce(df.reset_index(drop=True))
+        X = raw
+        if self.preprocessor is not None:
+            X = self.preprocessor.transform(X)
+        if self.feature_engineering is not None:
+            X = self.feature_engineering.apply(X)
+        if self.advanced_features is not None:
+            X = self.advanced_features.apply(X, source=raw)
+        if self.native_base is not None:
+            from api.agents.fast_model_agent import native_frame
+            X = native_frame(raw, X, self.native_base)
+        missing = [c for c in self.features if c not in X.columns]
+        if missing:
+            raise ValueError(f"cannot rebuild model features: {missing[:10]}")
+        return X[self.features]
+
+    def predict(self, df: pd.DataFrame, proba: bool = False) -> pd.DataFrame:
+        X = self.prepare(df)
+        out = pd.DataFrame({"prediction": np.asarray(self.model.predict(X)).ravel()})
+        if proba and self.task == "classification" and hasattr(self.model, "predict_proba"):
+            p = np.asarray(self.model.predict_proba(X))
+            # both engines order probability columns by sorted class label
+            classes = self.classes if self.classes is not None and len(self.classes) == p.shape[1] \
+                else range(p.shape[1])
+            for i, cls in enumerate(classes):
+                out[f"proba_{cls}"] = p[:, i]
+        return out
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "target": self.target,
+            "task": self.task,
+            "classes": self.classes,
+            "engine": self.engine,
+            "inputs": list(self.input_dtypes),
+            "n_features": len(self.features),
+            "created_at": self.created_at,
+        }
+
+    def schema(self) -> Dict[str, Any]:
+        return {
+            "target": self.target,
+            "task": self.task,
+            "classes": self.classes,
+            "inputs": self.input_dtypes,
+            "features": self.features,
+        }
+
+
+# ======================= Batch worker processes ===================
+_worker_bundle = None
+
+
+def _init_worker(path: str):
+    global _worker_bundle
+    import joblib
+    _worker_bundle = joblib.load(path)
+
+
+def _predict_chunk(args):
+    chunk, proba = args
+    return _worker_bundle.predict(chunk, proba)
+
+
+class ModelRegistry:
+
+    def __init__(self, root: str = None, cache_size: int = CACHE_SIZE):
+        self.root = root or MODEL_DIR
+        self.cache_size = max(1, cache_size)
+        self._cache: "OrderedDict[str, ModelBundle]" = OrderedDict()
+        self._lock = Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, run_id: str) -> str:
+        # run ids are short uuids; reject anything that could escape the model dir
+        if not run_id or not all(c.isalnum() or c in "-_" for c in run_id):
+            raise ValueError(f"invalid run id: {run_id!r}")
+        return os.path.join(self.root, f"{run_id}.joblib")
+
+    def has(self, run_id: str) -> bool:
+        try:
+            return os.path.exists(self.path(run_id))
+        except ValueError:
+            return False
+
+    def save(self, bundle: ModelBundle) -> str:
+        import joblib
+
+        path = self.path(bundle.run_id)
+        tmp = f"{path}.{uuid.uuid4().hex[:6]}.tmp"
+        try:
+            joblib.dump(bundle, tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            self._cache.pop(bundle.run_id, None)
+        return path
+
+    def load(self, run_id: str) -> Optional[ModelBundle]:
+        with self._lock:
+            bundle = self._cache.get(run_id)
+            if bundle is not None:
+                self._cache.move_to_end(run_id)
+                return bundle
+        if not self.has(run_id):
+            return None
+
+        import joblib
+        bundle = joblib.load(self.path(run_id))
+        with self._lock:
+            self._cache[run_id] = bundle
+            self._cache.move_to_end(run_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return bundle
+
+    def list(self) -> List[str]:
+        return sorted(f[:-len(".joblib")] for f in os.listdir(self.root) if f.endswith(".joblib"))
+
+    # ------------------------------------------------------------
+
+    def predict_batches(self, run_id: str, chunks, proba: bool = False, processes: int = 1):
+        """
+        Yields one prediction frame per input chunk, in order. With
+        `processes` > 1 each worker loads the bundle once and at most two
+        chunks per worker are in flight, so memory stays bounded. Worker
+        counts are capped at MAX_PREDICT_PROCESSES.
+        """
+        processes = min(processes, MAX_PREDICT_PROCESSES)
+        if processes <= 1:
+            bundle = self.load(run_id)
+            if bundle is None:
+                raise LookupError(f"unknown run_id: {run_id!r}")
+            for chunk in chunks:
+                yield bundle.predict(chunk, proba)
+            return
+
+        if not self.has(run_id):
+            raise LookupError(f"unknown run_id: {run_id!r}")
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processes, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(self.path(run_id),)) as pool:
+            inflight = deque()
+            for chunk in chunks:
+                inflight.append(pool.submit(_predict_chunk, (chunk, proba)))
+                if len(inflight) >= 2 * processes:
+                    yield inflight.popleft().result()
+            while inflight:
+                yield inflight.popleft().result()
+
+
+model_registry = ModelRegistry()
@@ -1,19 +1,27 @@
 # api/monitor_routes.py
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Header
 from fastapi.responses import StreamingResponse, JSONResponse
-from typing import Generator
-from api.monitoring import sse_event_generator, read_latest
+from typing import AsyncGenerator, Optional
+from api.monitoring import sse_event_stream, read_latest, read_run
 
 router = APIRouter(prefix="/monitor", tags=["monitor"])
 
 @router.get("/logs/stream")
-def logs_stream(last_event_id: int = Query(0)):
-    gen: Generator[str, None, None] = sse_event_generator(last_event_id)
-    return StreamingResponse(gen, media_type="text/event-stream")
+async def logs_stream(last_event_id: int = Query(0), run_id: Optional[str] = Query(None),
+                      last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")):
+    if last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+    gen: AsyncGenerator[str, None] = sse_event_stream(last_event_id, run_id)
+    return StreamingResponse(gen, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @router.get("/logs/latest")
-def logs_latest(n: int = Query(100)):
-    return JSONResponse({"events": read_latest(n)})
+def logs_latest(n: int = Query(100), run_id: Optional[str] = Query(None)):
+    return JSONResponse({"events": read_latest(n, run_id)})
+
+@router.get("/logs/runs/{run_id}")
+def logs_run(run_id: str):
+    return JSONResponse({"run_id": run_id, "events": read_run(run_id)})
 
 @router.get("/health")
 def monitor_health():
@@ -1,48 +1,152 @@
 # api/monitoring.py
-import os, json, time
-from typing import Dict, Any, Generator
+import os, json, time, asyncio
+from collections import deque
+from itertools import islice
+from typing import Dict, Any, Optional, AsyncGenerator
 from threading import Lock
+from api.profiling import record_event
+from api.event_log import event_log, LOG_DIR, ACTIVE
 
-LOG_DIR = "logs"
-LOG_PATH = os.path.join(LOG_DIR, "execution.jsonl")
-os.makedirs(LOG_DIR, exist_ok=True)
+LOG_PATH = os.path.join(LOG_DIR, ACTIVE)
 
-_lock = Lock()
-_SSE_BUFFER = []
-_SSE_MAX = 300
+SSE_BUFFER = int(os.getenv("AUTOMIND_SSE_BUFFER", "1000"))
+SSE_HEARTBEAT = float(os.getenv("AUTOMIND_SSE_HEARTBEAT_S", "15"))
+
+# When set (inside job worker processes), events are forwarded to the parent
+# process through this queue so they reach the API's event bus and log.
+_event_sink = None
+
+
+class EventBus:
+    """
+    In-memory event feed for SSE clients.
+
+    Events get monotonically increasing ids and live in a ring buffer of
+    `size` entries, so a client resuming from an id gets exactly the events
+    after it (or everything still buffered if it fell further behind).
+    publish() may be called from any thread; it wakes subscribers through
+    one asyncio.Event per event loop, so idle streams cost no thread and no
+    polling however many tabs are open.
+    """
+
+    def __init__(self, size: int = SSE_BUFFER):
+        self._buffer = deque(maxlen=size)
+        self._next_id = 1
+        self._lock = Lock()
+        self._loops: Dict[asyncio.AbstractEventLoop, list] = {}  # loop -> [asyncio.Event, subscribers]
+
+    @property
+    def last_id(self) -> int:
+        return self._next_id - 1
+
+    def publish(self, entry: Dict[str, Any]) -> int:
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            self._buffer.append({**entry, "id": event_id})
+            loops = list(self._loops)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._wake, loop)
+            except RuntimeError:  # loop closed
+                pass
+        return event_id
+
+    def _wake(self, loop):
+        # runs on `loop`: release everyone waiting on the current Event and arm a fresh one
+        state = self._loops.get(loop)
+        if state is not None:
+            state[0].set()
+            state[0] = asyncio.Event()
+
+    def since(self, last_id: int = 0, run_id: Optional[str] = None):
+        with self._lock:
+            if not self._buffer:
+                return []
+            first = self._buffer[0]["id"]
+            events = list(islice(self._buffer, max(0, last_id - first + 1), None))
+        if run_id is not None:
+            events = [e for e in events if e.get("run_id") == run_id]
+        return events
+
+    def latest(self, n: int = 200, run_id: Optional[str] = None):
+        with self._lock:
+            events = list(self._buffer)
+        if run_id is not None:
+            events = [e for e in events if e.get("run_id") == run_id]
+        return events[-n:] if n > 0 else []
+
+    async def stream(self, last_id: int = 0, run_id: Optional[str] = None,
+                     heartbeat: float = SSE_HEARTBEAT) -> AsyncGenerator[str, None]:
+        """
+        SSE frames for events after `last_id` (optionally one run only),
+        then live events as they are published. Idle periods send a comment
+        line every `heartbeat` seconds so proxies keep the connection open.
+        """
+        loop = asyncio.get_running_loop()
+        if last_id > self.last_id:
+            last_id = 0  # id from before a restart: replay what is buffered
+        with self._lock:
+            state = self._loops.setdefault(loop, [asyncio.Event(), 0])
+            state[1] += 1
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                # armed before reading, so a publish in between still wakes us
+                woken = state[0]
+                events = self.since(last_id)
+                if events:
+                    last_id = events[-1]["id"]
+                    for ev in events:
+                        if run_id is None or ev.get("run_id") == run_id:
+                            yield f"id: {ev['id']}\ndata: {json.dumps(ev, default=str)}\n\n"
+                    continue
+                try:
+                    await asyncio.wait_for(woken.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._lock:
+                state[1] -= 1
+                if state[1] <= 0:
+                    self._loops.pop(loop, None)
+
+
+event_bus = EventBus()
+
+
+def set_event_sink(sink):
+    global _event_sink
+    _event_sink = sink
+
+def publish_event(entry: Dict[str, Any]):
+    record_event(entry)
+    event_log.write(entry)
+    event_bus.publish(entry)
 
 def emit_event(run_id: str, step: str, status: str = "start", details: Dict[str, Any] = None):
     details = details or {}
     entry = {
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime()),
+        "ts": time.time(),
         "run_id": run_id,
         "step": step,
         "status": status,
         "details": details
     }
-    line = json.dumps(entry, default=str)
-    with _lock:
-        with open(LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-        _SSE_BUFFER.append(entry)
-        if len(_SSE_BUFFER) > _SSE_MAX:
-            _SSE_BUFFER.pop(0)
-
-def read_latest(n: int = 200):
-    with _lock:
-        return list(_SSE_BUFFER)[-n:]
-
-def sse_event_generator(last_event_id: int = 0) -> Generator[str, None, None]:
-    seen = last_event_id
-    hb = 0
-    while True:
-        with _lock:
-            new = _SSE_BUFFER[seen:]
-            seen = len(_SSE_BUFFER)
-        for ev in new:
-            yield f"data: {json.dumps(ev, default=str)}\n\n"
-        hb += 1
-        if hb >= 10:
-            hb = 0
-            yield "data: {\"heartbeat\": true}\n\n"
-        time.sleep(0.8)
+    if _event_sink is not None:
+        try:
+            _event_sink.put(entry)
+            return
+        except Exception:
+            pass
+    publish_event(entry)
+
+def read_run(run_id: str):
+    return event_log.read_run(run_id)
+
+def read_latest(n: int = 200, run_id: Optional[str] = None):
+    return event_bus.latest(n, run_id)
+
+def sse_event_stream(last_event_id: int = 0, run_id: Optional[str] = None):
+    return event_bus.stream(last_event_id, run_id)
@@ -0,0 +1,132 @@
+# api/predict_routes.py
+import os
+import uuid
+from typing import Any, Optional
+from fastapi import APIRouter, UploadFile, File, Form, Body, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+import pandas as pd
+from api.jobs import spool_upload
+from api.model_registry import model_registry, MAX_PREDICT_PROCESSES
+
+router = APIRouter(prefix="/predict", tags=["predict"])
+
+BATCH_ROWS = int(os.getenv("AUTOMIND_PREDICT_BATCH_ROWS", "50000"))
+
+
+def _records(payload: Any) -> pd.DataFrame:
+    """
+    Accepts a single row object, a list of row objects or {"records": [...]}.
+    """
+    if isinstance(payload, dict) and "records" in payload:
+        payload = payload["records"]
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or not all(isinstance(r, dict) for r in payload):
+        raise ValueError("expected a row object, a list of row objects or {\"records\": [...]}")
+    return pd.DataFrame.from_records(payload)
+
+
+def _read_chunks(path: str, parquet: bool, chunk_rows: int):
+    if parquet:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def _check_input(run_id: str, path: str, parquet: bool, rows: int = 100):
+    """
+    Scores the first rows before any output is sent, so a file the model
+    cannot take is answered with 422 rather than a cut-off 200 body.
+    """
+    head = next(iter(_read_chunks(path, parquet, rows)), None)
+    if head is not None and len(head):
+        model_registry.load(run_id).predict(head)
+
+
+def _stream_csv(run_id: str, path: str, parquet: bool, chunk_rows: int, proba: bool, processes: int):
+    try:
+        chunks = (c for c in _read_chunks(path, parquet, chunk_rows) if len(c))
+        for i, out in enumerate(model_registry.predict_batches(run_id, chunks, proba, processes)):
+            yield out.to_csv(index=False, header=(i == 0))
+    except Exception as e:
+        # the status line is already sent; end the body with an error record
+        yield f"# error: {type(e).__name__}: {e}\n"
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@router.get("/{run_id}")
+def model_info(run_id: str):
+    bundle = model_registry.load(run_id)
+    if bundle is None:
+        return JSONResponse({"error": "not found"}, status_code=404)
+    return JSONResponse(bundle.describe())
+
+
+@router.post("/{run_id}")
+async def predict(run_id: str, payload: Any = Body(...), proba: bool = Query(False)):
+    """
+    Online scoring: JSON rows in, JSON predictions out.
+    """
+    try:
+        df = _records(payload)
+    except ValueError as e:
+        return JSONResponse({"error": "invalid payload", "detail": str(e)}, status_code=400)
+
+    bundle = await run_in_threadpool(model_registry.load, run_id)
+    if bundle is None:
+        return JSONResponse({"error": "not found"}, status_code=404)
+
+    try:
+        out = await run_in_threadpool(bundle.predict, df, proba)
+    except ValueError as e:
+        return JSONResponse({"error": "cannot score input", "detail": str(e)}, status_code=422)
+
+    return JSONResponse({"run_id": run_id, "predictions": out.to_dict(orient="records")})
+
+
+@router.post("/{run_id}/batch")
+async def predict_batch(
+    run_id: str,
+    file: UploadFile = File(...),
+    chunk_rows: str = Form(""),
+    processes: str = Form("1"),
+    proba: str = Form("False")
+):
+    """
+    Batch scoring: a CSV or Parquet upload is read and scored chunk by
+    chunk and the predictions stream back as CSV in input row order. The
+    first rows are scored up front; a failure later in the file ends the
+    body with a "# error: ..." line.
+    """
+    if not model_registry.has(run_id):
+        return JSONResponse({"error": "not found"}, status_code=404)
+    try:
+        rows = int(chunk_rows) if chunk_rows.strip() else BATCH_ROWS
+        workers = int(processes)
+        if rows < 1 or workers < 1:
+            raise ValueError("chunk_rows and processes must be positive")
+    except ValueError as e:
+        return JSONResponse({"error": "invalid form field", "detail": str(e)}, status_code=422)
+    workers = min(workers, MAX_PREDICT_PROCESSES)
+
+    # the upload is closed once this handler returns, so spool it for the streaming body
+    path, _ = await run_in_threadpool(spool_upload, file.file, f"predict_{uuid.uuid4().hex[:8]}")
+    parquet = (file.filename or "").lower().endswith((".parquet", ".pq"))
+    try:
+        await run_in_threadpool(_check_input, run_id, path, parquet)
+    except (ValueError, KeyError) as e:
+        os.remove(path)
+        return JSONResponse({"error": "cannot score input", "detail": str(e)}, status_code=422)
+
+    return StreamingResponse(
+        _stream_csv(run_id, path, parquet, rows, proba.lower() == "true", workers),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="predictions_{run_id}.csv"'},
+    )
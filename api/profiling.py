@@ -0,0 +1,130 @@
+# api/profiling.py
+"""
+Per-stage resource profiling and Prometheus-style metrics.
+
+StageProfiler measures wall time (perf_counter), CPU time of the calling
+thread and the growth of the process' peak RSS while a stage runs.
+Profiles travel as "profile" events, and record_event() folds them into
+process-wide counters that /metrics renders in the Prometheus text format.
+Because job workers forward their events to the API process, the counters
+there cover every pipeline regardless of where it ran.
+"""
+
+import sys
+import time
+from threading import Lock
+from typing import Dict, Any, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+def frame_stats(obj) -> Optional[Dict[str, int]]:
+    """
+    Shape and shallow memory of a DataFrame-like object, None for anything else.
+    """
+    shape = getattr(obj, "shape", None)
+    if shape is None or len(shape) != 2:
+        return None
+    stats = {"rows": int(shape[0]), "cols": int(shape[1])}
+    try:
+        stats["bytes"] = int(obj.memory_usage(index=True, deep=False).sum())
+    except Exception:
+        pass
+    return stats
+
+
+class StageProfiler:
+
+    def start(self):
+        self._rss = peak_rss_bytes()
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.wall_s = time.perf_counter() - self._wall
+        self.cpu_s = time.thread_time() - self._cpu
+        rss = peak_rss_bytes()
+        self.peak_rss_delta_bytes = (rss - self._rss) if rss is not None and self._rss is not None else None
+        self.peak_rss_bytes = rss
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "peak_rss_delta_bytes": self.peak_rss_delta_bytes,
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+
+
+# ---------------------------------------------------------------- metrics
+
+_metrics_lock = Lock()
+_stage_runs: Dict[tuple, int] = {}
+_stage_wall: Dict[str, float] = {}
+_stage_cpu: Dict[str, float] = {}
+_stage_rss: Dict[str, int] = {}
+_events_total: Dict[str, int] = {}
+
+
+def record_event(entry: Dict[str, Any]):
+    status = entry.get("status", "")
+    with _metrics_lock:
+        _events_total[status] = _events_total.get(status, 0) + 1
+        if status != "profile":
+            return
+        stage = entry.get("step", "")
+        d = entry.get("details") or {}
+        key = (stage, d.get("outcome", "ok"))
+        _stage_runs[key] = _stage_runs.get(key, 0) + 1
+        _stage_wall[stage] = _stage_wall.get(stage, 0.0) + float(d.get("wall_s") or 0.0)
+        _stage_cpu[stage] = _stage_cpu.get(stage, 0.0) + float(d.get("cpu_s") or 0.0)
+        if d.get("peak_rss_delta_bytes") is not None:
+            _stage_rss[stage] = max(_stage_rss.get(stage, 0), int(d["peak_rss_delta_bytes"]))
+
+
+def render_prometheus(extra_gauges: Dict[str, float] = None) -> str:
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lbl = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"{name}{{{lbl}}} {value}" if lbl else f"{name} {value}")
+
+    with _metrics_lock:
+        family("automind_stage_runs_total", "counter", "Pipeline stage executions.",
+               [({"stage": s, "outcome": o}, n) for (s, o), n in sorted(_stage_runs.items())])
+        family("automind_stage_wall_seconds_total", "counter", "Wall-clock seconds spent per stage.",
+               [({"stage": s}, round(v, 6)) for s, v in sorted(_stage_wall.items())])
+        family("automind_stage_cpu_seconds_total", "counter", "Stage thread CPU seconds per stage.",
+               [({"stage": s}, round(v, 6)) for s, v in sorted(_stage_cpu.items())])
+        family("automind_stage_peak_rss_delta_bytes_max", "gauge", "Largest peak-RSS growth seen per stage.",
+               [({"stage": s}, v) for s, v in sorted(_stage_rss.items())])
+        family("automind_events_total", "counter", "Execution events by status.",
+               [({"status": s}, n) for s, n in sorted(_events_total.items())])
+
+    for name, value in (extra_gauges or {}).items():
+        family(name, "gauge", name.replace("_", " ") + ".", [({}, value)])
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,159 @@
+# api/run_store.py
+"""
+Run metadata store.
+
+One row per pipeline run in a SQLite database (AUTOMIND_RUN_DB) opened in
+WAL mode, so job workers can record runs concurrently while the API reads.
+Metrics and per-stage timings are stored with each run so runs can be
+compared without opening their reports. Timestamp, task type and dataset
+hash are indexed for the filtered, paginated /runs listing. An existing
+run_history.json is imported the first time the database is created.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+RUN_DB = os.getenv("AUTOMIND_RUN_DB", "runs.db")
+LEGACY_HISTORY = "run_history.json"
+
+SORT_COLUMNS = {"timestamp": "ts", "rows": "rows", "cols": "cols", "wall_s": "wall_s", "score": "score"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    timestamp   TEXT NOT NULL,
+    ts          REAL NOT NULL,
+    rows        INTEGER,
+    cols        INTEGER,
+    task_type   TEXT,
+    dataset_id  TEXT,
+    target      TEXT,
+    engine      TEXT,
+    score       REAL,
+    wall_s      REAL,
+    metrics     TEXT,
+    stages      TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts);
+CREATE INDEX IF NOT EXISTS runs_task_ts ON runs (task_type, ts);
+CREATE INDEX IF NOT EXISTS runs_dataset_ts ON runs (dataset_id, ts);
+"""
+
+
+def primary_score(task_type: str, metrics: Optional[Dict[str, Any]]) -> Optional[float]:
+    metrics = metrics or {}
+    value = metrics.get("accuracy") if task_type == "classification" else metrics.get("r2")
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+class RunStore:
+
+    def __init__(self, path: str = RUN_DB):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread and process; never reuse one across fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+            self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn):
+        with self._init_lock:
+            if self._ready:
+                return
+            conn.executescript(_SCHEMA)
+            if conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 0:
+                self._import_legacy(conn)
+            self._ready = True
+
+    def _import_legacy(self, conn):
+        try:
+            with open(LEGACY_HISTORY, "r", encoding="utf-8") as f:
+                entries = json.load(f) or []
+        except (OSError, ValueError):
+            return
+        from datetime import datetime, timezone
+        for e in entries:
+            try:
+                # legacy timestamps are naive UTC
+                ts = datetime.fromisoformat(e["timestamp"]).replace(tzinfo=timezone.utc).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+            conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, timestamp, ts, rows, cols, task_type) VALUES (?, ?, ?, ?, ?, ?)",
+                (e.get("run_id"), e["timestamp"], ts, e.get("rows"), e.get("cols"), e.get("task_type")))
+
+    @staticmethod
+    def _row(r: sqlite3.Row) -> Dict[str, Any]:
+        out = dict(r)
+        out.pop("ts", None)
+        for key in ("metrics", "stages"):
+            out[key] = json.loads(out[key]) if out[key] else None
+        return out
+
+    # ------------------------------------------------------------
+
+    def add(self, run_id: str, timestamp: str, ts: float, rows: int, cols: int, task_type: str,
+            dataset_id: str = None, target: str = None, engine: str = None,
+            metrics: Dict[str, Any] = None, stages: Dict[str, float] = None, wall_s: float = None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO runs (run_id, timestamp, ts, rows, cols, task_type, dataset_id, target, "
+            "engine, score, wall_s, metrics, stages) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, timestamp, ts, rows, cols, task_type, dataset_id, target, engine,
+             primary_score(task_type, metrics), wall_s,
+             json.dumps(metrics, default=str) if metrics is not None else None,
+             json.dumps(stages) if stages is not None else None))
+
+    def update_timings(self, run_id: str, wall_s: float, stages: Dict[str, float]):
+        self._conn().execute("UPDATE runs SET wall_s = ?, stages = ? WHERE run_id = ?",
+                             (wall_s, json.dumps(stages), run_id))
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        r = self._conn().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._row(r) if r else None
+
+    def list(self, limit: int = 50, offset: int = 0, task_type: str = None, dataset_id: str = None,
+             target: str = None, since: float = None, until: float = None, sort: str = "timestamp",
+             order: str = "desc") -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Returns (runs, total matching). `sort` is one of SORT_COLUMNS.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {sorted(SORT_COLUMNS)}")
+        if order.lower() not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+
+        where, args = [], []
+        for col, value in (("task_type", task_type), ("dataset_id", dataset_id), ("target", target)):
+            if value is not None:
+                where.append(f"{col} = ?")
+                args.append(value)
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            args.append(until)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM runs{clause}", args).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM runs{clause} ORDER BY {SORT_COLUMNS[sort]} {order.upper()} NULLS LAST, run_id "
+            f"LIMIT ? OFFSET ?", args + [limit, offset]).fetchall()
+        return [self._row(r) for r in rows], total
+
+
+run_store = RunStore()
@@ -0,0 +1,127 @@
+# api/stage_cache.py
+"""
+Content-addressed cache for pipeline stage outputs.
+
+A stage's output is keyed by the hash of its input (a frame hash, or the key
+of the stage that produced the input), its parameters and the source code of
+the agent class that computes it, so editing an agent invalidates its entries.
+DataFrames are stored as Parquet, everything else is pickled.
+"""
+
+import os
+import json
+import uuid
+import pickle
+import hashlib
+import inspect
+from typing import Any, Dict
+
+import pandas as pd
+
+CACHE_DIR = os.getenv("AUTOMIND_CACHE_DIR", "cache")
+MAX_BYTES = int(float(os.getenv("AUTOMIND_STAGE_CACHE_MB", "4096")) * 1024 * 1024)
+ENABLED = os.getenv("AUTOMIND_STAGE_CACHE", "1") not in ("0", "false", "False")
+
+MISSING = object()
+
+_code_versions: Dict[type, str] = {}
+
+
+def code_version(obj) -> str:
+    cls = obj if isinstance(obj, type) else type(obj)
+    if cls not in _code_versions:
+        try:
+            src = inspect.getsource(inspect.getmodule(cls))
+        except (OSError, TypeError):
+            src = cls.__qualname__
+        _code_versions[cls] = hashlib.sha256(src.encode("utf-8")).hexdigest()[:12]
+    return _code_versions[cls]
+
+
+def frame_hash(df: pd.DataFrame) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()[:24]
+
+
+class StageCache:
+
+    def __init__(self, root: str = None, max_bytes: int = MAX_BYTES, enabled: bool = ENABLED):
+        self.root = root or os.path.join(CACHE_DIR, "stages")
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, stage: str, input_key: str, params: Dict[str, Any], agent) -> str:
+        payload = json.dumps([stage, input_key, params, code_version(agent)], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+    def _path(self, stage: str, key: str, ext: str) -> str:
+        return os.path.join(self.root, stage, f"{key}.{ext}")
+
+    def get(self, stage: str, key: str):
+        if not self.enabled:
+            return MISSING
+        for ext in ("parquet", "pkl"):
+            path = self._path(stage, key, ext)
+            if not os.path.exists(path):
+                continue
+            try:
+                if ext == "parquet":
+                    value = pd.read_parquet(path)
+                else:
+                    with open(path, "rb") as f:
+                        value = pickle.load(f)
+                os.utime(path)  # mark as recently used
+                return value
+            except Exception:
+                return MISSING
+        return MISSING
+
+    def put(self, stage: str, key: str, value):
+        if not self.enabled:
+            return
+        os.makedirs(os.path.join(self.root, stage), exist_ok=True)
+        tmp = os.path.join(self.root, stage, f".{key}.{uuid.uuid4().hex[:6]}.tmp")
+        try:
+            ext = "pkl"
+            if isinstance(value, pd.DataFrame):
+                try:
+                    value.to_parquet(tmp, index=False)
+                    ext = "parquet"
+                except Exception:
+                    pass
+            if ext == "pkl":
+                with open(tmp, "wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(stage, key, ext))
+        except Exception:
+            pass
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
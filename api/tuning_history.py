@@ -0,0 +1,74 @@
+# api/tuning_history.py
+"""
+Best hyperparameters found per dataset, for warm-starting later tuning runs.
+
+One JSON file per dataset key under CACHE_DIR/tuning maps "<task>:<model_id>"
+to the best scoring parameter set seen so far, the score and the run that
+found it. Only JSON-scalar parameters are kept, which is what the search
+spaces produce.
+"""
+
+import os
+import json
+import time
+import hashlib
+import uuid
+from threading import Lock
+from typing import Optional, Dict, Any
+
+from api.dataset_store import CACHE_DIR
+
+_SCALARS = (bool, int, float, str, type(None))
+
+
+def scalar_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in params.items() if isinstance(v, _SCALARS)}
+
+
+class TuningHistory:
+
+    def __init__(self, root: str = None):
+        self.root = root or os.path.join(CACHE_DIR, "tuning")
+        self._lock = Lock()
+
+    def _path(self, dataset_key: str) -> str:
+        name = hashlib.sha256(dataset_key.encode()).hexdigest()[:24]
+        return os.path.join(self.root, f"{name}.json")
+
+    def _read(self, dataset_key: str) -> Dict[str, Any]:
+        try:
+            with open(self._path(dataset_key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def best(self, dataset_key: str, task: str, model_id: str) -> Optional[Dict[str, Any]]:
+        if not dataset_key:
+            return None
+        return self._read(dataset_key).get(f"{task}:{model_id}")
+
+    def update(self, dataset_key: str, task: str, model_id: str, params: Dict[str, Any],
+               score: float, run_id: str = None) -> bool:
+        """
+        Stores `params` if they beat the recorded score. Returns True when stored.
+        """
+        if not dataset_key or score is None:
+            return False
+        key = f"{task}:{model_id}"
+        with self._lock:
+            entries = self._read(dataset_key)
+            prev = entries.get(key)
+            if prev is not None and prev.get("score") is not None and prev["score"] >= score:
+                return False
+            entries[key] = {"params": scalar_params(params), "score": float(score),
+                            "run_id": run_id, "ts": time.time()}
+            os.makedirs(self.root, exist_ok=True)
+            path = self._path(dataset_key)
+            tmp = f"{path}.{uuid.uuid4().hex[:6]}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(entries, f, indent=2, default=str)
+            os.replace(tmp, path)
+        return True
+
+
+tuning_history = TuningHistory()
@@ -113,7 +113,7 @@ try:
         if len(runs_data) == 0:
             st.info("No previous runs found.")
         else:
-            df = pd.DataFrame(runs_data)
+            df = pd.DataFrame(runs_data).drop(columns=["metrics", "stages"], errors="ignore")
             st.dataframe(df, use_container_width=True)
     else:
         st.warning("Could not load run history (backend error).")
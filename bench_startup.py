@@ -0,0 +1,54 @@
+# bench_startup.py
+"""
+Measures cold-start cost of the API and agent modules.
+
+Each target is imported in a fresh interpreter, and the wall-clock import time
+and the resulting peak RSS are recorded. Run with:
+
+    python bench_startup.py            # default targets
+    python bench_startup.py api.main   # custom targets
+"""
+
+import sys
+import json
+import subprocess
+
+TARGETS = [
+    "api.main",
+    "api.agents.master_agent",
+    "api.agents.model_agent",
+    "preload:tabular",
+    "preload:all",
+]
+
+PROBE = r"""
+import sys, time, json, resource, importlib
+target = sys.argv[1]
+t = time.perf_counter()
+if target.startswith("preload:"):
+    from api.agents import preload
+    preload(target.split(":", 1)[1])
+else:
+    importlib.import_module(target)
+elapsed = time.perf_counter() - t
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"target": target, "import_s": round(elapsed, 3), "rss_mb": round(rss_kb / 1024, 1)}))
+"""
+
+
+def measure(target: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE, target], capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"target": target, "error": out.stderr.strip().splitlines()[-1:]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    targets = sys.argv[1:] or TARGETS
+    print(f"{'target':<28} {'import_s':>9} {'rss_mb':>8}")
+    for t in targets:
+        r = measure(t)
+        if "error" in r:
+            print(f"{t:<28} failed: {r['error']}")
+        else:
+            print(f"{t:<28} {r['import_s']:>9} {r['rss_mb']:>8}")
@@ -14,3 +14,15 @@ try:
     print(json.dumps(r.json(), indent=2))
 except Exception:
     print("Non-JSON response:", r.text)
+
+# Background job flow: submit, poll, done
+import time
+
+r = requests.post(f"{BACKEND}/jobs", files=files, data=data, timeout=60)
+job = r.json()
+print("Job submitted:", job)
+
+while job.get("status") in ("queued", "running"):
+    time.sleep(2)
+    job = requests.get(f"{BACKEND}/jobs/{job['job_id']}").json()
+print("Job finished:", job.get("status"), job.get("error"))
@@ -4,7 +4,11 @@ Tests AutoMind backend end-to-end using local functions,
 NOT FastAPI endpoints.
 """
 
+import os
+import time
+import tempfile
 import pandas as pd
+import pytest
 from api.agents.master_agent import AutoMindMasterAgent
 
 
@@ -60,9 +64,460 @@ def test_timeseries():
     print("OK\n")
 
 
+def test_tune_uses_optuna_search():
+    print("\n=== TEST: Budgeted tuning takes the optuna path ===")
+    pytest.importorskip("optuna")
+    from api.agents.model_agent import ModelTrainingAgent
+
+    class Experiment:
+        calls = []
+
+        def tune_model(self, model, **kwargs):
+            self.calls.append(kwargs)
+            return model
+
+    agent = ModelTrainingAgent("test_tune", tune_budget=5, max_trials=7)
+    agent._tune(Experiment(), "model", None, "classification", "Accuracy", tune_rounds=3)
+
+    assert len(Experiment.calls) == 1
+    call = Experiment.calls[0]
+    assert call["search_library"] == "optuna" and call["search_algorithm"] == "tpe"
+    assert call["n_iter"] == 7 and call["timeout"] == 5
+    print("OK\n")
+
+
+def test_race_schedule_ends_on_full_data():
+    print("\n=== TEST: Racing schedule ===")
+    from api.agents.model_agent import ModelTrainingAgent
+
+    agent = ModelTrainingAgent("test_schedule")
+    for n_rows, n_models in ((100, 1), (500, 15), (200_000, 15), (1_000_000, 40)):
+        plan = agent._schedule(n_rows, n_models)
+        print(n_rows, n_models, plan)
+        assert plan[-1][:2] == (n_rows, agent.max_folds)
+        assert [p[1] for p in plan] == sorted(p[1] for p in plan)
+        assert all(agent.min_folds <= p[1] <= agent.max_folds for p in plan)
+    print("OK\n")
+
+
+def test_reservoir_half_life_favours_recent_rows():
+    print("\n=== TEST: Recency-weighted reservoir ===")
+    from api.agents.sampling_policy import SamplingPolicyAgent
+
+    df = pd.DataFrame({"when": pd.date_range("2024-01-01", periods=20_000, freq="min"), "x": range(20_000)})
+    chunks = [df.iloc[i:i + 5_000] for i in range(0, len(df), 5_000)]
+    sampler = SamplingPolicyAgent()
+    plain = sampler.reservoir(chunks, 1_000, time_col="when")
+    recent = sampler.reservoir(chunks, 1_000, time_col="when", half_life=2 * 3600)
+    print("median x:", plain["x"].median(), recent["x"].median())
+    assert len(recent) == 1_000 and recent["when"].is_monotonic_increasing
+    assert recent["x"].median() > plain["x"].median() + 3_000
+    print("OK\n")
+
+
+def test_shap_falls_back_to_permutation():
+    print("\n=== TEST: SHAP fallback for unsupported tree models ===")
+    from sklearn.ensemble import AdaBoostClassifier
+    from api.agents.explainability_agent import ExplainabilityAgent
+
+    df = pd.DataFrame({"a": [float(i % 7) for i in range(120)], "b": [float(i % 5) for i in range(120)]})
+    df["t"] = (df["a"] > 3).astype(int)
+    model = AdaBoostClassifier(algorithm="SAMME", n_estimators=10).fit(df[["a", "b"]], df["t"])
+
+    agent = ExplainabilityAgent(explain_rows=20, background_rows=20, time_budget=30, cache_dir="cache/test_shap")
+    images = agent.explain(model, df, "t")
+    assert images and agent.error is None, agent.error
+    print("OK\n")
+
+
+def test_stage_cache_hit_and_miss():
+    print("\n=== TEST: Stage cache ===")
+    from api.stage_cache import StageCache, MISSING
+    from api.agents.preprocessing_agent import PreprocessingAgent
+    from api.agents.feature_engineering_agent import FeatureEngineeringAgent
+
+    agent = AutoMindMasterAgent(run_id="test_stage_cache")
+    agent.stage_cache = StageCache(root=tempfile.mkdtemp(), enabled=True)
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": ["x", "y", "z"]})
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return df.copy()
+
+    first, key = agent._cached("prep", PreprocessingAgent, "input", {"target": "a"}, compute)
+    again, key_again = agent._cached("prep", PreprocessingAgent, "input", {"target": "a"}, compute)
+    assert len(calls) == 1 and key == key_again
+    pd.testing.assert_frame_equal(again, first)
+
+    # a different input, parameter or agent is a different entry
+    for args in (("other", {"target": "a"}, PreprocessingAgent), ("input", {"target": "b"}, PreprocessingAgent),
+                 ("input", {"target": "a"}, FeatureEngineeringAgent)):
+        _, other = agent._cached("prep", args[2], args[0], args[1], compute)
+        assert other != key
+    assert len(calls) == 4
+
+    # non-frame values are pickled; a disabled cache always misses
+    cache = StageCache(root=tempfile.mkdtemp(), enabled=True)
+    cache.put("misc", "k", {"cols": ["a"]})
+    assert cache.get("misc", "k") == {"cols": ["a"]}
+    assert StageCache(root=cache.root, enabled=False).get("misc", "k") is MISSING
+    print("OK\n")
+
+
+def test_event_bus_resumes_by_id():
+    print("\n=== TEST: Event bus resume ===")
+    import asyncio
+    import threading
+    from api.monitoring import EventBus
+
+    bus = EventBus(size=5)
+    ids = [bus.publish({"run_id": "r1" if i % 2 else "r2", "step": f"s{i}"}) for i in range(3)]
+    assert ids == [1, 2, 3]
+    assert [e["id"] for e in bus.since(1)] == [2, 3]
+    assert [e["id"] for e in bus.since(0, run_id="r2")] == [1, 3]
+
+    # a client further behind than the ring buffer gets what is still buffered
+    for i in range(4):
+        bus.publish({"run_id": "r1", "step": f"t{i}"})
+    assert [e["id"] for e in bus.since(1)] == [3, 4, 5, 6, 7]
+
+    async def frames(last_id, count, live=False):
+        out = []
+        stream = bus.stream(last_id, heartbeat=5)
+        try:
+            async for frame in stream:
+                if frame.startswith("id: "):
+                    out.append(int(frame.split("\n", 1)[0][4:]))
+                    if len(out) == count:
+                        return out
+                    if live and out[-1] == 7:
+                        # published from another thread while the stream waits
+                        threading.Timer(0.1, bus.publish, args=({"run_id": "r1", "step": "live"},)).start()
+        finally:
+            await stream.aclose()
+
+    assert asyncio.run(frames(5, 3, live=True)) == [6, 7, 8]
+    # an id from before a restart replays the buffer
+    assert asyncio.run(frames(100, 5)) == [4, 5, 6, 7, 8]
+    print("OK\n")
+
+
+def test_run_store_pagination_and_filters():
+    print("\n=== TEST: Run store listing ===")
+    from api import run_store
+
+    root = tempfile.mkdtemp()
+    legacy, run_store.LEGACY_HISTORY = run_store.LEGACY_HISTORY, os.path.join(root, "none.json")
+    try:
+        store = run_store.RunStore(os.path.join(root, "runs.db"))
+        store.get("run00")  # creates the schema without importing this checkout's history
+    finally:
+        run_store.LEGACY_HISTORY = legacy
+    for i in range(12):
+        task = "classification" if i % 3 else "regression"
+        metrics = {"accuracy": i / 20} if task == "classification" else {"r2": i / 10}
+        store.add(f"run{i:02d}", f"2024-01-{i + 1:02d}T00:00:00", 1_700_000_000 + i * 86400, 100 + i, 5, task,
+                  dataset_id="ds_a" if i < 6 else "ds_b", target="y", metrics=metrics)
+
+    runs, total = store.list(limit=5)
+    assert total == 12 and [r["run_id"] for r in runs] == ["run11", "run10", "run09", "run08", "run07"]
+    page, _ = store.list(limit=5, offset=10)
+    assert [r["run_id"] for r in page] == ["run01", "run00"]
+
+    runs, total = store.list(task_type="regression", order="asc")
+    assert total == 4 and [r["run_id"] for r in runs] == ["run00", "run03", "run06", "run09"]
+    runs, total = store.list(dataset_id="ds_b", task_type="classification")
+    assert total == 4 and all(r["dataset_id"] == "ds_b" for r in runs)
+    runs, total = store.list(since=1_700_000_000 + 2 * 86400, until=1_700_000_000 + 5 * 86400)
+    assert total == 3 and {r["run_id"] for r in runs} == {"run02", "run03", "run04"}
+
+    best, _ = store.list(limit=1, task_type="classification", sort="score")
+    assert best[0]["run_id"] == "run11" and best[0]["metrics"] == {"accuracy": 0.55}
+
+    store.update_timings("run00", 1.5, {"load_data": 0.5})
+    assert store.get("run00")["stages"] == {"load_data": 0.5}
+    with pytest.raises(ValueError):
+        store.list(sort="run_id; DROP TABLE runs")
+    print("OK\n")
+
+
+def test_artifact_finalize_and_abort():
+    print("\n=== TEST: Artifact bundle ===")
+    import io
+    import json
+    import zipfile
+    from api.artifact_builder import ArtifactBuilder, stream_zip
+
+    root = tempfile.mkdtemp()
+    src = os.path.join(root, "report.html")
+    with open(src, "w") as f:
+        f.write("<html>" + "x" * 10_000 + "</html>")
+
+    builder = ArtifactBuilder(os.path.join(root, "artifact.zip"))
+    assert builder.add_file(src)
+    assert not builder.add_file(os.path.join(root, "missing.html"))
+    builder.add_json("schema.json", {"target": "y"})
+    builder.add_bytes("plots/eda_0.png", b"\x89PNG fake")
+    assert os.path.exists(builder.partial) and not os.path.exists(builder.path)
+
+    path = builder.finalize({"run_id": "r1"})
+    assert not os.path.exists(builder.partial)
+    with zipfile.ZipFile(path) as z:
+        assert z.testzip() is None
+        assert z.namelist() == ["report.html", "schema.json", "plots/eda_0.png", "manifest.json"]
+        assert z.getinfo("report.html").compress_type == zipfile.ZIP_DEFLATED
+        assert z.getinfo("plots/eda_0.png").compress_type == zipfile.ZIP_STORED
+        manifest = json.loads(z.read("manifest.json"))
+    assert manifest["run_id"] == "r1" and [m["name"] for m in manifest["members"]][0] == "report.html"
+    # a stage finishing after the bundle is closed changes nothing
+    assert not builder.add_file(src)
+
+    aborted = ArtifactBuilder(os.path.join(root, "aborted.zip"))
+    aborted.add_json("schema.json", {})
+    aborted.abort()
+    assert not os.path.exists(aborted.partial) and not os.path.exists(aborted.path)
+    aborted.add_json("late.json", {})
+    assert not os.path.exists(aborted.partial)
+
+    streamed = b"".join(stream_zip([("report.html", src), ("note.txt", b"hello")], codec="stored"))
+    with zipfile.ZipFile(io.BytesIO(streamed)) as z:
+        assert z.read("note.txt") == b"hello" and len(z.read("report.html")) == os.path.getsize(src)
+    print("OK\n")
+
+
+def test_oof_target_encoding_matches_fold_loop():
+    print("\n=== TEST: Out-of-fold target encoding ===")
+    import numpy as np
+    from api.agents.advanced_feature_engineering import AdvancedFeatureEngineeringAgent
+
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        "city": rng.choice(["a", "b", "c", "d", None], n),
+        "tier": pd.Categorical(rng.choice(["gold", "silver", "rare"], n, p=[0.6, 0.39, 0.01])),
+        "y": rng.integers(0, 2, n),
+    })
+    y = df["y"].to_numpy(dtype=float)
+
+    def fold_loop(agent, col):
+        # the per-fold loop the vectorized encoder replaces, on the same folds
+        folds = np.random.default_rng(agent.random_state).permutation(n) % agent.n_splits
+        keys = df[col].astype(object).where(df[col].notna(), "<na>").to_numpy()
+        enc = np.empty(n)
+        for f in range(agent.n_splits):
+            train, val = folds != f, folds == f
+            prior = y[train].mean()
+            stats = pd.DataFrame({"k": keys[train], "y": y[train]}).groupby("k")["y"].agg(["sum", "count"])
+            s = stats["sum"].reindex(keys[val]).fillna(0).to_numpy()
+            c = stats["count"].reindex(keys[val]).fillna(0).to_numpy()
+            enc[val] = (s + agent.smoothing * prior) / (c + agent.smoothing)
+        return enc
+
+    for smoothing in (0.5, 10.0, 1e12):
+        agent = AdvancedFeatureEngineeringAgent(smoothing=smoothing)
+        out = agent._target_encode(df, "y")
+        for col in ("city", "tier"):
+            np.testing.assert_allclose(out[f"{col}_target_enc"], fold_loop(agent, col), rtol=1e-5, atol=1e-6)
+    # heavy smoothing reduces to the fold mean of the other folds, as the old KFold loop computed
+    folds = np.random.default_rng(agent.random_state).permutation(n) % agent.n_splits
+    old = np.array([y[folds != f].mean() for f in folds])
+    np.testing.assert_allclose(out["city_target_enc"], old, rtol=1e-5)
+    print("OK\n")
+
+
+def test_progressive_sampling_with_categoricals():
+    print("\n=== TEST: Progressive sampling on categorical columns ===")
+    import numpy as np
+    from api.agents.sampling_policy import SamplingPolicyAgent
+
+    rng = np.random.default_rng(0)
+    n = 60_000
+    df = pd.DataFrame({
+        "city": pd.Categorical(rng.choice(list("abcdef"), n)),
+        "channel": rng.choice(["web", "store", None], n),
+        "x": rng.normal(size=n),
+    })
+    df["y"] = (df["city"].isin(["a", "b"]) ^ (df["x"] > 0)).astype(int)
+
+    out, info = SamplingPolicyAgent(large_rows=20_000, start_rows=2_000).policy(df, "y", "classification")
+    print({k: v for k, v in info.items() if k != "curve"})
+    assert info["strategy"] == "progressive", info
+    assert len(out) == info["rows"] and isinstance(out["city"].dtype, pd.CategoricalDtype)
+    print("OK\n")
+
+
+def test_fast_engine_keeps_categoricals_next_to_text():
+    print("\n=== TEST: Fast engine with text and categorical columns ===")
+    import numpy as np
+    from api.agents.advanced_feature_engineering import AdvancedFeatureEngineeringAgent
+    from api.agents.fast_model_agent import FastModelTrainingAgent
+
+    rng = np.random.default_rng(0)
+    n = 1_000
+    df = pd.DataFrame({
+        "city": rng.choice(list("abcdef"), n),
+        "x": rng.normal(size=n),
+        "note": [f"the customer wrote a {w} note about the delivery"
+                 for w in rng.choice(["long", "short", "kind", "angry"], n)],
+    })
+    df["y"] = (df["city"].isin(["a", "b"]) ^ (df["x"] > 0)).astype(int)
+    fe = AdvancedFeatureEngineeringAgent(text_mode="hashing").enhance(df, "y")
+    assert any(isinstance(t, pd.SparseDtype) for t in fe.dtypes)
+
+    for engine in ("lightgbm", "xgboost", "catboost"):
+        model, leaderboard = FastModelTrainingAgent("test_fast_sparse", engines=(engine,)).train(
+            fe, "y", "classification")
+        print(engine, leaderboard)
+        assert "error" not in leaderboard[0], leaderboard
+        assert model.sparse and "city" in model.features and "city" in model.categories
+        rows = fe.head(20).copy()
+        rows.loc[0, "city"] = "nowhere"  # unseen category
+        assert len(model.predict(rows)) == 20
+    print("OK\n")
+
+
+def test_batch_predict_bounds_workers():
+    print("\n=== TEST: Batch scoring form limits ===")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sklearn.linear_model import LogisticRegression
+    from api import model_registry as registry_module, predict_routes
+    from api.model_registry import ModelBundle, ModelRegistry
+
+    df = pd.DataFrame({"a": [float(i % 9) for i in range(60)]})
+    df["y"] = (df["a"] > 4).astype(int)
+    registry = ModelRegistry(root=tempfile.mkdtemp())
+    registry.save(ModelBundle("test_batch", LogisticRegression().fit(df[["a"]], df["y"]), "y", "classification",
+                              features=["a"], input_dtypes={"a": "float64"}, classes=[0, 1]))
+
+    app = FastAPI()
+    app.include_router(predict_routes.router)
+    client = TestClient(app)
+    csv = df[["a"]].to_csv(index=False).encode()
+    saved = predict_routes.model_registry, registry_module.MAX_PREDICT_PROCESSES
+    predict_routes.model_registry, registry_module.MAX_PREDICT_PROCESSES = registry, 1
+    try:
+        for bad in ("x", "0", "-3"):
+            r = client.post("/predict/test_batch/batch", files={"file": ("a.csv", csv)}, data={"processes": bad})
+            assert r.status_code == 422, (bad, r.text)
+        # far above the cap: scored in-process instead of spawning 500 interpreters
+        r = client.post("/predict/test_batch/batch", files={"file": ("a.csv", csv)},
+                        data={"processes": "500", "chunk_rows": "25"})
+        assert r.status_code == 200 and r.text.splitlines()[0] == "prediction"
+        assert len(r.text.splitlines()) == len(df) + 1
+    finally:
+        predict_routes.model_registry, registry_module.MAX_PREDICT_PROCESSES = saved
+    print("OK\n")
+
+
+# Job workers for the job manager tests (module level so they can be pickled)
+def _sleeping_worker(job_id, data_path, params, conn, cpus=None):
+    time.sleep(60)
+
+
+def _silent_worker(job_id, data_path, params, conn, cpus=None):
+    pass
+
+
+def _crashing_worker(job_id, data_path, params, conn, cpus=None):
+    os._exit(3)
+
+
+def _wait_done(job, timeout=15):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.05)
+    return job
+
+
+def test_job_cancel_frees_slot():
+    print("\n=== TEST: Job cancel ===")
+    from api.jobs import JobManager
+
+    manager = JobManager(max_workers=1, max_queue=2, worker=_sleeping_worker)
+    try:
+        first = manager.submit("cancel_a", None, {})
+        second = manager.submit("cancel_b", None, {})
+        assert first.status == "running" and second.status == "queued"
+
+        proc = first.process
+        manager.cancel("cancel_a")
+        assert first.status == "cancelled" and not proc.is_alive()
+        # the freed slot goes to the queued job
+        assert second.status == "running"
+
+        manager.cancel("cancel_b")
+        assert second.status == "cancelled"
+        assert manager.stats()["running"] == 0
+    finally:
+        manager.shutdown()
+    print("OK\n")
+
+
+def test_job_reaps_workers_without_result():
+    print("\n=== TEST: Job reaping ===")
+    from api.jobs import JobManager
+
+    for worker, code in ((_silent_worker, 0), (_crashing_worker, 3)):
+        manager = JobManager(max_workers=1, max_queue=1, worker=worker)
+        try:
+            job = _wait_done(manager.submit(f"reap_{code}", None, {}))
+            assert job.status == "failed", job.status
+            assert f"code {code}" in job.error
+            assert manager.stats()["running"] == 0
+        finally:
+            manager.shutdown()
+    print("OK\n")
+
+
+def test_registry_predict_round_trip():
+    print("\n=== TEST: Registry predict round trip ===")
+    from api.model_registry import model_registry
+
+    rows = 240
+    df = pd.DataFrame({
+        "city": [["north", "south", "east", "west"][i % 4] for i in range(rows)],
+        "size": [float(i % 17) for i in range(rows)],
+        "note": [f"customer left a {['long', 'short', 'kind', 'angry'][i % 4]} comment about the order"
+                 for i in range(rows)],
+    })
+    df["buy"] = ((df["city"].isin(["north", "east"])) ^ (df["size"] > 8)).astype(int)
+
+    for advanced_fe in (False, True):
+        agent = AutoMindMasterAgent(run_id=f"test_registry_{int(advanced_fe)}")
+        results = agent.run_pipeline(df, target_override="buy", advanced_fe=advanced_fe, engine="fast")
+        assert results["model_path"], "model not registered"
+
+        bundle = model_registry.load(agent.run_id)
+        raw = df.drop(columns=["buy"]).head(20).copy()
+        raw.loc[0, "city"] = "nowhere"  # unseen category
+        out = bundle.predict(raw, proba=True)
+        assert len(out) == len(raw)
+        assert out["prediction"].notna().all()
+        assert set(out["prediction"]).issubset({0, 1})
+        assert [c for c in out.columns if c.startswith("proba_")] == ["proba_0", "proba_1"]
+    print("OK\n")
+
+
 if __name__ == "__main__":
     test_small_classification()
     test_regression()
     test_timeseries()
+    test_tune_uses_optuna_search()
+    test_race_schedule_ends_on_full_data()
+    test_reservoir_half_life_favours_recent_rows()
+    test_progressive_sampling_with_categoricals()
+    test_fast_engine_keeps_categoricals_next_to_text()
+    test_shap_falls_back_to_permutation()
+    test_stage_cache_hit_and_miss()
+    test_event_bus_resumes_by_id()
+    test_run_store_pagination_and_filters()
+    test_artifact_finalize_and_abort()
+    test_oof_target_encoding_matches_fold_loop()
+    test_job_cancel_frees_slot()
+    test_job_reaps_workers_without_result()
+    test_registry_predict_round_trip()
+    test_batch_predict_bounds_workers()
 
     print("\n✔ All tests completed.\n")